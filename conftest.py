@@ -0,0 +1,45 @@
+import random
+import networkx as nx
+import pytest
+
+from src.engines.compact_graph import compile_graph
+
+HIGHWAYS = ["motorway", "trunk", "primary", "secondary", "tertiary"]
+
+
+def make_grid_graph(k=12, seed=2):
+    """
+    k x k synthetic road grid around (8, 76) shaped like an OSMnx graph: node x/y, edge
+    length (m), travel_time (s) and highway. About 10% of the links are missing and some
+    are one-way, so not every pair is connected the same way in both directions.
+    """
+    rnd = random.Random(seed)
+    G = nx.MultiDiGraph()
+
+    def node(i, j):
+        return 5000 + i * k + j
+
+    for i in range(k):
+        for j in range(k):
+            G.add_node(node(i, j), y=8 + i * 0.05 + rnd.random() * 0.01, x=76 + j * 0.05 + rnd.random() * 0.01)
+    for i in range(k):
+        for j in range(k):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < k and j + dj < k and rnd.random() < 0.9:
+                    length = 5500 * (1 + rnd.random() * 0.5)
+                    highway = rnd.choice(HIGHWAYS)
+                    G.add_edge(node(i, j), node(i + di, j + dj), length=length,
+                               travel_time=length / rnd.choice([15, 20, 25]), highway=highway)
+                    if rnd.random() < 0.95:
+                        G.add_edge(node(i + di, j + dj), node(i, j), length=length, travel_time=length / 20, highway=highway)
+    return G
+
+
+@pytest.fixture(scope="session")
+def grid_graph():
+    return make_grid_graph()
+
+
+@pytest.fixture(scope="session")
+def grid_cg(grid_graph):
+    return compile_graph(grid_graph)
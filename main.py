@@ -4,6 +4,7 @@ import pandas as pd
 from src.preprocessing import load_and_combine_data, preprocess_data
 from src.data_generator import generate_logistics_data
 from src.preprocessing import preprocess_data
+from src.data_store import load_logistics_data
 from src.model import train_and_save_model
 from src.evaluation import evaluate_model
 from src.optimization import create_graph_from_data, find_optimized_route, find_baseline_route
@@ -21,7 +22,7 @@ def main():
 
     # Step 2: Preprocess Data
     print("\n[2/7] Preprocessing data...")
-    df = pd.read_csv("data/logistics_data.csv")
+    df = load_logistics_data("data/logistics_data.csv")
     X_train, X_test, y_train, y_test, preprocessor, df = preprocess_data(df)
 
 
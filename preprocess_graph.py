@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import time
+import osmnx as ox
+
+from src.data_generator import CITIES
+from src.engines.city_matrix import CITY_MATRIX_PATH, build_city_matrix
+from src.engines.compact_graph import WEIGHT_COLUMNS, compile_graph
+from src.engines.contraction import build_hierarchy, hierarchy_path
+from src.engines.eta_engine import ETA_MODEL_PATH, load_eta_model, model_version, predict_time_profiles, save_time_profiles, time_profile_path
+from src.engines.graph_engine import build_graph_store, load_global_graph
+from src.engines.tile_store import TILE_STORE_DIR, add_graph_to_tiles
+from src.engines.incident_engine import INCIDENT_DIR, DEFAULT_INCIDENT_SET, generate_incident_layer, incident_layer_path, load_incident_layers
+from src.engines.weight_engine import build_scenario_weights
+
+GRAPH_PATH = "data/tn_highways.graphml"
+# (south, west, north, east) download_graph.py fetches the statewide graph for
+GRAPH_BOUNDARY = "8.0,76.2,13.6,80.4"
+
+
+def build_binary_graph(graph_path):
+    """Converts the GraphML once into the memory-mappable graph store every later load uses."""
+    start = time.time()
+    store = build_graph_store(graph_path)
+    print(f"Saved binary graph store {store} in {time.time() - start:.1f}s")
+
+
+def build_hierarchies(graph_path, weights):
+    """Builds and persists one contraction hierarchy per weight profile next to the GraphML."""
+    _, cg = load_global_graph(graph_path)
+    for weight in weights:
+        print(f"Building contraction hierarchy for '{weight}' ({len(cg)} nodes, {cg.num_edges} edges)...")
+        start = time.time()
+        ch = build_hierarchy(cg, weight)
+        path = hierarchy_path(graph_path, weight)
+        ch.save(path)
+        print(f"Saved {path} in {time.time() - start:.1f}s ({len(ch.orig) - cg.num_edges} shortcuts)")
+
+
+def build_incident_layers(graph_path, incident_sets, directory=INCIDENT_DIR):
+    """Generates and persists the named, seeded incident layers (name:seed pairs)."""
+    _, cg = load_global_graph(graph_path)
+    for spec in incident_sets:
+        name, _, seed = spec.partition(":")
+        layer = generate_incident_layer(cg, name, int(seed or 0))
+        layer.save(incident_layer_path(name, directory))
+        print(f"Saved incident layer {layer.version} ({len(layer)} incident edges)")
+
+
+def build_city_matrix_file(graph_path, path=CITY_MATRIX_PATH):
+    """Routes every pair of data_generator.CITIES under every scenario and saves the matrix."""
+    _, cg = load_global_graph(graph_path)
+    layer = load_incident_layers(cg)[DEFAULT_INCIDENT_SET]
+    matrix = build_city_matrix(cg, CITIES, build_scenario_weights(cg, layer), layer.version)
+    matrix.save(path)
+    print(f"Saved {path} ({len(matrix.names)} cities, {len(matrix.polyline_offsets) - 1} distinct geometries)")
+
+
+def build_time_profiles(graph_path, model_path=ETA_MODEL_PATH):
+    """Runs the trained ETA model over every edge for each time of day and saves the weights."""
+    model = load_eta_model(model_path)
+    if model is None:
+        print(f"{model_path} not found, run main.py to train it. Skipping time-of-day profiles.")
+        return
+    _, cg = load_global_graph(graph_path)
+    start = time.time()
+    profiles = predict_time_profiles(model, cg)
+    path = time_profile_path(graph_path)
+    save_time_profiles(path, profiles, cg, model_version(model_path))
+    print(f"Saved {path} ({', '.join(profiles)}) in {time.time() - start:.1f}s")
+
+
+def parse_boundary(spec):
+    """A download boundary: "south,west,north,east" or a GeoJSON file with the polygon(s)."""
+    if os.path.exists(spec):
+        from shapely.geometry import shape
+        from shapely.ops import unary_union
+        with open(spec) as f:
+            geojson = json.load(f)
+        features = geojson.get("features", [geojson])
+        return unary_union([shape(f.get("geometry", f)) for f in features])
+    return tuple(float(v) for v in spec.split(","))
+
+
+def build_tile_store(graph_path, boundary, sources=(), directory=TILE_STORE_DIR):
+    """
+    Partitions the statewide graph, then any extra regional GraphMLs (e.g. neighbouring
+    states) given as "GRAPHML=BOUNDARY", into the offline tile store used for corridor
+    graphs. Only tiles inside each graph's download boundary count as covered.
+    """
+    _, cg = load_global_graph(graph_path)
+    written = add_graph_to_tiles(cg, parse_boundary(boundary), directory)
+    for source in sources:
+        path, sep, source_boundary = source.rpartition("=")
+        if not sep:
+            print(f"⚠️ Skipping tile source {source}: expected GRAPHML=BOUNDARY")
+            continue
+        written += add_graph_to_tiles(compile_graph(ox.load_graphml(path)), parse_boundary(source_boundary), directory)
+    print(f"Saved tile store {directory} ({written} tile writes from {1 + len(sources)} graph(s))")
+
+
+STEPS = {
+    "binary": lambda args: build_binary_graph(args.graph),
+    "hierarchy": lambda args: build_hierarchies(args.graph, args.weights),
+    "incidents": lambda args: build_incident_layers(args.graph, args.incident_sets),
+    "city-matrix": lambda args: build_city_matrix_file(args.graph),
+    "eta-weights": lambda args: build_time_profiles(args.graph),
+    "tiles": lambda args: build_tile_store(args.graph, args.graph_boundary, args.tile_sources),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline preprocessing for the statewide road graph.")
+    parser.add_argument("steps", nargs="*", choices=list(STEPS), default=list(STEPS),
+                        help="Preprocessing steps to run (default: all)")
+    parser.add_argument("--graph", default=GRAPH_PATH, help="Path to the statewide GraphML")
+    parser.add_argument("--weights", nargs="+", default=list(WEIGHT_COLUMNS), help="Weight profiles to preprocess")
+    parser.add_argument("--graph-boundary", default=GRAPH_BOUNDARY,
+                        help="Area the GraphML was downloaded for, south,west,north,east or a GeoJSON file")
+    parser.add_argument("--tile-sources", nargs="*", default=[],
+                        help="Extra regional graphs for the tile store as GRAPHML=BOUNDARY (boundary as for --graph-boundary)")
+    parser.add_argument("--incident-sets", nargs="+", default=["default:42"], help="Incident layers to generate as name:seed")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.graph):
+        print(f"{args.graph} not found, run download_graph.py first. Skipping preprocessing.")
+        return
+    for step in args.steps:
+        STEPS[step](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Production launcher for the API.
+
+With more than one worker the statewide graph, its weight arrays, hierarchies and indexes are loaded once here,
+in the master process, and left as memory-mapped files that every uvicorn worker attaches
+read-only, so workers share one copy of the graph instead of each loading their own:
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import os
+import uvicorn
+
+from src.api import GRAPH_PATH
+from src.engines.shared_resources import SHARED_RESOURCES_ENV, preload_shared_resources, release_shared_resources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the logistics API under uvicorn.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--graph", default=GRAPH_PATH, help="Statewide GraphML the API routes on")
+    parser.add_argument("--no-preload", action="store_true", help="Let every worker load its own graph")
+    args = parser.parse_args()
+
+    # Workers size their matrix process pools by it (cores // workers)
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    shared_dir = None
+    if args.workers > 1 and not args.no_preload and os.path.exists(args.graph):
+        print(f"Preloading shared road graph for {args.workers} workers...")
+        shared_dir = preload_shared_resources(args.graph)
+        # Workers are spawned with this environment and attach instead of loading
+        os.environ[SHARED_RESOURCES_ENV] = shared_dir
+        print(f"✅ Shared resources ready in {shared_dir}")
+
+    try:
+        uvicorn.run("src.api:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        if shared_dir:
+            release_shared_resources(shared_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,46 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-import pandas as pd
+from pydantic import BaseModel, Field
+from typing import Literal
+from contextlib import asynccontextmanager
+import numpy as np
 import joblib
 import os
 
-from src.engines.graph_engine import get_dynamic_road_graph
-from src.engines.weight_engine import apply_conditions
+from src.engines.graph_engine import get_dynamic_compact_graph, get_graph_cache, get_tile_store, load_global_graph
+from src.engines.weight_engine import build_scenario_weights, scenario_index, scenario_weight
 from src.engines.eco_engine import calculate_emission
 from src.engines.optimization_engine import optimize_single_segment, optimize_multi_stop_tsp
-from src.engines.osrm_engine import get_predefined_osrm_routes, get_predefined_osrm_multi_routes, get_baseline_osrm_multi_route
+from src.engines.compact_graph import WEIGHT_COLUMNS
+from src.engines.contraction import load_hierarchies
+from src.engines.spatial_index import SpatialIndex
+from src.engines.corridor import GridIndex, extract_corridor, CORRIDOR_ROUTING
+from src.engines.incident_engine import load_incident_layers, DEFAULT_INCIDENT_SET
+from src.engines.city_matrix import load_city_matrix
+from src.engines.city_registry import CityRegistry
+from src.engines.route_cache import RouteCache, route_cache_key
+from src.engines.graph_cache import empty_stats
+from src.engines.osrm_engine import get_predefined_osrm_routes, get_osrm_multi_routes, get_osrm_cost_matrices
+from src.engines.eta_engine import ETABatcher, load_eta_model, feature_frame, load_time_profiles, model_version, ETA_MODEL_PATH
+from src.engines.shared_resources import attach_shared_resources, SHARED_RESOURCES_ENV
+from src.engines.matrix_engine import set_pool_graph
+from src.engines.fleet_engine import solve_fleet, graph_cost_matrices, FLEET_TIME_LIMIT, FLEET_MAX_TIME_LIMIT, DEFAULT_HORIZON_MIN
+from src.data_store import load_logistics_data, CITY_COLUMNS
 from src.generate_pdf_report import create_pdf_report
-import osmnx as ox
+
+GRAPH_PATH = "data/tn_highways.graphml"
+
+@asynccontextmanager
+async def lifespan(app):
+    # Loaded per worker process at startup, not as a side effect of importing this module
+    load_resources()
+    yield
+    release_resources()
 
 # --- Application Setup ---
-app = FastAPI(title="Logistics Optimization API | TamilNaduAI")
+app = FastAPI(title="Logistics Optimization API | TamilNaduAI", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -32,33 +56,107 @@ app.mount("/static", StaticFiles(directory="web"), name="static")
 # --- Global Resources ---
 resources = {
     "df": None,
+    "cities": None,
+    "hierarchies": {},
+    "incident_layers": {},
+    "incident_weights": {},
+    "time_profiles": {},
+    "route_cache": None,
+    "city_matrix": None,
+    "eta_batcher": None,
 }
 
 def load_resources():
     try:
         print("Creating Resources...")
-        resources["df"] = pd.read_csv("data/logistics_data.csv")
+        # Only the city columns are needed; a columnar copy of the dataset is preferred
+        resources["df"] = load_logistics_data(columns=CITY_COLUMNS)
+        resources["route_cache"] = RouteCache()
+
+        eta_model = load_eta_model()
+        if eta_model is not None:
+            resources["eta_batcher"] = ETABatcher(eta_model)
+            print(f"✅ Loaded ETA model from {ETA_MODEL_PATH}")
         
-        graph_path = "data/tn_highways.graphml"
+        graph_path = GRAPH_PATH
         if os.path.exists(graph_path):
-            print(f"Loading GraphML from {graph_path}...")
-            import osmnx as ox
-            resources["tn_graph"] = ox.load_graphml(graph_path)
-            print(f"✅ Loaded GraphML with {len(resources['tn_graph'])} nodes.")
+            # Under serve.py the master preloaded the graph and weights; workers only map them
+            shared_dir = os.environ.get(SHARED_RESOURCES_ENV)
+            shared = attach_shared_resources(shared_dir, graph_path) if shared_dir else None
+            if shared is not None:
+                resources["tn_compact"] = shared["tn_compact"]
+                print(f"✅ Attached shared road graph with {len(resources['tn_compact'])} nodes from {shared_dir}.")
+            else:
+                print(f"Loading road graph for {graph_path}...")
+                # Only the compact graph is kept; memory-mapped from the binary store when it is current
+                G, resources["tn_compact"] = load_global_graph(graph_path)
+                source = "GraphML" if G is not None else "binary graph store"
+                print(f"✅ Loaded {source} with {len(resources['tn_compact'])} nodes.")
+                del G
+            # Multi-stop matrices on the statewide graph may use the shared-memory process pool
+            set_pool_graph(resources["tn_compact"])
+            if shared is not None:
+                resources["spatial_index"] = shared["spatial_index"]
+                resources["corridor_grid"] = shared["corridor_grid"]
+            else:
+                resources["spatial_index"] = SpatialIndex(resources["tn_compact"])
+                resources["corridor_grid"] = GridIndex(resources["tn_compact"])
+            resources["incident_layers"] = load_incident_layers(resources["tn_compact"])
+            default_layer = resources["incident_layers"][DEFAULT_INCIDENT_SET]
+            if shared is not None and shared["incident_version"] == default_layer.version:
+                scenario_weights = shared["scenario_weights"]
+            else:
+                scenario_weights = build_scenario_weights(resources["tn_compact"], default_layer)
+            # One fixed array per row, so the A* scale computed here is found again by every request
+            resources["scenario_weights"] = list(scenario_weights)
+            for row in resources["scenario_weights"]:
+                resources["tn_compact"].heuristic_scale(row)
+            print(f"✅ Incident layers: {', '.join(l.version for l in resources['incident_layers'].values())}")
+            if shared is not None:
+                resources["hierarchies"] = shared["hierarchies"]
+                resources["time_profiles"] = shared["time_profiles"]
+            else:
+                resources["hierarchies"] = load_hierarchies(graph_path, resources["tn_compact"], WEIGHT_COLUMNS)
+                eta_version = model_version(ETA_MODEL_PATH) if os.path.exists(ETA_MODEL_PATH) else None
+                resources["time_profiles"] = load_time_profiles(graph_path, resources["tn_compact"], eta_version)
+            if resources["time_profiles"]:
+                print(f"✅ Loaded model-predicted time-of-day profiles: {', '.join(resources['time_profiles'])}")
+            if resources["hierarchies"]:
+                print(f"✅ Loaded contraction hierarchies: {', '.join(resources['hierarchies'])}")
         else:
             print("⚠️ tn_highways.graphml not found! Fast OSRM Predefined Router enabled.")
+
+        # City lookups are dict hits from here on; the DataFrame is only scanned once
+        resources["cities"] = CityRegistry.from_dataframe(resources["df"], resources.get("spatial_index"))
+        print(f"✅ City registry: {len(resources['cities'])} cities.")
+
+        cg = resources.get("tn_compact")
+        default_layer = resources["incident_layers"].get(DEFAULT_INCIDENT_SET)
+        resources["city_matrix"] = load_city_matrix(cg=cg, incident_version=default_layer.version if default_layer else None)
+        if resources["city_matrix"] is not None:
+            print(f"✅ Loaded precomputed city matrix for {len(resources['city_matrix'].names)} cities.")
             
         print("✅ Resources Loaded Successfully.")
     except Exception as e:
         print(f"❌ Error loading resources: {e}")
 
-load_resources()
+def release_resources():
+    # Shared segments stay with the master (serve.py); a worker only drops its references
+    set_pool_graph(None)
+    for key in ("tn_compact", "spatial_index", "corridor_grid", "scenario_weights"):
+        resources.pop(key, None)
+    resources["incident_weights"].clear()
+    resources["time_profiles"] = {}
+    print("✅ Resources Released.")
 
 # --- Data Models ---
 class ScenarioSettings(BaseModel):
     heavy_rain: bool = False
     accident_zone: bool = False
     rush_hour: bool = False
+    incident_set: str = DEFAULT_INCIDENT_SET
+    # Route on the ETA model's predicted edge times for this time of day (local graph only)
+    time_of_day: Literal['morning', 'afternoon', 'evening', 'night'] | None = None
 
 class SingleOptimizationRequest(BaseModel):
     start_node: str
@@ -66,6 +164,18 @@ class SingleOptimizationRequest(BaseModel):
     vehicle_type: str = "diesel"
     scenario: ScenarioSettings = ScenarioSettings()
 
+class SnapRequest(BaseModel):
+    coords: list[list[float]]
+
+class ETARecord(BaseModel):
+    distance_km: float
+    delivery_demand: float = 50
+    traffic_factor: float = 1.0
+    time_of_day: Literal['morning', 'afternoon', 'evening', 'night'] = 'morning'
+
+class ETARequest(BaseModel):
+    records: list[ETARecord]
+
 class MultiOptimizationRequest(BaseModel):
     origin: str
     stops: list[str] = []
@@ -73,49 +183,252 @@ class MultiOptimizationRequest(BaseModel):
     vehicle_type: str = "diesel"
     scenario: ScenarioSettings = ScenarioSettings()
 
+class FleetStop(BaseModel):
+    name: str
+    demand: float = 1
+    ready_time: float = 0  # minutes from the start of the shift
+    due_date: float = DEFAULT_HORIZON_MIN
+    service_time: float = 0
+
+class FleetVehicle(BaseModel):
+    capacity: float
+    vehicle_type: str = "diesel"
+
+class FleetOptimizationRequest(BaseModel):
+    depot: str
+    stops: list[FleetStop]
+    vehicles: list[FleetVehicle]
+    horizon: float = DEFAULT_HORIZON_MIN
+    time_limit: float = Field(FLEET_TIME_LIMIT, gt=0, le=FLEET_MAX_TIME_LIMIT)  # seconds of solver search
+    initial_routes: list[list[str]] | None = None  # stop names per vehicle, e.g. a previous response's "routes"
+    scenario: ScenarioSettings = ScenarioSettings()
+
 # --- Endpoints ---
 @app.get("/")
 async def read_index():
     return FileResponse('web/index.html')
 
 @app.get("/cities")
-def get_cities():
-    df = resources["df"]
-    if df is None:
+def get_cities(request: Request):
+    registry = resources["cities"]
+    if registry is None:
         raise HTTPException(status_code=500, detail="Data not loaded")
-    
-    start_cities = df[['start_location', 'start_lat', 'start_lon']].rename(
-        columns={'start_location': 'name', 'start_lat': 'lat', 'start_lon': 'lon'}
+
+    # Payload is serialized once at startup; clients revalidate with If-None-Match
+    headers = {"ETag": registry.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == registry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=registry.payload, media_type="application/json", headers=headers)
+
+def get_incident_layer(name):
+    layer = resources["incident_layers"].get(name)
+    if layer is None:
+        raise HTTPException(status_code=404, detail=f"Incident set {name} not found")
+    return layer
+
+def get_time_profile(scenario):
+    """Model-predicted edge times for the requested time of day, or None if none was requested."""
+    if scenario.time_of_day is None:
+        return None
+    profile = resources["time_profiles"].get(scenario.time_of_day)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Time-of-day profile {scenario.time_of_day} not available (run preprocess_graph.py eta-weights)")
+    return profile
+
+def get_incident_weight(cg, index, name, time_of_day=None):
+    """
+    Scenario row for a non-default incident set and/or a time-of-day profile, computed
+    once per (layer version, scenario, profile).
+    """
+    layer = get_incident_layer(name) if index & 4 else None
+    key = (layer.version if layer else None, index, time_of_day)
+    if key not in resources["incident_weights"]:
+        base = resources["time_profiles"][time_of_day] if time_of_day else None
+        resources["incident_weights"][key] = scenario_weight(cg, index, layer, base=base)
+    return resources["incident_weights"][key]
+
+def get_incident_version(scenario):
+    """Version of the incident layer behind a local accident scenario, for reproducible results."""
+    if not scenario.accident_zone or resources.get("tn_compact") is None:
+        return None
+    return get_incident_layer(scenario.incident_set).version
+
+def get_route_cache_key(coords_list, request):
+    """Cache key on snapped waypoints (graph node ids when the statewide graph is loaded)."""
+    index = resources.get("spatial_index")
+    if index is not None:
+        waypoints = index.nearest_nodes(coords_list).tolist()
+    else:
+        waypoints = [[round(float(lat), 4), round(float(lon), 4)] for lat, lon in coords_list]
+    return route_cache_key(
+        waypoints, request.vehicle_type, request.scenario.model_dump(),
+        incident_version=get_incident_version(request.scenario),
     )
-    end_cities = df[['end_location', 'end_lat', 'end_lon']].rename(
-        columns={'end_location': 'name', 'end_lat': 'lat', 'end_lon': 'lon'}
+
+def get_matrix_route(city_names, scenario):
+    """
+    (baseline, optimized) routes straight from the precomputed city matrix, or None when it
+    can't answer (not built, unknown city, custom incident set or unreachable leg).
+    """
+    matrix = resources["city_matrix"]
+    if matrix is None or not matrix.has(city_names) or scenario.time_of_day:
+        return None
+    if scenario.accident_zone and scenario.incident_set != DEFAULT_INCIDENT_SET:
+        return None
+    return matrix.route(city_names, scenario_index(scenario))
+
+def get_local_routing_graph(scenario, coords):
+    """
+    Returns (spatial_index, cg, ai_weight, hierarchies) for local routing. The statewide compact graph is
+    shared read-only by every request and only the precomputed scenario weight row changes;
+    without it a corridor is downloaded and compiled for this request.
+    """
+    index = scenario_index(scenario)
+    if resources.get("tn_compact") is not None:
+        cg = resources["tn_compact"]
+        hierarchies = dict(resources["hierarchies"])
+        if index != 0 or scenario.time_of_day:
+            # The ai_time_min hierarchy is only valid for the default scenario weights
+            hierarchies.pop("ai_time_min", None)
+        custom_incidents = scenario.accident_zone and scenario.incident_set != DEFAULT_INCIDENT_SET
+        if custom_incidents or scenario.time_of_day:
+            weight = get_incident_weight(cg, index, scenario.incident_set, scenario.time_of_day)
+            return resources["spatial_index"], cg, weight, hierarchies
+        return resources["spatial_index"], cg, resources["scenario_weights"][index], hierarchies
+
+    cg = get_dynamic_compact_graph(coords)
+    return SpatialIndex(cg), cg, scenario_weight(cg, index), {}
+
+def get_corridor(cg, coords):
+    """
+    Corridor view of the statewide graph around the waypoints for the A* / matrix searches,
+    or None (a downloaded corridor graph already is one).
+    """
+    if not CORRIDOR_ROUTING or cg is not resources.get("tn_compact"):
+        return None
+    return extract_corridor(cg, coords, resources.get("corridor_grid"))
+
+def get_city(city_name):
+    # Lookup city from the registry (exact, alias or fuzzy match)
+    city = resources["cities"].get(city_name)
+    if city is None:
+        suggestions = resources["cities"].suggestions(city_name)
+        hint = f". Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        raise HTTPException(status_code=404, detail=f"City {city_name} not found{hint}")
+    return city
+
+def get_city_nodes(cities, index):
+    """OSM node ids of the cities; the registry's pre-snapped ids when routing on the statewide graph."""
+    if index is resources.get("spatial_index") and all(c.node is not None for c in cities):
+        return [c.node for c in cities]
+    return index.nearest_nodes([[c.lat, c.lon] for c in cities])
+
+@app.post("/snap")
+def snap_points(request: SnapRequest):
+    """Batch-snaps [lat, lon] pairs to the statewide graph: nearest node and nearest edge."""
+    index = resources.get("spatial_index")
+    if index is None:
+        raise HTTPException(status_code=503, detail="Statewide road graph not loaded")
+    if not request.coords:
+        return {"snapped": []}
+
+    cg = index.cg
+    nodes, node_dist = index.snap_nodes(request.coords)
+    try:
+        edges = index.snap_to_edges(request.coords)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    snapped = []
+    for i in range(len(request.coords)):
+        e = int(edges["edge"][i])
+        snapped.append({
+            "node": int(cg.node_ids[nodes[i]]),
+            "node_coords": [float(cg.lat[nodes[i]]), float(cg.lon[nodes[i]])],
+            "node_distance_km": round(float(node_dist[i]), 4),
+            "edge": [int(cg.node_ids[cg.sources[e]]), int(cg.node_ids[cg.targets[e]])],
+            "edge_fraction": round(float(edges["fraction"][i]), 4),
+            "edge_coords": [float(edges["lat"][i]), float(edges["lon"][i])],
+            "edge_distance_km": round(float(edges["distance_km"][i]), 4),
+        })
+    return {"snapped": snapped}
+
+@app.post("/predict-eta")
+def predict_eta(request: ETARequest):
+    """
+    Delivery time predictions (minutes) from the trained model. Concurrent requests are
+    micro-batched into single predict calls.
+    """
+    batcher = resources["eta_batcher"]
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="ETA model not trained (run main.py)")
+    if not request.records:
+        return {"eta_minutes": []}
+
+    frame = feature_frame(
+        [r.distance_km for r in request.records], [r.delivery_demand for r in request.records],
+        [r.traffic_factor for r in request.records], [r.time_of_day for r in request.records],
     )
-    
-    all_cities = pd.concat([start_cities, end_cities]).drop_duplicates(subset=['name']).sort_values('name')
-    return {"cities": all_cities.to_dict(orient='records')}
+    predictions = batcher.predict(frame, timeout=30)
+    return {"eta_minutes": [round(float(p), 2) for p in predictions]}
+
+@app.get("/predict-eta/stats")
+def get_eta_stats():
+    batcher = resources["eta_batcher"]
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="ETA model not trained (run main.py)")
+    return batcher.stats()
 
-def get_city_coords(df, city_name):
-    # Lookup city coordinates from data
-    for prefix in ['start', 'end']:
-        match = df[df[f'{prefix}_location'] == city_name]
-        if not match.empty:
-            return match.iloc[0][f'{prefix}_lat'], match.iloc[0][f'{prefix}_lon']
-    raise HTTPException(status_code=404, detail=f"City {city_name} not found")
+@app.get("/cache/stats")
+def get_cache_stats():
+    route_cache = resources["route_cache"]
+    if route_cache is None:
+        raise HTTPException(status_code=500, detail="Route cache not loaded")
+    return route_cache.stats()
+
+@app.get("/graph-cache/stats")
+def get_graph_cache_stats():
+    # Corridor graphs, only used when the statewide graph isn't loaded; a read doesn't create the cache
+    cache, tiles = get_graph_cache(create=False), get_tile_store()
+    stats = cache.stats() if cache is not None else empty_stats()
+    return {**stats, "tiles": tiles.stats() if tiles is not None else None}
+
+@app.get("/incidents")
+def get_incidents():
+    return {"incident_sets": [layer.describe() for layer in resources["incident_layers"].values()]}
 
 @app.post("/optimize")
 @app.post("/optimize-single")
 def optimize_single(request: SingleOptimizationRequest):
-    df = resources["df"]
-    if df is None:
+    if resources["cities"] is None:
         raise HTTPException(status_code=500, detail="System not ready")
+    get_time_profile(request.scenario)
+
+    start_city, end_city = get_city(request.start_node), get_city(request.end_node)
+    start_lat, start_lon = start_city.lat, start_city.lon
+    end_lat, end_lon = end_city.lat, end_city.lon
+
+    route_cache = resources["route_cache"]
+    cache_key = get_route_cache_key([[start_lat, start_lon], [end_lat, end_lon]], request)
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "start_node": request.start_node, "end_node": request.end_node}
+
+    incident_version = None
 
-    start_lat, start_lon = get_city_coords(df, request.start_node)
-    end_lat, end_lon = get_city_coords(df, request.end_node)
+    # Precomputed all-pairs city routes need no routing at all
+    matrix_route = get_matrix_route([start_city.name, end_city.name], request.scenario)
 
     # Fast Route Predefinition using OSRM to eliminate 5min timeout
-    osrm_base, osrm_ai = get_predefined_osrm_routes(start_lat, start_lon, end_lat, end_lon)
+    # (OSRM knows nothing about the model's time-of-day profiles)
+    skip_osrm = matrix_route or request.scenario.time_of_day
+    osrm_base, osrm_ai = (None, None) if skip_osrm else get_predefined_osrm_routes(start_lat, start_lon, end_lat, end_lon)
     
-    if osrm_base and osrm_ai:
+    if matrix_route:
+        print("Using Precomputed City Matrix Route")
+        (base_coords, base_len, base_btime), (ai_coords, ai_len, ai_time) = matrix_route
+        if request.scenario.accident_zone:
+            incident_version = resources["city_matrix"].incident_version
+    elif osrm_base and osrm_ai:
         print("Using Fast Predefined OSRM Route")
         base_coords, base_len, base_btime = osrm_base
         ai_coords, ai_len, ai_time = osrm_ai
@@ -131,16 +444,21 @@ def optimize_single(request: SingleOptimizationRequest):
             ai_time *= 1.3
             base_btime *= 1.7
     else:
-        # Fallback to local OSMNX (Slow if graphml is missing)
-        print("Using local A* OSMNX Engine")
+        # Fallback to local A* / Contraction Hierarchy engine on the compact graph
+        print("Using local A* Compact Graph Engine")
         coords = [[start_lat, start_lon], [end_lat, end_lon]]
-        G = get_dynamic_road_graph(coords, global_graph=resources.get("tn_graph"))
-        G = apply_conditions(G, request.scenario)
-        
-        start_point = ox.distance.nearest_nodes(G, start_lon, start_lat)
-        end_point = ox.distance.nearest_nodes(G, end_lon, end_lat)
-        base_coords, base_len, base_btime, _ = optimize_single_segment(G, start_point, end_point, weight='length')
-        ai_coords, ai_len, _, ai_time = optimize_single_segment(G, start_point, end_point, weight='ai_time_min')
+        index, cg, ai_weight, hierarchies = get_local_routing_graph(request.scenario, coords)
+        # Both legs search the same space, or time_saved compares a whole-graph baseline with
+        # a corridor-restricted route: the hierarchies (whole graph) when there is one for
+        # each leg, else the corridor for both
+        base_hierarchy, ai_hierarchy = hierarchies.get("length_km"), hierarchies.get("ai_time_min")
+        corridor = None if base_hierarchy is not None and ai_hierarchy is not None else get_corridor(cg, coords)
+        if corridor is not None:
+            base_hierarchy = ai_hierarchy = None
+        incident_version = get_incident_version(request.scenario)
+        start_point, end_point = get_city_nodes([start_city, end_city], index)
+        base_coords, base_len, base_btime, _ = optimize_single_segment(cg, start_point, end_point, weight='length', hierarchy=base_hierarchy, corridor=corridor)
+        ai_coords, ai_len, _, ai_time = optimize_single_segment(cg, start_point, end_point, weight=ai_weight, hierarchy=ai_hierarchy, ai_weight=ai_weight, corridor=corridor)
 
         if not ai_coords:
             raise HTTPException(status_code=400, detail="No route found using local graph")
@@ -159,7 +477,7 @@ def optimize_single(request: SingleOptimizationRequest):
     base_score = round((alpha * base_btime) + (beta * base_fuel) + (gamma * base_len), 2)
     ai_score = round((alpha * ai_time) + (beta * ai_fuel) + (gamma * ai_len), 2)
 
-    return {
+    result = {
         "start_node": request.start_node,
         "end_node": request.end_node,
         "optimized_time": round(ai_time, 2),
@@ -174,24 +492,47 @@ def optimize_single(request: SingleOptimizationRequest):
         "ai_score": ai_score,
         "opt_coords": ai_coords,
         "base_coords": base_coords,
-        "co2_emission": round(ai_co2, 2)
+        "co2_emission": round(ai_co2, 2),
+        "incident_version": incident_version
     }
+    route_cache.put(cache_key, result)
+    return result
 
 @app.post("/optimize-multi")
 def optimize_multi(request: MultiOptimizationRequest):
-    df = resources["df"]
-    
+    if resources["cities"] is None:
+        raise HTTPException(status_code=500, detail="System not ready")
+    get_time_profile(request.scenario)
+
     # Extract all coords
-    all_cities = [request.origin] + request.stops + [request.destination]
-    coords_list = [get_city_coords(df, city) for city in all_cities]
+    all_cities = [get_city(city) for city in [request.origin] + request.stops + [request.destination]]
+    coords_list = [[city.lat, city.lon] for city in all_cities]
 
-    # Baseline Route (Unoptimized exact sequence)
-    base_coords, base_len, base_btime = get_baseline_osrm_multi_route(coords_list)
-    
-    # Fast Route Predefinition using OSRM Trip API (TSP Optimized sequence)
-    ai_coords, ai_len, ai_time = get_predefined_osrm_multi_routes(coords_list)
+    route_cache = resources["route_cache"]
+    cache_key = get_route_cache_key(coords_list, request)
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "start_node": request.origin, "end_node": request.destination, "stops": request.stops}
+
+    incident_version = None
+
+    # Precomputed all-pairs city routes need no routing at all. Otherwise the Baseline Route
+    # (Unoptimized exact sequence) and Fast Route Predefinition using the OSRM Table API
+    # (TSP Optimized sequence) are fetched concurrently
+    matrix_route = get_matrix_route([city.name for city in all_cities], request.scenario)
+    if matrix_route:
+        osrm_routes = matrix_route
+    elif request.scenario.time_of_day:
+        osrm_routes = ((None, None, None), (None, None, None))
+    else:
+        osrm_routes = get_osrm_multi_routes(coords_list)
+    (base_coords, base_len, base_btime), (ai_coords, ai_len, ai_time) = osrm_routes
     
-    if ai_coords:
+    if matrix_route:
+        print("Using Precomputed City Matrix Multi Route")
+        if request.scenario.accident_zone:
+            incident_version = resources["city_matrix"].incident_version
+    elif ai_coords:
         print("Using Fast Predefined OSRM Multi Route")
         
         # Apply Simulator Math Heuristically (OSRM Bypass)
@@ -205,12 +546,13 @@ def optimize_multi(request: MultiOptimizationRequest):
             ai_time *= 1.5
             if base_btime: base_btime *= 1.7
     else:
-        print("Using local A* OSMNX Engine for Multi-Stop")
-        G = get_dynamic_road_graph(coords_list, global_graph=resources.get("tn_graph"))
-        G = apply_conditions(G, request.scenario)
+        print("Using local A* Compact Graph Engine for Multi-Stop")
+        index, cg, ai_weight, _ = get_local_routing_graph(request.scenario, coords_list)
+        corridor = get_corridor(cg, coords_list)
+        incident_version = get_incident_version(request.scenario)
         
-        nodes_list = [ox.distance.nearest_nodes(G, lon, lat) for lat, lon in coords_list]
-        ai_coords, ai_len, _, ai_time = optimize_multi_stop_tsp(G, nodes_list, weight='ai_time_min')
+        nodes_list = get_city_nodes(all_cities, index)
+        ai_coords, ai_len, _, ai_time = optimize_multi_stop_tsp(cg, nodes_list, weight=ai_weight, ai_weight=ai_weight, corridor=corridor)
         
     if not ai_coords:
         raise HTTPException(status_code=400, detail="Could not optimize multi-stop route")
@@ -232,7 +574,7 @@ def optimize_multi(request: MultiOptimizationRequest):
     base_score = round(base_len * 0.5 + base_btime * 2 + base_fuel * 4, 2)
     ai_score = round(ai_len * 0.5 + ai_time * 2 + ai_fuel * 4, 2)
     
-    return {
+    result = {
         "start_node": request.origin,
         "end_node": request.destination,
         "stops": request.stops,
@@ -249,7 +591,113 @@ def optimize_multi(request: MultiOptimizationRequest):
         "ai_score": ai_score,
         "opt_coords": ai_coords,
         "base_coords": base_coords or [],
-        "co2_emission": round(ai_co2, 2)
+        "co2_emission": round(ai_co2, 2),
+        "incident_version": incident_version
+    }
+    route_cache.put(cache_key, result)
+    return result
+
+def get_fleet_cost_matrices(cities, scenario):
+    """
+    (durations_min, lengths_km, source) between the cities: the precomputed city matrix when
+    it covers them, else one-to-many searches on the statewide graph, else an OSRM table.
+    """
+    names = [city.name for city in cities]
+    matrix = resources["city_matrix"]
+    custom_incidents = scenario.accident_zone and scenario.incident_set != DEFAULT_INCIDENT_SET
+    if matrix is not None and matrix.has(names) and not custom_incidents and not scenario.time_of_day:
+        durations, lengths = matrix.costs(names, scenario_index(scenario))
+        return durations, lengths, "city_matrix"
+
+    coords = [[city.lat, city.lon] for city in cities]
+    if resources.get("tn_compact") is not None:
+        index, cg, ai_weight, _ = get_local_routing_graph(scenario, coords)
+        nodes = [cg.node_index(n) for n in get_city_nodes(cities, index)]
+        durations, lengths = graph_cost_matrices(cg, nodes, weight=ai_weight, corridor=get_corridor(cg, coords))
+        return durations, lengths, "local_graph"
+
+    durations, lengths = get_osrm_cost_matrices(coords)
+    if durations is None:
+        raise HTTPException(status_code=503, detail="No cost matrix source available")
+    durations = np.array(durations, dtype=np.float64)
+    # Apply Simulator Math Heuristically (OSRM Bypass), same factors as the multi-stop route
+    if scenario.heavy_rain:
+        durations *= 1.25
+    if scenario.accident_zone:
+        durations *= 1.4
+    if scenario.rush_hour:
+        durations *= 1.5
+    return durations, np.array(lengths, dtype=np.float64), "osrm"
+
+@app.post("/optimize-fleet")
+def optimize_fleet(request: FleetOptimizationRequest):
+    """
+    Capacitated multi-vehicle routing with time windows (CVRPTW): every vehicle leaves the
+    depot and returns to it, stops carry demand, time window and service time.
+    """
+    if resources["cities"] is None:
+        raise HTTPException(status_code=500, detail="System not ready")
+    get_time_profile(request.scenario)
+    if not request.vehicles:
+        raise HTTPException(status_code=400, detail="At least one vehicle is required")
+
+    cities = [get_city(request.depot)] + [get_city(stop.name) for stop in request.stops]
+    durations, lengths, source = get_fleet_cost_matrices(cities, request.scenario)
+    print(f"Solving CVRPTW: {len(request.stops)} stops, {len(request.vehicles)} vehicles ({source} costs)")
+
+    # Warm start: map stop names back to node indices, repeated names in request order
+    initial_routes = None
+    if request.initial_routes:
+        unused = {}
+        for node, stop in enumerate(request.stops, start=1):
+            unused.setdefault(get_city(stop.name).name, []).append(node)
+        initial_routes = [
+            [unused[name].pop(0) for name in (get_city(n).name for n in route) if unused.get(name)]
+            for route in request.initial_routes
+        ]
+
+    solution = solve_fleet(
+        durations,
+        demands=[0] + [stop.demand for stop in request.stops],
+        capacities=[vehicle.capacity for vehicle in request.vehicles],
+        time_windows=[(0, request.horizon)] + [(stop.ready_time, stop.due_date) for stop in request.stops],
+        service_times=[0] + [stop.service_time for stop in request.stops],
+        time_limit=request.time_limit,
+        initial_routes=initial_routes,
+    )
+    if solution is None:
+        raise HTTPException(status_code=400, detail="No feasible fleet plan found")
+
+    vehicles = []
+    for v, (vehicle, route) in enumerate(zip(request.vehicles, solution["routes"])):
+        legs = list(zip([0] + route, route + [0])) if route else []
+        distance = float(sum(lengths[i, j] for i, j in legs))
+        drive_time = float(sum(durations[i, j] for i, j in legs))
+        fuel, co2 = calculate_emission(distance, time_min=drive_time, vehicle_type=vehicle.vehicle_type)
+        vehicles.append({
+            "vehicle": v,
+            "vehicle_type": vehicle.vehicle_type,
+            "capacity": vehicle.capacity,
+            "load": solution["loads"][v],
+            "stops": [request.stops[node - 1].name for node in route],
+            "coords": [[cities[node].lat, cities[node].lon] for node in [0] + route + [0]],
+            "arrivals": [round(t, 2) for t in solution["arrivals"][v]],
+            "distance_km": round(distance, 2),
+            "drive_time": round(drive_time, 2),
+            "cost": round(fuel, 2),
+            "co2_emission": round(co2, 2),
+        })
+
+    return {
+        "depot": request.depot,
+        "cost_source": source,
+        "vehicles": vehicles,
+        "routes": [v["stops"] for v in vehicles],
+        "dropped": [request.stops[node - 1].name for node in solution["dropped"]],
+        "total_time": round(solution["total_time"], 2),
+        "total_distance": round(sum(v["distance_km"] for v in vehicles), 2),
+        "total_cost": round(sum(v["cost"] for v in vehicles), 2),
+        "co2_emission": round(sum(v["co2_emission"] for v in vehicles), 2),
     }
 
 @app.get("/report")
@@ -0,0 +1,241 @@
+"""
+Solomon VRPTW benchmark runner for the project's solvers.
+
+Runs every instance in a directory through the fleet (CVRPTW) and TSP solvers with fixed
+seeds and time budgets, and reports wall time, peak Python memory, objective and gap to
+the best known solution as CSV + JSON. Fleet runs stop after --solution-limit solutions
+(the time budget is only a backstop), so they give the same result on every machine.
+With --baseline it doubles as a regression gate:
+
+    python -m src.benchmark data/solomon --out reports/benchmark
+    python -m src.benchmark data/solomon --baseline reports/benchmark.json  # exit 1 on regression
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from src.preprocessing import parse_vrp_file, parse_vrp_vehicles
+from src.engines.fleet_engine import solve_fleet
+from src.engines.tsp_solver import solve_open_tsp
+
+SOLOMON_DIR = "data/solomon"
+OUTPUT_PREFIX = "reports/benchmark"
+
+# Best known total distances for the 100-customer Solomon instances (SINTEF TOP list,
+# hierarchical objective: vehicles first, then distance). Override or extend with --bks.
+SOLOMON_BKS = {
+    "C101": 827.3, "C102": 827.3, "C103": 826.3, "C104": 822.9, "C105": 827.3,
+    "C106": 827.3, "C107": 827.3, "C108": 827.3, "C109": 827.3,
+    "C201": 589.1, "C202": 589.1, "C203": 588.7, "C204": 588.1, "C205": 586.4,
+    "C206": 586.0, "C207": 585.8, "C208": 585.8,
+    "R101": 1650.80, "R102": 1486.12, "R103": 1292.68, "R104": 1007.31, "R105": 1377.11,
+    "R106": 1252.03, "R107": 1104.66, "R108": 960.88, "R109": 1194.73, "R110": 1118.84,
+    "R111": 1096.72, "R112": 982.14,
+    "R201": 1252.37, "R202": 1191.70, "R203": 939.50, "R204": 825.52, "R205": 994.42,
+    "R206": 906.14, "R207": 890.61, "R208": 726.82, "R209": 909.16, "R210": 939.37,
+    "R211": 885.71,
+    "RC101": 1696.95, "RC102": 1554.75, "RC103": 1261.67, "RC104": 1135.48,
+    "RC105": 1629.44, "RC106": 1424.73, "RC107": 1230.48, "RC108": 1139.82,
+    "RC201": 1406.94, "RC202": 1365.65, "RC203": 1049.62, "RC204": 798.46,
+    "RC205": 1297.65, "RC206": 1146.32, "RC207": 1061.14, "RC208": 828.14,
+}
+
+# Regression gate defaults: relative slack on wall time (noisy) and on objective
+TIME_TOLERANCE = 0.25
+OBJECTIVE_TOLERANCE = 0.01
+# OR-Tools solutions per fleet run; the search order is deterministic, wall time is not
+FLEET_SOLUTION_LIMIT = 200
+
+
+def load_solomon_instance(filepath, customers=None):
+    """
+    Depot + customers of a Solomon file as arrays. Travel time equals Euclidean distance,
+    as in the benchmark definition. customers keeps only the first N (the 25/50 variants).
+    """
+    df = parse_vrp_file(filepath)
+    fleet = parse_vrp_vehicles(filepath)
+    if df is None or fleet is None:
+        raise ValueError(f"Could not parse Solomon instance: {filepath}")
+    if customers:
+        df = df.iloc[:customers + 1]
+
+    name = os.path.splitext(os.path.basename(filepath))[0].upper()
+    xy = df[['x_coord', 'y_coord']].to_numpy(dtype=np.float64)
+    return {
+        "name": f"{name}.{customers}" if customers else name,
+        "distances": np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=2)),
+        "demand": df['demand'].to_numpy(),
+        "windows": list(zip(df['ready_time'].to_numpy(), df['due_date'].to_numpy())),
+        "service": df['service_time'].to_numpy(dtype=np.float64),
+        "vehicles": fleet[0],
+        "capacity": fleet[1],
+    }
+
+
+def run_fleet(instance, time_limit, solution_limit=FLEET_SOLUTION_LIMIT):
+    d = instance["distances"]
+    solution = solve_fleet(
+        d, instance["demand"], [instance["capacity"]] * instance["vehicles"],
+        time_windows=instance["windows"], service_times=instance["service"], time_limit=time_limit,
+        solution_limit=solution_limit,
+    )
+    if solution is None:
+        return {"objective": None, "vehicles_used": None, "dropped": len(d) - 1}
+    routes = [r for r in solution["routes"] if r]
+    distance = sum(d[[0] + r, r + [0]].sum() for r in routes)
+    return {"objective": float(distance), "vehicles_used": len(routes), "dropped": len(solution["dropped"])}
+
+
+def run_tsp(instance, time_limit, solution_limit=None):
+    # Single uncapacitated tour depot -> every customer -> depot, time windows ignored
+    d = instance["distances"]
+    idx = list(range(len(d))) + [0]
+    _, cost = solve_open_tsp(d[np.ix_(idx, idx)], time_budget=time_limit)
+    return {"objective": cost, "vehicles_used": 1, "dropped": 0}
+
+
+SOLVERS = {
+    "fleet": run_fleet,
+    "tsp": run_tsp,
+}
+
+
+def benchmark_instance(instance, solver, time_limit, seed, bks=None, solution_limit=FLEET_SOLUTION_LIMIT):
+    """
+    One timed run, then a second run with the same seed for peak memory: tracemalloc slows
+    every allocation, so it would skew the wall time the regression gate compares. Peak
+    memory is what Python allocated (OR-Tools' C++ heap is not traced).
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    start = time.perf_counter()
+    result = SOLVERS[solver](instance, time_limit, solution_limit)
+    wall_time = time.perf_counter() - start
+    if solver == "fleet" and wall_time >= time_limit:
+        print(f"⚠️ {instance['name']}: fleet search hit the {time_limit}s budget before {solution_limit} solutions, "
+              f"the result depends on machine speed")
+
+    random.seed(seed)
+    np.random.seed(seed)
+    tracemalloc.start()
+    SOLVERS[solver](instance, time_limit, solution_limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Only the fleet solver solves the problem the best known solutions are for
+    best = (bks or {}).get(instance["name"]) if solver == "fleet" else None
+    objective = result["objective"]
+    return {
+        "instance": instance["name"],
+        "solver": solver,
+        "customers": len(instance["distances"]) - 1,
+        **result,
+        "bks": best,
+        "gap_pct": round((objective - best) / best * 100, 3) if best and objective is not None else None,
+        "wall_time_s": round(wall_time, 4),
+        "peak_memory_mb": round(peak / 1e6, 3),
+    }
+
+
+def load_bks(path):
+    """Best known solutions from a JSON {"name": value} or a CSV with instance,bks columns."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            return {k.upper(): float(v) for k, v in json.load(f).items()}
+    df = pd.read_csv(path)
+    return {str(k).upper(): float(v) for k, v in zip(df['instance'], df['bks'])}
+
+
+def compare_to_baseline(results, baseline, time_tolerance=TIME_TOLERANCE, objective_tolerance=OBJECTIVE_TOLERANCE):
+    """Human readable regressions of results against a previous run's results."""
+    previous = {(r["instance"], r["solver"]): r for r in baseline}
+    failures = []
+    for r in results:
+        old = previous.get((r["instance"], r["solver"]))
+        if old is None:
+            continue
+        key = f"{r['instance']}/{r['solver']}"
+        if r["dropped"] > old["dropped"]:
+            failures.append(f"{key}: dropped {r['dropped']} customers (was {old['dropped']})")
+        if old["vehicles_used"] is not None and (r["vehicles_used"] or 0) > old["vehicles_used"]:
+            failures.append(f"{key}: {r['vehicles_used']} vehicles (was {old['vehicles_used']})")
+        if old["objective"] is not None:
+            if r["objective"] is None:
+                failures.append(f"{key}: no solution (was {old['objective']:.2f})")
+            elif r["objective"] > old["objective"] * (1 + objective_tolerance):
+                failures.append(f"{key}: objective {r['objective']:.2f} (was {old['objective']:.2f})")
+        # Fleet runs are gated on their reproducible result only (objective, vehicles, dropped)
+        if r["solver"] != "fleet" and r["wall_time_s"] > old["wall_time_s"] * (1 + time_tolerance) + 0.05:
+            failures.append(f"{key}: wall time {r['wall_time_s']:.3f}s (was {old['wall_time_s']:.3f}s)")
+    return failures
+
+
+def write_results(results, config, prefix):
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    pd.DataFrame(results).to_csv(f"{prefix}.csv", index=False)
+    with open(f"{prefix}.json", "w") as f:
+        json.dump({"config": config, "results": results}, f, indent=2)
+    print(f"Saved {prefix}.csv and {prefix}.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the routing solvers on Solomon VRPTW instances.")
+    parser.add_argument("directory", nargs="?", default=SOLOMON_DIR, help="Directory of Solomon .txt files")
+    parser.add_argument("--solvers", nargs="+", choices=list(SOLVERS), default=list(SOLVERS))
+    parser.add_argument("--customers", type=int, default=None, help="Use only the first N customers of each instance")
+    parser.add_argument("--time-limit", type=float, default=2.0, help="Solver time budget per instance (seconds)")
+    parser.add_argument("--solution-limit", type=int, default=FLEET_SOLUTION_LIMIT,
+                        help="Fleet solver solutions per instance, for reproducible runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bks", default=None, help="JSON/CSV of best known solutions replacing the built-in table")
+    parser.add_argument("--out", default=OUTPUT_PREFIX, help="Output path prefix for .csv/.json")
+    parser.add_argument("--baseline", default=None, help="Previous benchmark JSON to gate against")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--objective-tolerance", type=float, default=OBJECTIVE_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    files = sorted(glob.glob(os.path.join(args.directory, "*.txt")))
+    if not files:
+        print(f"No .txt files found in the directory: {args.directory}")
+        return 1
+    bks = load_bks(args.bks) if args.bks else SOLOMON_BKS
+    # Read before writing, --out may point at the baseline itself
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = []
+    for path in files:
+        instance = load_solomon_instance(path, args.customers)
+        for solver in args.solvers:
+            r = benchmark_instance(instance, solver, args.time_limit, args.seed, bks, args.solution_limit)
+            results.append(r)
+            gap = f"{r['gap_pct']:+.2f}%" if r["gap_pct"] is not None else "-"
+            objective = f"{r['objective']:.2f}" if r["objective"] is not None else "-"
+            print(f"{r['instance']:<10} {solver:<6} obj={objective:<10} gap={gap:<8} "
+                  f"vehicles={r['vehicles_used']} dropped={r['dropped']} "
+                  f"time={r['wall_time_s']:.3f}s peak={r['peak_memory_mb']:.2f}MB")
+
+    config = {k: getattr(args, k) for k in ("directory", "solvers", "customers", "time_limit", "solution_limit", "seed", "bks")}
+    write_results(results, config, args.out)
+
+    if baseline is not None:
+        failures = compare_to_baseline(results, baseline, args.time_tolerance, args.objective_tolerance)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            return 1
+        print("✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,6 @@ import pandas as pd
 import numpy as np
 from faker import Faker
 import os
-import math
 
 # List of 30 Major US Cities with Coordinates
 # List of Major Cities in Tamil Nadu, India
@@ -42,77 +41,143 @@ CITIES = [
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
+    on the earth (specified in decimal degrees).
+    Accepts scalars or broadcastable NumPy arrays.
     """
     R = 6371  # Radius of earth in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2) * math.sin(dlat/2) + \
-        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-        math.sin(dlon/2) * math.sin(dlon/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     d = R * c
     return d
 
-def generate_logistics_data(num_records=2000, num_cities=30, data_path="data/logistics_data.csv"):
+TIME_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+ROAD_FACTOR = 1.12 # Constant road geometry
+CHUNK_SIZE = 1_000_000 # Rows per generated batch / Parquet row group
+
+def load_cities(path):
+    """Reads an arbitrary city list (name, lat, lon) from a CSV or JSON file."""
+    if path.endswith(".json"):
+        return pd.read_json(path)[['name', 'lat', 'lon']].to_dict(orient='records')
+    return pd.read_csv(path)[['name', 'lat', 'lon']].to_dict(orient='records')
+
+def _records(names, lats, lons, dist, start, end, rng, max_traffic):
+    """One column-wise batch of records for the (start, end) city index arrays."""
+    n = len(start)
+    return pd.DataFrame({
+        "start_location": pd.Categorical.from_codes(start, categories=names),
+        "start_lat": lats[start], "start_lon": lons[start],
+        "end_location": pd.Categorical.from_codes(end, categories=names),
+        "end_lat": lats[end], "end_lon": lons[end],
+        "distance_km": dist[start, end],
+        "delivery_demand": rng.integers(10, 100, n),
+        "fuel_cost_per_km": np.round(rng.uniform(0.12, 0.22, n), 2),
+        "traffic_factor": np.round(rng.uniform(1.0, max_traffic, n), 2),
+        "time_of_day": pd.Categorical.from_codes(rng.integers(0, len(TIME_OF_DAY), n), categories=TIME_OF_DAY),
+    })
+
+def iter_logistics_data(cities, num_records, seed=None, chunk_size=CHUNK_SIZE):
     """
-    Generates a high-density synthetic logistics dataset with a guaranteed bidirectional mesh.
-    Ensures that every single city is directly connected to every other city.
+    Yields the dataset as DataFrame batches of at most chunk_size rows: first the complete
+    bidirectional mesh, then the traffic variance records.
     """
-    cities = CITIES[:num_cities]
-    data = []
-    
-    # 1. Build a COMPLETE BIdirectional Mesh (The Foundation)
+    names = pd.Index([c['name'] for c in cities])
+    lats = np.array([c['lat'] for c in cities], dtype=np.float64)
+    lons = np.array([c['lon'] for c in cities], dtype=np.float64)
+    n = len(cities)
+    rng = np.random.default_rng(seed)
+
+    # Pairwise road distance matrix, computed once
+    dist = np.round(haversine_distance(lats[:, None], lons[:, None], lats[None, :], lons[None, :]) * ROAD_FACTOR, 2)
+
+    # 1. Build a COMPLETE BIdirectional Mesh (The Foundation): A -> B followed by B -> A per pair
     print("Generating fully connected bidirectional mesh...")
-    for i in range(len(cities)):
-        for j in range(i + 1, len(cities)): # Only calculate once per pair
-            start = cities[i]
-            end = cities[j]
-            dist = haversine_distance(start['lat'], start['lon'], end['lat'], end['lon'])
-            road_distance = round(dist * 1.12, 2) # Constant road geometry
-            
-            # Add Direction A -> B
-            data.append({
-                "start_location": start['name'], "start_lat": start['lat'], "start_lon": start['lon'],
-                "end_location": end['name'], "end_lat": end['lat'], "end_lon": end['lon'],
-                "distance_km": road_distance, "delivery_demand": np.random.randint(10, 100),
-                "fuel_cost_per_km": round(np.random.uniform(0.12, 0.22), 2),
-                "traffic_factor": round(np.random.uniform(1.0, 1.5), 2),
-                "time_of_day": np.random.choice(['morning', 'afternoon', 'evening', 'night'])
-            })
-            
-            # Add Direction B -> A (Parallel edge)
-            data.append({
-                "start_location": end['name'], "start_lat": end['lat'], "start_lon": end['lon'],
-                "end_location": start['name'], "end_lat": start['lat'], "end_lon": start['lon'],
-                "distance_km": road_distance, "delivery_demand": np.random.randint(10, 100),
-                "fuel_cost_per_km": round(np.random.uniform(0.12, 0.22), 2),
-                "traffic_factor": round(np.random.uniform(1.0, 1.5), 2),
-                "time_of_day": np.random.choice(['morning', 'afternoon', 'evening', 'night'])
-            })
+    # Pairs are enumerated per block of rows i (with every j > i), so no allocation grows
+    # with the full n * (n - 1) mesh; a block ends before it would exceed chunk_size rows
+    mesh_rows = n * (n - 1)
+    first = 0
+    while first < n - 1:
+        last, rows = first, 0
+        while last < n - 1 and (rows == 0 or rows + 2 * (n - 1 - last) <= chunk_size):
+            rows += 2 * (n - 1 - last)
+            last += 1
+        i = np.repeat(np.arange(first, last), n - 1 - np.arange(first, last))
+        j = np.concatenate([np.arange(k + 1, n) for k in range(first, last)])
+        start = np.column_stack([i, j]).ravel()
+        end = np.column_stack([j, i]).ravel()
+        # A single row i can exceed chunk_size for huge city lists; split it further
+        for lo in range(0, len(start), chunk_size):
+            yield _records(names, lats, lons, dist, start[lo:lo + chunk_size], end[lo:lo + chunk_size], rng, max_traffic=1.5)
+        first = last
 
     # 2. Add high-traffic variance records to teach AI about dynamic routing
     print("Adding dynamic traffic variance data...")
-    remaining = num_records - len(data)
-    for _ in range(max(0, remaining)):
-        pair = np.random.choice(len(cities), 2, replace=False)
-        start, end = cities[pair[0]], cities[pair[1]]
-        dist = haversine_distance(start['lat'], start['lon'], end['lat'], end['lon'])
-        
-        data.append({
-            "start_location": start['name'], "start_lat": start['lat'], "start_lon": start['lon'],
-            "end_location": end['name'], "end_lat": end['lat'], "end_lon": end['lon'],
-            "distance_km": round(dist * 1.12, 2),
-            "delivery_demand": np.random.randint(10, 100),
-            "fuel_cost_per_km": round(np.random.uniform(0.12, 0.22), 2),
-            "traffic_factor": round(np.random.uniform(1.0, 4.0), 2), # Extreme traffic
-            "time_of_day": np.random.choice(['morning', 'afternoon', 'evening', 'night'])
-        })
-
-    df = pd.DataFrame(data)
-    os.makedirs(os.path.dirname(data_path), exist_ok=True)
-    df.to_csv(data_path, index=False)
-    print(f"SUCCESS: Enhanced dataset with {len(df)} records saved to {data_path}")
+    remaining = max(0, num_records - mesh_rows)
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        start = rng.integers(0, n, size)
+        end = (start + rng.integers(1, n, size)) % n # Any other city, uniformly
+        yield _records(names, lats, lons, dist, start, end, rng, max_traffic=4.0) # Extreme traffic
+        remaining -= size
+
+def _write_parquet(batches, data_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for df in batches:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(data_path, table.schema, compression="zstd")
+            else:
+                # Dictionaries are re-encoded per batch; keep the first batch's schema
+                table = table.cast(writer.schema)
+            writer.write_table(table, row_group_size=len(df))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def _write_csv(batches, data_path):
+    rows = 0
+    for k, df in enumerate(batches):
+        df.to_csv(data_path, index=False, mode="w" if k == 0 else "a", header=k == 0)
+        rows += len(df)
+    return rows
+
+def generate_logistics_data(num_records=2000, num_cities=30, data_path="data/logistics_data.csv",
+                            cities=None, seed=None, chunk_size=CHUNK_SIZE):
+    """
+    Generates a high-density synthetic logistics dataset with a guaranteed bidirectional mesh.
+    Ensures that every single city is directly connected to every other city.
+    cities defaults to the first num_cities of CITIES. Records are generated and written in
+    batches of chunk_size, to CSV or (for a .parquet path) one Parquet row group per batch.
+    """
+    cities = cities if cities is not None else CITIES[:num_cities]
+    os.makedirs(os.path.dirname(data_path) or ".", exist_ok=True)
+
+    batches = iter_logistics_data(cities, num_records, seed=seed, chunk_size=chunk_size)
+    if data_path.endswith(".parquet"):
+        rows = _write_parquet(batches, data_path)
+    else:
+        rows = _write_csv(batches, data_path)
+    print(f"SUCCESS: Enhanced dataset with {rows} records saved to {data_path}")
 
 if __name__ == '__main__':
-    generate_logistics_data(num_records=500)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the synthetic logistics dataset.")
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--cities", default=None, help="CSV/JSON of name,lat,lon (default: built-in Tamil Nadu cities)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="data/logistics_data.csv", help="Output .csv or .parquet path")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    generate_logistics_data(
+        num_records=args.records, data_path=args.out, seed=args.seed, chunk_size=args.chunk_size,
+        cities=load_cities(args.cities) if args.cities else None,
+    )
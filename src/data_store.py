@@ -0,0 +1,100 @@
+"""
+Columnar storage for the logistics dataset.
+
+The CSV written by data_generator stays the interchange format; Feather (Arrow IPC) and
+Parquet copies load with typed / categorical columns, memory-mapped, and with column
+projection so a process only materializes what it uses:
+
+    python -m src.data_store data/logistics_data.csv data/logistics_data.feather
+"""
+import os
+import sys
+import pandas as pd
+
+LOGISTICS_DATA_PATH = os.environ.get("LOGISTICS_DATA_PATH", "data/logistics_data.csv")
+
+# Preferred formats when several copies of the dataset sit next to each other
+COLUMNAR_EXTENSIONS = (".feather", ".arrow", ".parquet")
+
+CATEGORICAL_COLUMNS = ["start_location", "end_location", "time_of_day"]
+# Numeric columns keep the types pandas infers from the CSV: the model features and the
+# cost/time targets (preprocessing.preprocess_data) must not change with the file format
+DTYPES = {
+    "start_location": "category",
+    "start_lat": "float64",
+    "start_lon": "float64",
+    "end_location": "category",
+    "end_lat": "float64",
+    "end_lon": "float64",
+    "distance_km": "float64",
+    "delivery_demand": "int64",
+    "fuel_cost_per_km": "float64",
+    "traffic_factor": "float64",
+    "time_of_day": "category",
+}
+
+# What the API needs: the city registry is built from these
+CITY_COLUMNS = ["start_location", "start_lat", "start_lon", "end_location", "end_lat", "end_lon"]
+
+
+def resolve_data_path(path=LOGISTICS_DATA_PATH):
+    """
+    The columnar sibling of path (same name, .feather/.arrow/.parquet) if one exists and is
+    not older than path itself, else path.
+    """
+    stem, _ = os.path.splitext(path)
+    source_mtime = os.path.getmtime(path) if os.path.exists(path) else 0
+    for ext in COLUMNAR_EXTENSIONS:
+        candidate = stem + ext
+        if os.path.exists(candidate) and os.path.getmtime(candidate) >= source_mtime:
+            return candidate
+    return path
+
+
+def load_logistics_data(path=LOGISTICS_DATA_PATH, columns=None, memory_map=True, resolve=True):
+    """
+    Loads the dataset, preferring a columnar copy next to path. Only `columns` are read
+    (all by default). Feather files are memory-mapped, so numeric columns of uncompressed
+    files are backed by the page cache and shared between worker processes.
+    """
+    if resolve:
+        path = resolve_data_path(path)
+    if path.endswith((".feather", ".arrow")):
+        from pyarrow import feather
+        table = feather.read_table(path, columns=columns, memory_map=memory_map)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns, memory_map=memory_map)
+    return pd.read_csv(path, usecols=columns, dtype={c: t for c, t in DTYPES.items() if columns is None or c in columns})
+
+
+def to_columnar(df):
+    """Applies the dataset's column types (categoricals for names and time of day)."""
+    return df.astype({c: t for c, t in DTYPES.items() if c in df.columns})
+
+
+def save_logistics_data(df, path):
+    """
+    Writes df as Feather or Parquet (by extension). Feather is written uncompressed so it
+    can be memory-mapped without a decode step.
+    """
+    df = to_columnar(df)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith((".feather", ".arrow")):
+        df.reset_index(drop=True).to_feather(path, compression="uncompressed")
+    elif path.endswith(".parquet"):
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        raise ValueError(f"Unsupported columnar format: {path}")
+
+
+def convert_logistics_data(source, destination):
+    save_logistics_data(load_logistics_data(source, resolve=False), destination)
+    print(f"Converted {source} -> {destination}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m src.data_store SOURCE DESTINATION(.feather|.parquet)")
+        sys.exit(1)
+    convert_logistics_data(sys.argv[1], sys.argv[2])
@@ -0,0 +1,161 @@
+import os
+import time
+import numpy as np
+
+from src.engines.compact_graph import path_metrics
+from src.engines.contraction import graph_fingerprint
+from src.engines.matrix_engine import compute_matrix, set_pool_graph
+from src.engines.polyline import encode_polyline, decode_polyline
+from src.engines.spatial_index import SpatialIndex
+from src.engines.tsp_solver import solve_open_tsp
+from src.engines.weight_engine import NUM_SCENARIOS
+
+CITY_MATRIX_PATH = "data/city_matrix.npz"
+
+
+class CityMatrix:
+    """
+    All-pairs routes between a fixed list of cities, computed offline on the local graph.
+
+    Baseline (shortest length) routes are scenario independent; optimized routes are stored
+    per scenario row (see weight_engine.scenario_index). Geometries are deduplicated encoded
+    polylines addressed by id, -1 meaning the pair is unreachable.
+    """
+
+    def __init__(self, names, base_length, base_time, base_paths, ai_length, ai_time, ai_paths,
+                 polyline_offsets, polyline_blob, fingerprint, incident_version):
+        self.names = [str(n) for n in names]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.base_length = base_length
+        self.base_time = base_time
+        self.base_paths = base_paths
+        self.ai_length = ai_length
+        self.ai_time = ai_time
+        self.ai_paths = ai_paths
+        self.polyline_offsets = polyline_offsets
+        self.polyline_blob = polyline_blob
+        self.fingerprint = fingerprint
+        self.incident_version = incident_version
+
+    def has(self, names):
+        return all(name in self.index for name in names)
+
+    def coords(self, path_id):
+        lo, hi = self.polyline_offsets[path_id], self.polyline_offsets[path_id + 1]
+        return decode_polyline(self.polyline_blob[lo:hi].tobytes().decode("ascii"))
+
+    def costs(self, names, scenario):
+        """(durations, lengths_km) submatrices between names for one scenario row."""
+        ids = [self.index[name] for name in names]
+        ix = np.ix_(ids, ids)
+        return self.ai_time[scenario][ix].astype(np.float64), self.ai_length[scenario][ix].astype(np.float64)
+
+    def _stitch(self, legs, length, time_, paths):
+        coords = []
+        for k, (i, j) in enumerate(legs):
+            if paths[i, j] < 0:
+                return None
+            leg = self.coords(paths[i, j])
+            # Avoid duplicating the shared city node between consecutive legs
+            coords.extend(leg if k == len(legs) - 1 else leg[:-1])
+        total_len = float(sum(length[i, j] for i, j in legs))
+        total_time = float(sum(time_[i, j] for i, j in legs))
+        return coords, total_len, total_time
+
+    def route(self, names, scenario):
+        """
+        Baseline and optimized routes through names (origin, stops..., destination).
+        The baseline keeps the given stop order; the optimized route reorders the middle
+        stops on the scenario's travel times. Returns (baseline, optimized), each
+        (coords, length_km, time_min), or None if some leg is unreachable.
+        """
+        ids = [self.index[name] for name in names]
+        base_legs = list(zip(ids, ids[1:]))
+        baseline = self._stitch(base_legs, self.base_length, self.base_time, self.base_paths)
+
+        durations = self.ai_time[scenario][np.ix_(ids, ids)]
+        order, _ = solve_open_tsp(durations)
+        ordered = [ids[k] for k in order]
+        optimized = self._stitch(list(zip(ordered, ordered[1:])), self.ai_length[scenario],
+                                 self.ai_time[scenario], self.ai_paths[scenario])
+        if baseline is None or optimized is None:
+            return None
+        return baseline, optimized
+
+    def save(self, path):
+        np.savez_compressed(
+            path, names=np.array(self.names), base_length=self.base_length, base_time=self.base_time,
+            base_paths=self.base_paths, ai_length=self.ai_length, ai_time=self.ai_time,
+            ai_paths=self.ai_paths, polyline_offsets=self.polyline_offsets,
+            polyline_blob=self.polyline_blob, fingerprint=self.fingerprint,
+            incident_version=self.incident_version,
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(
+            data["names"], data["base_length"], data["base_time"], data["base_paths"],
+            data["ai_length"], data["ai_time"], data["ai_paths"], data["polyline_offsets"],
+            data["polyline_blob"], str(data["fingerprint"]), str(data["incident_version"]),
+        )
+
+
+def build_city_matrix(cg, cities, scenario_weights, incident_version, workers=None):
+    """
+    Routes every ordered city pair on cg: once on length for the baseline and once per
+    scenario row of scenario_weights. cities is a list of {"name", "lat", "lon"} dicts.
+    """
+    n = len(cities)
+    set_pool_graph(cg)
+    nodes, _ = SpatialIndex(cg).snap_nodes([[c["lat"], c["lon"]] for c in cities])
+
+    polylines = {}
+    def polyline_id(coords):
+        return polylines.setdefault(encode_polyline(coords), len(polylines))
+
+    def fill(matrix, time_weight):
+        length = np.full((n, n), np.inf, dtype=np.float32)
+        time_ = np.full((n, n), np.inf, dtype=np.float32)
+        paths = np.full((n, n), -1, dtype=np.int32)
+        for i in range(n):
+            for j in range(n):
+                edges = matrix.edges(i, j) if i != j else []
+                if edges is None:
+                    continue
+                coords, l, _, t = path_metrics(cg, int(nodes[i]), edges, ai_weight=time_weight)
+                length[i, j] = l
+                time_[i, j] = t
+                paths[i, j] = polyline_id(coords)
+        return length, time_, paths
+
+    start = time.time()
+    base_length, base_time, base_paths = fill(compute_matrix(cg, nodes, weight="length_km", workers=workers), "base_time_min")
+    ai = [fill(compute_matrix(cg, nodes, weight=scenario_weights[s], workers=workers), scenario_weights[s])
+          for s in range(NUM_SCENARIOS)]
+    print(f"Routed {n * (n - 1)} city pairs x {NUM_SCENARIOS + 1} profiles in {time.time() - start:.1f}s")
+
+    encoded = [p.encode("ascii") for p in polylines]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in encoded], out=offsets[1:])
+    return CityMatrix(
+        [c["name"] for c in cities], base_length, base_time, base_paths,
+        np.stack([a[0] for a in ai]), np.stack([a[1] for a in ai]), np.stack([a[2] for a in ai]),
+        offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8), graph_fingerprint(cg), incident_version,
+    )
+
+
+def load_city_matrix(path=CITY_MATRIX_PATH, cg=None, incident_version=None):
+    """
+    Loads the precomputed matrix. When the graph / default incident layer are loaded too,
+    a matrix built from a different one is ignored; without them it is used as is.
+    """
+    if not os.path.exists(path):
+        return None
+    matrix = CityMatrix.load(path)
+    stale_graph = cg is not None and matrix.fingerprint != graph_fingerprint(cg)
+    stale_incidents = incident_version is not None and matrix.incident_version != incident_version
+    if stale_graph or stale_incidents:
+        print(f"⚠️ Ignoring stale city matrix {path}")
+        return None
+    return matrix
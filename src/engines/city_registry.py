@@ -0,0 +1,100 @@
+import difflib
+import hashlib
+import json
+import re
+from collections import namedtuple
+import numpy as np
+
+City = namedtuple("City", ["name", "lat", "lon", "node"])
+
+# Common alternate / historical spellings of the dataset's cities
+CITY_ALIASES = {
+    "Madras": "Chennai",
+    "Kovai": "Coimbatore",
+    "Trichy": "Tiruchirappalli",
+    "Tiruchi": "Tiruchirappalli",
+    "Tuticorin": "Thoothukudi",
+    "Udhagamandalam": "Ooty",
+    "Ootacamund": "Ooty",
+    "Tanjore": "Thanjavur",
+    "Conjeevaram": "Kanchipuram",
+    "Kancheepuram": "Kanchipuram",
+    "Tirupur": "Tiruppur",
+    "Nellai": "Tirunelveli",
+    "Kudanthai": "Kumbakonam",
+}
+
+FUZZY_CUTOFF = 0.8
+FUZZY_CACHE_SIZE = 4096
+
+
+def normalize_city_name(name):
+    """Case, whitespace and punctuation insensitive lookup key."""
+    return re.sub(r"[^a-z0-9]", "", str(name).casefold())
+
+
+class CityRegistry:
+    """
+    Every known city built once at startup: exact, alias and fuzzy lookup by name to
+    (lat, lon, graph node), plus the serialized /cities payload and its ETag.
+    """
+
+    def __init__(self, cities, aliases=CITY_ALIASES):
+        self.cities = {c.name: c for c in sorted(cities, key=lambda c: c.name)}
+        self._keys = {normalize_city_name(name): name for name in self.cities}
+        for alias, name in aliases.items():
+            if name in self.cities:
+                self._keys.setdefault(normalize_city_name(alias), name)
+        self._fuzzy = {}
+
+        self.payload = json.dumps({"cities": [
+            {"name": c.name, "lat": c.lat, "lon": c.lon} for c in self.cities.values()
+        ]}).encode()
+        self.etag = '"' + hashlib.sha1(self.payload).hexdigest() + '"'
+
+    @classmethod
+    def from_dataframe(cls, df, spatial_index=None):
+        """
+        Distinct cities from the start/end columns of the logistics data (first seen
+        coordinates win), snapped once to the statewide graph when it is loaded.
+        """
+        names = np.concatenate([df["start_location"].to_numpy(), df["end_location"].to_numpy()])
+        lats = np.concatenate([df["start_lat"].to_numpy(), df["end_lat"].to_numpy()])
+        lons = np.concatenate([df["start_lon"].to_numpy(), df["end_lon"].to_numpy()])
+        _, first = np.unique(names, return_index=True)
+        names, lats, lons = names[first], lats[first].astype(float), lons[first].astype(float)
+
+        nodes = [None] * len(names)
+        if spatial_index is not None and len(names):
+            nodes = [int(n) for n in spatial_index.nearest_nodes(np.column_stack([lats, lons]))]
+        return cls([City(str(n), float(la), float(lo), node) for n, la, lo, node in zip(names, lats, lons, nodes)])
+
+    def __len__(self):
+        return len(self.cities)
+
+    def __contains__(self, name):
+        return self.resolve(name) is not None
+
+    def resolve(self, name):
+        """Canonical city name for an exact, alias or close fuzzy match, or None."""
+        if name in self.cities:
+            return name
+        key = normalize_city_name(name)
+        if key in self._keys:
+            return self._keys[key]
+        if key in self._fuzzy:
+            return self._fuzzy[key]
+        match = difflib.get_close_matches(key, self._keys, n=1, cutoff=FUZZY_CUTOFF)
+        resolved = self._keys[match[0]] if match else None
+        if len(self._fuzzy) < FUZZY_CACHE_SIZE:
+            self._fuzzy[key] = resolved
+        return resolved
+
+    def get(self, name):
+        resolved = self.resolve(name)
+        return self.cities[resolved] if resolved is not None else None
+
+    def suggestions(self, name, n=3):
+        key = normalize_city_name(name)
+        matches = difflib.get_close_matches(key, self._keys, n=n, cutoff=0.5)
+        return list(dict.fromkeys(self._keys[m] for m in matches))
@@ -0,0 +1,346 @@
+import heapq
+import math
+from collections import OrderedDict
+from itertools import compress
+import numpy as np
+
+# Weight columns compiled for every edge, in minutes / kilometres like weight_engine writes them
+WEIGHT_COLUMNS = ("length_km", "base_time_min", "ai_time_min")
+
+# Raw osmnx attribute names accepted wherever a weight column is expected
+WEIGHT_ALIASES = {"length": "length_km", "travel_time": "base_time_min"}
+
+EARTH_RADIUS_KM = 6371.0
+
+# Weight arrays whose A* scale is remembered per graph (scenario rows, profiles, corridor weights)
+HEURISTIC_CACHE_SIZE = 32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great circle distance in km. Accepts scalars or NumPy arrays (degrees).
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CompactGraph:
+    """
+    Read-only CSR representation of a road graph.
+
+    Nodes are renumbered 0..n-1 in ascending OSM id order, so `node_ids` maps an index back
+    to its OSM id and `node_index` is a binary search. The out-edges of node u are
+    `targets[offsets[u]:offsets[u+1]]`; every weight column is a float32 array aligned with
+    `targets`, so an edge id is simply its position in the CSR arrays.
+    """
+
+    def __init__(self, node_ids, lat, lon, offsets, targets, weights, highway=None, highway_names=()):
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.highway = highway
+        self.highway_names = tuple(highway_names)
+        self._sources = None
+        self._straight_km = None
+        self._heuristic_scales = OrderedDict()
+        self._highway_masks = {}
+        # Set by contraction.graph_fingerprint (or a graph store) on first use
+        self.fingerprint = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    @property
+    def sources(self):
+        """Source node index of every edge (materialized lazily, only bulk ops need it)."""
+        if self._sources is None:
+            counts = np.diff(self.offsets)
+            self._sources = np.repeat(np.arange(len(self), dtype=np.int32), counts)
+        return self._sources
+
+    @property
+    def straight_km(self):
+        """Great circle length of every edge in km (computed once, shared by all weight columns)."""
+        if self._straight_km is None:
+            self._straight_km = haversine_km(self.lat[self.sources], self.lon[self.sources],
+                                             self.lat[self.targets], self.lon[self.targets])
+        return self._straight_km
+
+    def adopt_edge_arrays(self, sources=None, straight_km=None, highway_masks=None):
+        """
+        Installs per-edge arrays computed elsewhere for this graph (e.g. memory-mapped from
+        shared_resources) instead of computing private copies on first use.
+        """
+        if sources is not None:
+            self._sources = sources
+        if straight_km is not None:
+            self._straight_km = straight_km
+        for classes, mask in (highway_masks or {}).items():
+            self._highway_masks[tuple(classes)] = mask
+
+    def highway_mask(self, classes):
+        """
+        Boolean mask over all edges of the road classes kept, substring matched like the
+        Overpass regex filter (primary also keeps primary_link); None without highway data.
+        Cached per class set, there are only a few (see corridor.CORRIDOR_THRESHOLDS).
+        """
+        if self.highway is None:
+            return None
+        classes = tuple(classes)
+        if classes not in self._highway_masks:
+            ok = np.array([any(c in name for c in classes) for name in self.highway_names] or [True], dtype=bool)
+            self._highway_masks[classes] = ok[self.highway]
+        return self._highway_masks[classes]
+
+    @property
+    def nbytes(self):
+        arrays = [self.node_ids, self.lat, self.lon, self.offsets, self.targets, *self.weights.values()]
+        if self.highway is not None:
+            arrays.append(self.highway)
+        return sum(a.nbytes for a in arrays)
+
+    def node_index(self, osm_ids):
+        """Maps one OSM node id (or an array of them) to compact indices."""
+        ids = np.asarray(osm_ids, dtype=self.node_ids.dtype)
+        idx = np.searchsorted(self.node_ids, ids)
+        idx_clipped = np.minimum(idx, len(self.node_ids) - 1)
+        if np.any(self.node_ids[idx_clipped] != ids):
+            raise KeyError(f"Node(s) not in graph: {osm_ids}")
+        return int(idx_clipped) if idx_clipped.ndim == 0 else idx_clipped
+
+    def weight(self, weight):
+        """Resolves a column name (or alias) to its array; arrays are passed through."""
+        if isinstance(weight, str):
+            return self.weights[WEIGHT_ALIASES.get(weight, weight)]
+        return weight
+
+    def heuristic_scale(self, weight):
+        """
+        Largest factor k such that k * straight-line km never overestimates the cost of an
+        edge. By the triangle inequality k * haversine(v, target) is then an admissible A*
+        heuristic for any path, whatever the unit of the weight column.
+
+        Cached by array identity, so pass the same array object for repeated searches (a
+        fresh view such as matrix[row] per request misses the cache every time).
+        """
+        w = self.weight(weight)
+        cached = self._heuristic_scales.get(id(w))
+        if cached is not None and cached[0] is w:
+            self._heuristic_scales.move_to_end(id(w))
+            return cached[1]
+
+        straight = self.straight_km
+        valid = straight > 1e-6
+        scale = float(np.min(w[valid] / straight[valid])) if np.any(valid) else 0.0
+        # Float32 weights: stay a hair under the bound so rounding can't break admissibility
+        scale = max(scale, 0.0) * (1 - 1e-5)
+        self._heuristic_scales[id(w)] = (w, scale)
+        while len(self._heuristic_scales) > HEURISTIC_CACHE_SIZE:
+            self._heuristic_scales.popitem(last=False)
+        return scale
+
+
+def compile_graph(G):
+    """
+    Compiles a networkx (Multi)DiGraph as loaded by osmnx into a CompactGraph.
+    Missing weight attributes fall back to the same defaults weight_engine uses.
+    """
+    node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+    lat = np.array([G.nodes[n]['y'] for n in node_ids.tolist()], dtype=np.float64)
+    lon = np.array([G.nodes[n]['x'] for n in node_ids.tolist()], dtype=np.float64)
+
+    src, dst = [], []
+    columns = {name: [] for name in WEIGHT_COLUMNS}
+    highway_codes, highway_names = [], {}
+    for u, v, data in G.edges(data=True):
+        src.append(u)
+        dst.append(v)
+        length_km = data.get('length_km', data.get('length', 100) / 1000.0)
+        base_time = data.get('base_time_min', data.get('travel_time', length_km * 60) / 60.0)
+        columns["length_km"].append(length_km)
+        columns["base_time_min"].append(base_time)
+        columns["ai_time_min"].append(data.get('ai_time_min', base_time))
+        hw = str(data.get('highway', ''))
+        highway_codes.append(highway_names.setdefault(hw, len(highway_names)))
+
+    src = np.searchsorted(node_ids, np.array(src, dtype=np.int64))
+    dst = np.searchsorted(node_ids, np.array(dst, dtype=np.int64))
+    order = np.argsort(src, kind="stable")
+
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(node_ids)), out=offsets[1:])
+    weights = {name: np.array(col, dtype=np.float32)[order] for name, col in columns.items()}
+    highway = np.array(highway_codes, dtype=np.uint16)[order]
+
+    return CompactGraph(
+        node_ids, lat, lon, offsets, dst[order].astype(np.int32), weights,
+        highway=highway, highway_names=sorted(highway_names, key=highway_names.get),
+    )
+
+
+def edge_subgraph(cg, mask):
+    """
+    CompactGraph of the edges where mask (over all edges) is True and the nodes they
+    touch, e.g. a corridor graph narrowed to fewer road classes with cg.highway_mask.
+    """
+    edges = np.flatnonzero(mask)
+    src, dst = cg.sources[edges], cg.targets[edges]
+    nodes = np.unique(np.concatenate((src, dst)))
+    # CSR order is by source, so the kept edges are still grouped by (renumbered) source
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.searchsorted(nodes, src), minlength=len(nodes)), out=offsets[1:])
+    return CompactGraph(
+        cg.node_ids[nodes], cg.lat[nodes], cg.lon[nodes], offsets,
+        np.searchsorted(nodes, dst).astype(np.int32), {name: w[edges] for name, w in cg.weights.items()},
+        highway=cg.highway[edges] if cg.highway is not None else None, highway_names=cg.highway_names,
+    )
+
+
+def shortest_path(cg, source, target, weight="ai_time_min", heuristic=True, corridor=None):
+    """
+    Heap-based A* between compact node indices. With heuristic=False this is plain Dijkstra.
+    corridor (a corridor.Corridor over cg) restricts the search to its nodes and edges.
+    Returns (cost, edge_ids) or (inf, None) when target is unreachable.
+    """
+    if source == target:
+        return 0.0, []
+
+    w = cg.weight(weight)
+    offsets, targets = cg.offsets, cg.targets
+    edge_ok, node_ok = (corridor.edge_ok, corridor.node_ok) if corridor is not None else (None, None)
+    scale = cg.heuristic_scale(w) if heuristic else 0.0
+    lat, lon = cg.lat, cg.lon
+    target_lat, target_lon = math.radians(float(lat[target])), math.radians(float(lon[target]))
+    cos_target = math.cos(target_lat)
+
+    def estimate(v):
+        # Scalar haversine to the target, only for nodes the search actually reaches
+        if not scale:
+            return 0.0
+        v_lat, v_lon = math.radians(lat.item(v)), math.radians(lon.item(v))
+        a = math.sin((target_lat - v_lat) / 2) ** 2 + math.cos(v_lat) * cos_target * math.sin((target_lon - v_lon) / 2) ** 2
+        return scale * 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+    h = {source: estimate(source)}
+    dist = {source: 0.0}
+    pred = {}
+    settled = set()
+    heap = [(h[source], 0.0, source)]
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u == target:
+            break
+        if u in settled:
+            continue
+        settled.add(u)
+        lo, hi = offsets[u], offsets[u + 1]
+        out_edges = zip(range(lo, hi), targets[lo:hi].tolist(), w[lo:hi].tolist())
+        if edge_ok is not None:
+            out_edges = compress(out_edges, edge_ok[lo:hi].tolist())
+        for e, v, we in out_edges:
+            if node_ok is not None and v not in node_ok:
+                continue
+            nd = d + we
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = (u, e)
+                hv = h.get(v)
+                if hv is None:
+                    hv = h[v] = estimate(v)
+                heapq.heappush(heap, (nd + hv, nd, v))
+    else:
+        return math.inf, None
+
+    edges = []
+    node = target
+    while node != source:
+        node, e = pred[node]
+        edges.append(e)
+    edges.reverse()
+    return dist[target], edges
+
+
+def dijkstra_tree(cg, source, weight="ai_time_min", targets=None, corridor=None):
+    """
+    One-to-many Dijkstra from a compact node index. Stops once every node in targets is
+    settled (or explores everything when targets is None). corridor restricts the search
+    like in shortest_path.
+    Returns (dist, pred): float64 distances (inf if unreachable) and int32 predecessor edge
+    ids (-1 for the source / unreached nodes), both of length len(cg).
+    """
+    w = cg.weight(weight)
+    offsets, targets_arr = cg.offsets, cg.targets
+    edge_ok, node_ok = (corridor.edge_ok, corridor.node_ok) if corridor is not None else (None, None)
+    remaining = set(targets) if targets is not None else None
+    if remaining is not None:
+        remaining.discard(source)
+
+    dist = {source: 0.0}
+    pred = {}
+    settled = set()
+    heap = [(0.0, source)]
+    while heap and (remaining is None or remaining):
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if remaining is not None:
+            remaining.discard(u)
+        lo, hi = offsets[u], offsets[u + 1]
+        out_edges = zip(range(lo, hi), targets_arr[lo:hi].tolist(), w[lo:hi].tolist())
+        if edge_ok is not None:
+            out_edges = compress(out_edges, edge_ok[lo:hi].tolist())
+        for e, v, we in out_edges:
+            if node_ok is not None and v not in node_ok:
+                continue
+            nd = d + we
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = e
+                heapq.heappush(heap, (nd, v))
+
+    n = len(offsets) - 1
+    dist_arr = np.full(n, math.inf)
+    dist_arr[list(dist)] = list(dist.values())
+    pred_arr = np.full(n, -1, dtype=np.int32)
+    if pred:
+        pred_arr[list(pred)] = list(pred.values())
+    return dist_arr, pred_arr
+
+
+def tree_path(cg, source, target, pred):
+    """Edge ids from source to target following a dijkstra_tree predecessor array."""
+    if source == target:
+        return []
+    edges = []
+    node = target
+    while node != source:
+        e = int(pred[node])
+        if e < 0:
+            return None
+        edges.append(e)
+        node = int(cg.sources[e])
+    edges.reverse()
+    return edges
+
+
+def path_metrics(cg, source, edges, ai_weight="ai_time_min"):
+    """
+    Returns coords ([lat, lon] per node), length_km, base_time_min and ai time for a path
+    given as its start node index and edge ids, mirroring the networkx extract_path_metrics.
+    """
+    edges = np.asarray(edges, dtype=np.int64)
+    nodes = np.concatenate(([source], cg.targets[edges]))
+    coords = np.column_stack((cg.lat[nodes], cg.lon[nodes])).tolist()
+    total_len = float(cg.weights["length_km"][edges].sum(dtype=np.float64))
+    total_base_time = float(cg.weights["base_time_min"][edges].sum(dtype=np.float64))
+    total_ai_time = float(cg.weight(ai_weight)[edges].sum(dtype=np.float64))
+    return coords, total_len, total_base_time, total_ai_time
@@ -0,0 +1,315 @@
+import heapq
+import json
+import math
+import os
+import time
+import zlib
+import numpy as np
+
+from src.engines.compact_graph import WEIGHT_ALIASES
+
+# Bounded witness searches keep preprocessing tractable; a missed witness only adds a
+# redundant shortcut, it never makes the hierarchy wrong.
+WITNESS_SETTLE_LIMIT = 200
+
+CH_ARRAYS = ("rank", "fwd_offsets", "fwd_targets", "fwd_weights", "fwd_edges",
+             "bwd_offsets", "bwd_targets", "bwd_weights", "bwd_edges", "orig", "children")
+
+
+def graph_fingerprint(cg):
+    """
+    Cheap identity check so a persisted hierarchy is never used with a different graph.
+    Computed once per graph; the topology of a CompactGraph never changes.
+    """
+    if getattr(cg, "fingerprint", None) is None:
+        crc = zlib.crc32(np.ascontiguousarray(cg.offsets).tobytes())
+        crc = zlib.crc32(np.ascontiguousarray(cg.targets).tobytes(), crc)
+        cg.fingerprint = f"{len(cg)}-{cg.num_edges}-{crc:08x}"
+    return cg.fingerprint
+
+
+def hierarchy_path(graph_path, weight):
+    """data/tn_highways.graphml -> data/tn_highways.ch.<weight>.npz"""
+    base, _ = os.path.splitext(graph_path)
+    return f"{base}.ch.{WEIGHT_ALIASES.get(weight, weight)}.npz"
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over a CompactGraph for a single weight profile.
+
+    CH edges are either original graph edges (`orig >= 0`) or shortcuts that bypass a
+    contracted node and remember the two CH edges they replace (`children`). Only the
+    upward half is kept for querying: `fwd_*` is the CSR of edges u -> v with rank[v] > rank[u],
+    `bwd_*` the CSR (indexed by head) of edges u -> v with rank[u] > rank[v].
+    """
+
+    def __init__(self, weight, fingerprint, rank, fwd, bwd, orig, children):
+        self.weight = weight
+        self.fingerprint = fingerprint
+        self.rank = rank
+        self.fwd_offsets, self.fwd_targets, self.fwd_weights, self.fwd_edges = fwd
+        self.bwd_offsets, self.bwd_targets, self.bwd_weights, self.bwd_edges = bwd
+        self.orig = orig
+        self.children = children
+
+    def _settle(self, heap, dist, pred, settled, offsets, targets, weights, edges):
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            return None
+        settled.add(u)
+        lo, hi = offsets[u], offsets[u + 1]
+        for v, wv, e in zip(targets[lo:hi].tolist(), weights[lo:hi].tolist(), edges[lo:hi].tolist()):
+            nd = d + wv
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = (u, e)
+                heapq.heappush(heap, (nd, v))
+        return u
+
+    def query(self, source, target):
+        """
+        Bidirectional upward Dijkstra between compact node indices.
+        Returns (cost, original edge ids) or (inf, None) when target is unreachable.
+        """
+        if source == target:
+            return 0.0, []
+
+        fdist, bdist = {source: 0.0}, {target: 0.0}
+        fpred, bpred = {}, {}
+        fsettled, bsettled = set(), set()
+        fheap, bheap = [(0.0, source)], [(0.0, target)]
+        best, meet = math.inf, -1
+
+        while fheap or bheap:
+            fmin = fheap[0][0] if fheap else math.inf
+            bmin = bheap[0][0] if bheap else math.inf
+            if min(fmin, bmin) >= best:
+                break
+            if fmin <= bmin:
+                u = self._settle(fheap, fdist, fpred, fsettled, self.fwd_offsets,
+                                 self.fwd_targets, self.fwd_weights, self.fwd_edges)
+            else:
+                u = self._settle(bheap, bdist, bpred, bsettled, self.bwd_offsets,
+                                 self.bwd_targets, self.bwd_weights, self.bwd_edges)
+            if u is not None and u in fdist and u in bdist and fdist[u] + bdist[u] < best:
+                best, meet = fdist[u] + bdist[u], u
+
+        if meet < 0:
+            return math.inf, None
+
+        ch_edges = []
+        node = meet
+        while node != source:
+            node, e = fpred[node]
+            ch_edges.append(e)
+        ch_edges.reverse()
+        node = meet
+        while node != target:
+            node, e = bpred[node]
+            ch_edges.append(e)
+        return best, self.unpack(ch_edges)
+
+    def unpack(self, ch_edges):
+        """Expands CH edge ids (shortcuts included) into original graph edge ids, in order."""
+        path = []
+        stack = list(reversed(ch_edges))
+        while stack:
+            e = stack.pop()
+            o = int(self.orig[e])
+            if o >= 0:
+                path.append(o)
+            else:
+                first, second = self.children[e]
+                stack.append(int(second))
+                stack.append(int(first))
+        return path
+
+    def save(self, path):
+        np.savez(
+            path, weight=self.weight, fingerprint=self.fingerprint, rank=self.rank,
+            fwd_offsets=self.fwd_offsets, fwd_targets=self.fwd_targets,
+            fwd_weights=self.fwd_weights, fwd_edges=self.fwd_edges,
+            bwd_offsets=self.bwd_offsets, bwd_targets=self.bwd_targets,
+            bwd_weights=self.bwd_weights, bwd_edges=self.bwd_edges,
+            orig=self.orig, children=self.children,
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls._from_arrays(str(data["weight"]), str(data["fingerprint"]), data)
+
+    @classmethod
+    def _from_arrays(cls, weight, fingerprint, arrays):
+        return cls(
+            weight, fingerprint, arrays["rank"],
+            (arrays["fwd_offsets"], arrays["fwd_targets"], arrays["fwd_weights"], arrays["fwd_edges"]),
+            (arrays["bwd_offsets"], arrays["bwd_targets"], arrays["bwd_weights"], arrays["bwd_edges"]),
+            arrays["orig"], arrays["children"],
+        )
+
+    def save_arrays(self, directory):
+        """One .npy per array plus meta.json, so load_arrays can memory-map them (an .npz can't be)."""
+        os.makedirs(directory, exist_ok=True)
+        for name in CH_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"weight": self.weight, "fingerprint": self.fingerprint}, f)
+
+    @classmethod
+    def load_arrays(cls, directory):
+        """Hierarchy backed by read-only memory maps of a save_arrays directory."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in CH_ARRAYS}
+        return cls._from_arrays(meta["weight"], meta["fingerprint"], arrays)
+
+
+def _to_csr(n, heads, tails, weights, edges):
+    """Groups (head -> tail) records into CSR arrays indexed by head."""
+    heads = np.asarray(heads, dtype=np.int64)
+    order = np.argsort(heads, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=offsets[1:])
+    return (
+        offsets,
+        np.asarray(tails, dtype=np.int32)[order],
+        np.asarray(weights, dtype=np.float64)[order],
+        np.asarray(edges, dtype=np.int64)[order],
+    )
+
+
+def build_hierarchy(cg, weight, witness_settle_limit=WITNESS_SETTLE_LIMIT):
+    """
+    Contracts every node of cg in edge-difference order and returns the ContractionHierarchy
+    for the given weight column. Pure Python; meant to run offline (see preprocess_graph.py).
+    """
+    w = cg.weight(weight)
+    n = len(cg)
+
+    ch_w, ch_orig, ch_children = [], [], []
+    out = [dict() for _ in range(n)]
+    inc = [dict() for _ in range(n)]
+
+    def add_edge(u, v, weight_uv, orig, children):
+        existing = out[u].get(v)
+        if existing is not None and ch_w[existing] <= weight_uv:
+            return
+        e = len(ch_w)
+        ch_w.append(weight_uv)
+        ch_orig.append(orig)
+        ch_children.append(children)
+        out[u][v] = e
+        inc[v][u] = e
+
+    for e, (u, v, we) in enumerate(zip(cg.sources.tolist(), cg.targets.tolist(), w.tolist())):
+        if u != v:
+            add_edge(u, v, float(we), e, (-1, -1))
+
+    def witness_dists(u, skip, max_cost):
+        dist = {u: 0.0}
+        heap = [(0.0, u)]
+        settled = 0
+        while heap and settled < witness_settle_limit:
+            d, x = heapq.heappop(heap)
+            if d > max_cost:
+                break
+            if d > dist[x]:
+                continue
+            settled += 1
+            for y, e in out[x].items():
+                if y == skip:
+                    continue
+                nd = d + ch_w[e]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return dist
+
+    def needed_shortcuts(x):
+        shortcuts = []
+        if not inc[x] or not out[x]:
+            return shortcuts
+        max_out = max(ch_w[e] for e in out[x].values())
+        for u, e_ux in inc[x].items():
+            w_ux = ch_w[e_ux]
+            dist = witness_dists(u, x, w_ux + max_out)
+            for v, e_xv in out[x].items():
+                if v == u:
+                    continue
+                via = w_ux + ch_w[e_xv]
+                if dist.get(v, math.inf) > via:
+                    shortcuts.append((u, v, via, (e_ux, e_xv)))
+        return shortcuts
+
+    deleted_neighbours = [0] * n
+
+    def priority(x):
+        return len(needed_shortcuts(x)) - len(inc[x]) - len(out[x]) + deleted_neighbours[x]
+
+    start = time.time()
+    heap = [(priority(x), x) for x in range(n)]
+    heapq.heapify(heap)
+    rank = np.full(n, -1, dtype=np.int32)
+    up_heads, up_tails, up_weights, up_edges = [], [], [], []
+    down_heads, down_tails, down_weights, down_edges = [], [], [], []
+    level = 0
+
+    while heap:
+        _, x = heapq.heappop(heap)
+        if rank[x] >= 0:
+            continue
+        # Lazy update: re-evaluate and push back if x is no longer the cheapest node
+        current = priority(x)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, x))
+            continue
+
+        for u, v, via, children in needed_shortcuts(x):
+            add_edge(u, v, via, -1, children)
+
+        rank[x] = level
+        level += 1
+        # Every edge still attached to x now leads to a higher ranked node
+        for v, e in out[x].items():
+            up_heads.append(x); up_tails.append(v); up_weights.append(ch_w[e]); up_edges.append(e)
+            del inc[v][x]
+            deleted_neighbours[v] += 1
+        for u, e in inc[x].items():
+            down_heads.append(x); down_tails.append(u); down_weights.append(ch_w[e]); down_edges.append(e)
+            del out[u][x]
+            deleted_neighbours[u] += 1
+        out[x].clear()
+        inc[x].clear()
+
+        if level % 5000 == 0:
+            print(f"Contracted {level}/{n} nodes, {len(ch_w)} CH edges ({time.time() - start:.1f}s)")
+
+    return ContractionHierarchy(
+        WEIGHT_ALIASES.get(weight, weight) if isinstance(weight, str) else "custom",
+        graph_fingerprint(cg),
+        rank,
+        _to_csr(n, up_heads, up_tails, up_weights, up_edges),
+        _to_csr(n, down_heads, down_tails, down_weights, down_edges),
+        np.asarray(ch_orig, dtype=np.int64),
+        np.asarray(ch_children, dtype=np.int64).reshape(-1, 2),
+    )
+
+
+def load_hierarchies(graph_path, cg, weights):
+    """
+    Loads every persisted hierarchy for graph_path that matches cg. Missing or stale files
+    are skipped so callers fall back to A*.
+    """
+    hierarchies = {}
+    for weight in weights:
+        path = hierarchy_path(graph_path, weight)
+        if not os.path.exists(path):
+            continue
+        ch = ContractionHierarchy.load(path)
+        if ch.fingerprint != graph_fingerprint(cg):
+            print(f"⚠️ Ignoring stale contraction hierarchy {path}")
+            continue
+        hierarchies[ch.weight] = ch
+    return hierarchies
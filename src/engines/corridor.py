@@ -0,0 +1,138 @@
+import json
+import math
+import os
+import numpy as np
+
+from src.engines.compact_graph import haversine_km
+
+# Restrict statewide searches to the corridor around the waypoints (retried unrestricted on failure)
+CORRIDOR_ROUTING = os.environ.get("CORRIDOR_ROUTING", "1") == "1"
+
+# (max consecutive waypoint distance in km, bbox margin in degrees, road classes kept);
+# longer trips get a wider corridor but only the faster road classes
+CORRIDOR_THRESHOLDS = (
+    (100, 0.1, ("motorway", "trunk", "primary", "secondary", "tertiary")),
+    (300, 0.2, ("motorway", "trunk", "primary", "secondary")),
+    (math.inf, 0.3, ("motorway", "trunk", "primary")),
+)
+
+GRID_CELL_DEG = 0.05
+
+
+def corridor_parameters(coords):
+    """(margin_deg, road_classes) for a list of [lat, lon] waypoints, from the longest leg."""
+    max_dist = 0
+    if len(coords) > 1:
+        lat, lon = np.asarray(coords, dtype=np.float64).T
+        max_dist = float(np.max(haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])))
+    for limit, margin, classes in CORRIDOR_THRESHOLDS:
+        if max_dist < limit:
+            return margin, classes
+
+
+def corridor_bbox(coords, margin):
+    """(south, west, north, east) around the waypoints."""
+    lats = [c[0] for c in coords]
+    lons = [c[1] for c in coords]
+    return min(lats) - margin, min(lons) - margin, max(lats) + margin, max(lons) + margin
+
+
+def overpass_filter(classes):
+    return '["highway"~"' + "|".join(classes) + '"]'
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over the nodes of a CompactGraph: node indices sorted by cell with
+    CSR offsets per cell, so a bbox query only touches the cells it overlaps.
+    """
+
+    def __init__(self, cg, cell_deg=GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.lat, self.lon = cg.lat, cg.lon
+        self.lat0, self.lon0 = float(np.min(cg.lat)), float(np.min(cg.lon))
+        self.rows = int((np.max(cg.lat) - self.lat0) // cell_deg) + 1
+        self.cols = int((np.max(cg.lon) - self.lon0) // cell_deg) + 1
+
+        cells = self._row(cg.lat) * self.cols + self._col(cg.lon)
+        self.nodes = np.argsort(cells, kind="stable").astype(np.int32)
+        self.offsets = np.zeros(self.rows * self.cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.rows * self.cols), out=self.offsets[1:])
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "nodes.npy"), self.nodes)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"cell_deg": self.cell_deg, "lat0": self.lat0, "lon0": self.lon0,
+                       "rows": self.rows, "cols": self.cols}, f)
+
+    @classmethod
+    def load(cls, cg, directory):
+        """Index over cg memory-mapped from a save() directory, without re-sorting the nodes."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.cell_deg, index.lat0, index.lon0 = meta["cell_deg"], meta["lat0"], meta["lon0"]
+        index.rows, index.cols = meta["rows"], meta["cols"]
+        index.lat, index.lon = cg.lat, cg.lon
+        index.nodes = np.load(os.path.join(directory, "nodes.npy"), mmap_mode="r")
+        index.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        return index
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat) - self.lat0) // self.cell_deg).astype(np.int64), 0, self.rows - 1)
+
+    def _col(self, lon):
+        return np.clip(((np.asarray(lon) - self.lon0) // self.cell_deg).astype(np.int64), 0, self.cols - 1)
+
+    def query(self, south, west, north, east):
+        """Sorted compact node indices inside the bbox."""
+        r0, r1 = int(self._row(south)), int(self._row(north))
+        c0, c1 = int(self._col(west)), int(self._col(east))
+        # Within one grid row the overlapped cells are a contiguous run of the CSR
+        candidates = [self.nodes[self.offsets[r * self.cols + c0]:self.offsets[r * self.cols + c1 + 1]]
+                      for r in range(r0, r1 + 1)]
+        nodes = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int32)
+        lat, lon = self.lat[nodes], self.lon[nodes]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(nodes[inside])
+
+
+class Corridor:
+    """
+    Restricted view of a CompactGraph: the nodes inside a bbox and the edges between them of
+    the allowed road classes. Nothing of the graph is copied; searches take it as a filter
+    over the global CSR arrays (see compact_graph.shortest_path / dijkstra_tree).
+    """
+
+    def __init__(self, cg, bbox, nodes, classes):
+        self.cg = cg
+        self.bbox = bbox
+        self.nodes = nodes
+        self.classes = classes
+        # What the search loops test: a set of the corridor's nodes (sized by the corridor,
+        # not the graph) and the per-edge road class mask cached on the graph for all corridors
+        self.node_ok = set(nodes.tolist())
+        self.edge_ok = cg.highway_mask(classes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.node_ok
+
+
+def extract_corridor(cg, coords, grid=None):
+    """
+    Corridor around the [lat, lon] waypoints with the margin and road classes of
+    corridor_parameters. grid (a GridIndex over cg) makes the node lookup sublinear;
+    without one it falls back to a full scan.
+    """
+    margin, classes = corridor_parameters(coords)
+    south, west, north, east = bbox = corridor_bbox(coords, margin)
+    if grid is not None:
+        nodes = grid.query(south, west, north, east)
+    else:
+        nodes = np.flatnonzero((cg.lat >= south) & (cg.lat <= north) & (cg.lon >= west) & (cg.lon <= east))
+    return Corridor(cg, bbox, nodes, classes)
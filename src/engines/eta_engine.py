@@ -0,0 +1,208 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.engines.contraction import graph_fingerprint
+from src.model_compiler import CompiledForest, compiled_model_path
+from src.engines.weight_engine import highway_traffic_factors
+
+ETA_MODEL_PATH = os.environ.get("ETA_MODEL_PATH", "models/delivery_time_predictor.pkl")
+ETA_MAX_BATCH = int(os.environ.get("ETA_MAX_BATCH", "4096"))
+ETA_MAX_WAIT_MS = float(os.environ.get("ETA_MAX_WAIT_MS", "5"))
+# Serve the array-compiled copy of the model (src.model_compiler) when it is up to date
+ETA_USE_COMPILED = os.environ.get("ETA_USE_COMPILED", "1") == "1"
+
+# Model inputs, as in preprocessing.preprocess_data
+FEATURE_COLUMNS = ['distance_km', 'delivery_demand', 'traffic_factor', 'time_of_day']
+TIME_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+
+# The model was trained on inter-city links (tens to hundreds of km) and tree ensembles
+# can't extrapolate down to road segment lengths, so edges are priced per km at this length
+ETA_REFERENCE_KM = 100.0
+ETA_EDGE_DEMAND = 50.0
+# traffic_factor range of the training data (data_generator); edges outside it are priced
+# at the nearest end and scaled linearly, the model's target is distance * traffic_factor
+ETA_FACTOR_RANGE = (1.0, 4.0)
+PROFILE_BATCH_SIZE = 1 << 18
+
+
+def load_eta_model(path=ETA_MODEL_PATH, use_compiled=ETA_USE_COMPILED):
+    """
+    The trained delivery time Pipeline from model.train_and_save_model, or None if not
+    trained. With use_compiled, its CompiledForest (.npz next to it, not older than the
+    pickle) is loaded instead: same predictions, much faster load and small-batch predict.
+    """
+    if not os.path.exists(path):
+        return None
+    compiled_path = compiled_model_path(path)
+    if use_compiled and os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= os.path.getmtime(path):
+        return CompiledForest.load(compiled_path)
+    return joblib.load(path)
+
+
+def feature_frame(distance_km, delivery_demand, traffic_factor, time_of_day):
+    """Model input frame; scalars are broadcast against the array arguments."""
+    distance_km, delivery_demand, traffic_factor, time_of_day = np.broadcast_arrays(
+        np.asarray(distance_km, dtype=np.float64), np.asarray(delivery_demand, dtype=np.float64),
+        np.asarray(traffic_factor, dtype=np.float64), np.asarray(time_of_day, dtype=object),
+    )
+    return pd.DataFrame({
+        'distance_km': distance_km.ravel(),
+        'delivery_demand': delivery_demand.ravel(),
+        'traffic_factor': traffic_factor.ravel(),
+        'time_of_day': time_of_day.ravel(),
+    })
+
+
+def predict_edges(model, distance_km, delivery_demand=50, traffic_factor=1.0, time_of_day='morning'):
+    """
+    Delivery time (minutes) for whole edge arrays in one predict call, e.g. every edge of
+    the compact graph for one time of day. Returns a float32 array.
+    """
+    return model.predict(feature_frame(distance_km, delivery_demand, traffic_factor, time_of_day)).astype(np.float32)
+
+
+def model_version(path=ETA_MODEL_PATH):
+    """Short content hash of the model file, to tell which model produced stored profiles."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:10]
+
+
+def time_profile_path(graph_path):
+    return os.path.splitext(graph_path)[0] + ".eta.npz"
+
+
+def edge_traffic_factors(cg):
+    """
+    Per-edge model traffic_factor: the edge's own free-flow pace (base_time_min per km, 1.0
+    at 60 km/h) times its road type factor, i.e. the base ladder's minutes per km. Edges of
+    one road class differ by their speed; zero-length edges fall back to the class factor.
+    """
+    length, base = cg.weight("length_km"), cg.weights["base_time_min"]
+    pace = np.divide(base, length, out=np.ones(len(length), dtype=np.float32), where=length > 0)
+    return (pace * highway_traffic_factors(cg)).astype(np.float32)
+
+
+def predict_time_profiles(model, cg, times=TIME_OF_DAY, batch_size=PROFILE_BATCH_SIZE):
+    """
+    Model-predicted free-flow minutes for every edge of cg, one float32 array per time of
+    day. Each edge is described by its edge_traffic_factors() at ETA_REFERENCE_KM, rounded
+    to the training data's 2 decimals; edges sharing a feature row are predicted once, the
+    rest in batches of batch_size rows.
+    """
+    factor = edge_traffic_factors(cg)
+    clipped = np.round(np.clip(factor, *ETA_FACTOR_RANGE), 2)
+    rows, inverse = np.unique(clipped, return_inverse=True)
+    # Scaled by factor / clipped: linear beyond the trained range, undoes the rounding within it
+    length = cg.weight("length_km") * (factor / clipped)
+    profiles = {}
+    for time_of_day in times:
+        per_km = np.empty(len(rows), dtype=np.float32)
+        for lo in range(0, len(rows), batch_size):
+            per_km[lo:lo + batch_size] = predict_edges(
+                model, ETA_REFERENCE_KM, ETA_EDGE_DEMAND, rows[lo:lo + batch_size], time_of_day,
+            ) / ETA_REFERENCE_KM
+        profiles[time_of_day] = (length * per_km[inverse.ravel()]).astype(np.float32)
+    return profiles
+
+
+def save_time_profiles(path, profiles, cg, version):
+    np.savez(path, fingerprint=graph_fingerprint(cg), model_version=version,
+             times=np.array(list(profiles)), weights=np.stack(list(profiles.values())))
+
+
+def load_time_profiles(graph_path, cg, version=None):
+    """
+    {time_of_day: weights} saved for this graph, or {} if missing, built for another graph
+    or (when version is given) predicted by another model.
+    """
+    path = time_profile_path(graph_path)
+    if not os.path.exists(path):
+        return {}
+    data = np.load(path)
+    if str(data["fingerprint"]) != graph_fingerprint(cg) or (version and str(data["model_version"]) != version):
+        print(f"⚠️ Ignoring stale time-of-day profiles {path}")
+        return {}
+    return {str(t): w for t, w in zip(data["times"], data["weights"])}
+
+
+class ETABatcher:
+    """
+    Micro-batches concurrent prediction requests: a background thread collects requests
+    for up to max_wait_ms (or max_batch rows) and answers them all with one predict call,
+    so sklearn's per-call overhead is paid once per batch instead of once per request.
+    """
+
+    def __init__(self, model, max_batch=ETA_MAX_BATCH, max_wait_ms=ETA_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats = {"requests": 0, "rows": 0, "batches": 0, "predict_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="eta-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        """Queues a feature frame; the Future resolves to its predictions (float array)."""
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def predict(self, frame, timeout=None):
+        return self.submit(frame).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            frames = [frame for frame, _ in batch]
+            start = time.perf_counter()
+            try:
+                predictions = self.model.predict(pd.concat(frames, ignore_index=True))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            offset = 0
+            for frame, future in batch:
+                future.set_result(predictions[offset:offset + len(frame)])
+                offset += len(frame)
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["rows"] += offset
+                self._stats["batches"] += 1
+                self._stats["predict_seconds"] += elapsed
+
+    def stats(self):
+        with self._lock:
+            batches = self._stats["batches"]
+            return {
+                **self._stats,
+                "predict_seconds": round(self._stats["predict_seconds"], 4),
+                "mean_batch_requests": round(self._stats["requests"] / batches, 2) if batches else 0.0,
+                "pending": self._queue.qsize(),
+            }
@@ -0,0 +1,156 @@
+import math
+import os
+import numpy as np
+
+from src.engines.matrix_engine import compute_matrix
+
+FLEET_TIME_LIMIT = float(os.environ.get("FLEET_TIME_LIMIT", "5"))
+# Upper bound on a client-requested search time, the endpoint holds a worker thread meanwhile
+FLEET_MAX_TIME_LIMIT = float(os.environ.get("FLEET_MAX_TIME_LIMIT", "30"))
+DEFAULT_HORIZON_MIN = 24 * 60
+
+# OR-Tools only works on integers: times are hundredths of a minute
+TIME_SCALE = 100
+# ... and demands / capacities hundredths of a unit
+DEMAND_SCALE = 100
+
+
+def _scaled_window(ready, due):
+    """(ready, due) in TIME_SCALE units, rounded inwards so a solution never arrives early or late."""
+    # Rounded first, so 30.0 * 100 = 3000.0000000000005 still scales to 3000
+    return math.ceil(round(ready * TIME_SCALE, 6)), math.floor(round(due * TIME_SCALE, 6))
+
+
+def graph_cost_matrices(cg, nodes, weight="ai_time_min", corridor=None):
+    """
+    (durations, lengths_km) between compact node indices from one-to-many searches on
+    weight, restricted to corridor when one is given.
+    """
+    path_matrix = compute_matrix(cg, nodes, weight=weight, corridor=corridor)
+    length = cg.weight("length_km")
+    n = len(nodes)
+    lengths = np.full((n, n), np.inf)
+    for i in range(n):
+        for j in range(n):
+            edges = path_matrix.edges(i, j) if i != j else []
+            if edges is not None:
+                lengths[i, j] = float(length[edges].sum()) if len(edges) else 0.0
+    return np.asarray(path_matrix.costs, dtype=np.float64), lengths
+
+
+def solve_fleet(durations, demands, capacities, time_windows=None, service_times=None, depot=0,
+                time_limit=FLEET_TIME_LIMIT, initial_routes=None, solution_limit=None):
+    """
+    Capacitated VRP with time windows over a duration matrix (minutes, inf = unreachable)
+    with OR-Tools: PATH_CHEAPEST_ARC first solution improved by guided local search until
+    time_limit seconds. Every vehicle starts and ends at depot.
+
+    demands / service_times are per node, capacities per vehicle, time_windows per node as
+    (ready, due) minutes from the start of the shift. initial_routes (one list of node
+    indices per vehicle, depot excluded) warm-starts the search from a previous solution.
+    solution_limit also stops the search after that many solutions; a run that stops there
+    rather than at time_limit is reproducible, whatever the machine's speed.
+    Customers that can't be served within capacity and windows are dropped, not fatal.
+
+    Returns {"routes", "arrivals", "loads", "dropped", "total_time"} or None.
+    """
+    from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+    d = np.asarray(durations, dtype=np.float64)
+    n = len(d)
+    num_vehicles = len(capacities)
+    service = np.zeros(n) if service_times is None else np.asarray(service_times, dtype=np.float64)
+    if time_windows is None:
+        time_windows = [(0, DEFAULT_HORIZON_MIN)] * n
+    horizon = max(due for _, due in time_windows)
+
+    # Unreachable legs become longer than the whole horizon, so no feasible route uses them
+    unreachable = int((horizon + service.sum() + 1) * TIME_SCALE)
+    travel = np.where(np.isfinite(d), np.rint(d * TIME_SCALE), unreachable).astype(np.int64).tolist()
+    service_int = np.rint(service * TIME_SCALE).astype(np.int64).tolist()
+    demand_int = np.rint(np.asarray(demands, dtype=np.float64) * DEMAND_SCALE).astype(np.int64).tolist()
+    capacity_int = np.rint(np.asarray(capacities, dtype=np.float64) * DEMAND_SCALE).astype(np.int64).tolist()
+
+    manager = pywrapcp.RoutingIndexManager(n, num_vehicles, depot)
+    routing = pywrapcp.RoutingModel(manager)
+
+    def travel_callback(from_index, to_index):
+        return travel[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+    def time_callback(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        return service_int[from_node] + travel[from_node][manager.IndexToNode(to_index)]
+
+    def demand_callback(from_index):
+        return demand_int[manager.IndexToNode(from_index)]
+
+    routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(travel_callback))
+
+    routing.AddDimensionWithVehicleCapacity(
+        routing.RegisterUnaryTransitCallback(demand_callback), 0,
+        capacity_int, True, "Capacity",
+    )
+
+    horizon_int = int(horizon * TIME_SCALE)
+    # Slack lets a vehicle wait for a window to open
+    routing.AddDimension(routing.RegisterTransitCallback(time_callback), horizon_int, horizon_int, False, "Time")
+    time_dimension = routing.GetDimensionOrDie("Time")
+    for node, window in enumerate(time_windows):
+        if node == depot:
+            continue
+        time_dimension.CumulVar(manager.NodeToIndex(node)).SetRange(*_scaled_window(*window))
+    depot_window = _scaled_window(*time_windows[depot])
+    for v in range(num_vehicles):
+        time_dimension.CumulVar(routing.Start(v)).SetRange(*depot_window)
+        time_dimension.CumulVar(routing.End(v)).SetRange(*depot_window)
+        routing.AddVariableMinimizedByFinalizer(time_dimension.CumulVar(routing.Start(v)))
+        routing.AddVariableMinimizedByFinalizer(time_dimension.CumulVar(routing.End(v)))
+
+    # Dropping a customer must always cost more than any route that serves it
+    drop_penalty = unreachable * n
+    for node in range(n):
+        if node != depot:
+            routing.AddDisjunction([manager.NodeToIndex(node)], drop_penalty)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    if solution_limit is not None:
+        search_parameters.solution_limit = int(solution_limit)
+
+    solution = None
+    if initial_routes:
+        routing.CloseModelWithParameters(search_parameters)
+        routes = [list(r) for r in initial_routes][:num_vehicles]
+        routes += [[] for _ in range(num_vehicles - len(routes))]
+        initial = routing.ReadAssignmentFromRoutes(routes, True)
+        if initial is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial, search_parameters)
+        else:
+            print("⚠️ Warm start routes are infeasible, solving from scratch")
+    if solution is None:
+        solution = routing.SolveWithParameters(search_parameters)
+    if not solution:
+        return None
+
+    capacity_dimension = routing.GetDimensionOrDie("Capacity")
+    routes, arrivals, loads = [], [], []
+    total_time = 0
+    for v in range(num_vehicles):
+        index = solution.Value(routing.NextVar(routing.Start(v)))
+        route, arrival = [], []
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            arrival.append(solution.Min(time_dimension.CumulVar(index)) / TIME_SCALE)
+            index = solution.Value(routing.NextVar(index))
+        end_time = solution.Min(time_dimension.CumulVar(index))
+        start_time = solution.Min(time_dimension.CumulVar(routing.Start(v)))
+        routes.append(route)
+        arrivals.append(arrival)
+        loads.append(solution.Value(capacity_dimension.CumulVar(index)) / DEMAND_SCALE)
+        total_time += (end_time - start_time) / TIME_SCALE
+
+    served = {node for route in routes for node in route}
+    dropped = [node for node in range(n) if node != depot and node not in served]
+    return {"routes": routes, "arrivals": arrivals, "loads": loads, "dropped": dropped, "total_time": total_time}
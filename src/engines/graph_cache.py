@@ -0,0 +1,241 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from src.engines.compact_graph import edge_subgraph
+from src.engines.graph_store import is_graph_store_current, load_graph_store, save_graph_store
+
+GRAPH_CACHE_DIR = os.environ.get("GRAPH_CACHE_DIR", "data/cached_graphs")
+GRAPH_CACHE_MEMORY_BYTES = int(os.environ.get("GRAPH_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+GRAPH_CACHE_DISK_BYTES = int(os.environ.get("GRAPH_CACHE_DISK_BYTES", str(2 * 1024 * 1024 * 1024)))
+GRAPH_CACHE_MAX_AGE = float(os.environ.get("GRAPH_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# last_used updates are batched into one write per interval; eviction works in days, not seconds
+GRAPH_CACHE_TOUCH_INTERVAL = 60.0
+
+STAT_COUNTERS = ("memory_hits", "disk_hits", "containment_hits", "misses", "writes", "memory_evictions", "disk_evictions")
+
+
+def _contains(outer, inner):
+    """Both (south, west, north, east)."""
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _area(bbox):
+    return (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def _format_stats(counters, memory_entries, memory_bytes, memory_limit, disk_entries, disk_bytes, disk_limit):
+    lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+    return {
+        **counters,
+        "hit_rate": round((lookups - counters["misses"]) / lookups, 4) if lookups else 0.0,
+        "memory_entries": memory_entries,
+        "memory_bytes": memory_bytes,
+        "memory_limit_bytes": memory_limit,
+        "disk_entries": disk_entries,
+        "disk_bytes": disk_bytes,
+        "disk_limit_bytes": disk_limit,
+    }
+
+
+def empty_stats(memory_bytes=GRAPH_CACHE_MEMORY_BYTES, disk_bytes=GRAPH_CACHE_DISK_BYTES):
+    """GraphCache.stats() of a cache that was never created, without touching the disk."""
+    return _format_stats(dict.fromkeys(STAT_COUNTERS, 0), 0, 0, memory_bytes, 0, 0, disk_bytes)
+
+
+class GraphCache:
+    """
+    Two-tier cache of downloaded corridor graphs (CompactGraphs), looked up by area rather
+    than by exact request: any cached corridor whose bbox covers the requested bbox and
+    whose road classes include the requested ones is a hit, the smallest such one wins.
+    A hit with more road classes than requested is narrowed to the requested ones, so the
+    result doesn't depend on which corridor happened to be cached first.
+
+    The memory tier is an LRU bounded by graph bytes. The disk tier keeps one binary graph
+    store per corridor in directory, indexed in SQLite (shared by worker processes), and is
+    bounded by total bytes (least recently used out first) and by age since last use.
+    Stores are never overwritten: each put writes a new uniquely named one and then points
+    the index row at it, so readers see either the old complete store or the new one.
+    Files in directory the index doesn't know (e.g. GraphML from before it) are left alone.
+    """
+
+    def __init__(self, directory=GRAPH_CACHE_DIR, memory_bytes=GRAPH_CACHE_MEMORY_BYTES,
+                 disk_bytes=GRAPH_CACHE_DISK_BYTES, max_age=GRAPH_CACHE_MAX_AGE):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_age = max_age
+        self._memory = OrderedDict()  # (key, classes) -> (bbox, classes, nbytes, cg)
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(STAT_COUNTERS, 0)
+        self._touched = {}  # key -> last use not yet written to the index
+        self._last_flush = time.time()
+
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS graphs (key TEXT PRIMARY KEY, south REAL, west REAL, north REAL, east REAL, "
+            "classes TEXT, bytes INTEGER, created REAL, last_used REAL, store TEXT)"
+        )
+        if "store" not in {row[1] for row in self._db.execute("PRAGMA table_info(graphs)")}:
+            # Index from before stores were uniquely named: their rows keep the <key>.graph path
+            self._db.execute("ALTER TABLE graphs ADD COLUMN store TEXT")
+        self._db.commit()
+        with self._lock:
+            self._evict_disk()
+
+    def _path(self, key, store):
+        return os.path.join(self.directory, store or f"{key}.graph")
+
+    def _remember(self, key, bbox, classes, cg):
+        key = (key, classes)
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old[2]
+        self._memory[key] = (bbox, classes, cg.nbytes, cg)
+        self._memory_used += cg.nbytes
+        while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+            _, (_, _, size, _) = self._memory.popitem(last=False)
+            self._memory_used -= size
+            self._stats["memory_evictions"] += 1
+
+    def _narrow(self, key, bbox, cached_classes, cg, classes):
+        """cg restricted to the requested road classes, itself kept in the memory tier."""
+        if set(cached_classes) == classes:
+            return cg
+        classes = tuple(sorted(classes))
+        narrowed = edge_subgraph(cg, cg.highway_mask(classes))
+        self._remember(key, bbox, classes, narrowed)
+        return narrowed
+
+    def _remove_disk(self, key, store):
+        self._touched.pop(key, None)
+        self._db.execute("DELETE FROM graphs WHERE key = ?", (key,))
+        # Workers that already mapped the store keep their pages until they drop it
+        shutil.rmtree(self._path(key, store), ignore_errors=True)
+        self._stats["disk_evictions"] += 1
+
+    def _evict_disk(self):
+        # Least recently used has to see the batched touches
+        self._flush_touches()
+        expired = self._db.execute("SELECT key, store FROM graphs WHERE last_used < ?", (time.time() - self.max_age,)).fetchall()
+        for key, store in expired:
+            self._remove_disk(key, store)
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM graphs").fetchone()[0]
+        if total > self.disk_bytes:
+            for key, store, size in self._db.execute("SELECT key, store, bytes FROM graphs ORDER BY last_used ASC").fetchall():
+                if total <= self.disk_bytes:
+                    break
+                self._remove_disk(key, store)
+                total -= size
+        self._db.commit()
+
+    def get(self, bbox, classes):
+        """The smallest cached CompactGraph covering bbox with at least classes, or None."""
+        classes = set(classes)
+        with self._lock:
+            # Smallest area first, then the fewest extra road classes
+            candidates = [(mem_key, entry) for mem_key, entry in self._memory.items()
+                          if _contains(entry[0], bbox) and classes <= set(entry[1])]
+            if candidates:
+                mem_key, entry = min(candidates, key=lambda c: (_area(c[1][0]), len(c[1][1])))
+                self._memory.move_to_end(mem_key)
+                self._stats["memory_hits"] += 1
+                if entry[0] != tuple(bbox):
+                    self._stats["containment_hits"] += 1
+                self._touch(mem_key[0])
+                return self._narrow(mem_key[0], entry[0], entry[1], entry[3], classes)
+
+            rows = self._db.execute(
+                "SELECT key, store, south, west, north, east, classes FROM graphs "
+                "WHERE south <= ? AND west <= ? AND north >= ? AND east >= ? "
+                "ORDER BY (north - south) * (east - west) ASC",
+                tuple(bbox),
+            ).fetchall()
+            for key, store, *box, cached_classes in rows:
+                path = self._path(key, store)
+                cached_classes = tuple(cached_classes.split("|"))
+                if not classes <= set(cached_classes) or not is_graph_store_current(path):
+                    continue
+                try:
+                    cg = load_graph_store(path)
+                except (FileNotFoundError, ValueError):
+                    # Replaced or evicted by another worker between the query and the load
+                    continue
+                self._remember(key, tuple(box), cached_classes, cg)
+                self._stats["disk_hits"] += 1
+                if tuple(box) != tuple(bbox):
+                    self._stats["containment_hits"] += 1
+                self._touch(key)
+                return self._narrow(key, tuple(box), cached_classes, cg, classes)
+
+            self._stats["misses"] += 1
+            return None
+
+    def _touch(self, key):
+        now = time.time()
+        self._touched[key] = now
+        if now - self._last_flush >= GRAPH_CACHE_TOUCH_INTERVAL:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.executemany("UPDATE graphs SET last_used = ? WHERE key = ?",
+                                 [(t, key) for key, t in self._touched.items()])
+            self._db.commit()
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def put(self, key, bbox, classes, cg):
+        """Stores a freshly downloaded corridor graph in both tiers, then enforces the disk cap."""
+        bbox, classes = tuple(bbox), tuple(classes)
+        # Complete on disk before the index points at it
+        store = f"{key}-{uuid.uuid4().hex[:12]}.graph"
+        save_graph_store(cg, self._path(key, store))
+        with self._lock:
+            now = time.time()
+            try:
+                # One write transaction across workers: read the store being replaced, repoint the row
+                self._db.execute("BEGIN IMMEDIATE")
+                old = self._db.execute("SELECT store FROM graphs WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO graphs (key, south, west, north, east, classes, bytes, created, last_used, store) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, *bbox, "|".join(classes), _dir_bytes(self._path(key, store)), now, now, store),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                shutil.rmtree(self._path(key, store), ignore_errors=True)
+                raise
+            if old is not None:
+                # Readers that already loaded it keep their mapped pages
+                shutil.rmtree(self._path(key, old[0]), ignore_errors=True)
+            self._touched.pop(key, None)
+            self._remember(key, bbox, classes, cg)
+            self._stats["writes"] += 1
+            self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            for key, store in self._db.execute("SELECT key, store FROM graphs").fetchall():
+                self._remove_disk(key, store)
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_entries, disk_used = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM graphs").fetchone()
+            return _format_stats(self._stats, len(self._memory), self._memory_used, self.memory_bytes,
+                                 disk_entries, disk_used, self.disk_bytes)
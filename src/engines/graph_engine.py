@@ -4,6 +4,13 @@ import os
 import hashlib
 import math
 
+from src.engines.compact_graph import compile_graph
+from src.engines.corridor import corridor_bbox, corridor_parameters, overpass_filter
+from src.engines.graph_cache import GraphCache
+from src.engines.tile_store import TILE_STORE_DIR, TileStore
+from src.engines.graph_store import edge_geometries, graph_store_path, is_graph_store_current, load_graph_store, save_graph_store
+from src.engines.weight_engine import scenario_weight
+
 def haversine_dist(lat1, lon1, lat2, lon2):
     R = 6371.0 # km
     dlat = math.radians(lat2 - lat1)
@@ -12,71 +19,92 @@ def haversine_dist(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-def get_dynamic_road_graph(coords: list, global_graph=None):
+def load_global_graph(graph_path, use_store=True):
     """
-    Dynamically downloads bounding box road network with caching and dynamic buffer.
-    coords is a list of [lat, lon] lists representing all nodes to visit.
+    Loads the statewide GraphML and compiles it with default (no scenario) weights in the
+    ai_time_min column. Offline preprocessing and the API both go through here so edge ids
+    always agree.
+
+    If preprocess_graph.py built a binary graph store for this exact GraphML, the compact
+    graph is memory-mapped from it instead and G is None.
     """
-    os.makedirs("data/cached_graphs", exist_ok=True)
-    
-    lats = [c[0] for c in coords]
-    lons = [c[1] for c in coords]
-    
-    # Create precise cache key so any matching coord list hits cache
+    store = graph_store_path(graph_path)
+    if use_store and is_graph_store_current(store, graph_path):
+        return None, load_graph_store(store)
+    G = ox.load_graphml(graph_path)
+    cg = compile_graph(G)
+    cg.weights["ai_time_min"] = scenario_weight(cg, 0)
+    return G, cg
+
+def build_graph_store(graph_path):
+    """Parses the GraphML once and writes the binary store load_global_graph prefers."""
+    G, cg = load_global_graph(graph_path, use_store=False)
+    store = graph_store_path(graph_path)
+    save_graph_store(cg, store, source_path=graph_path, geometry=edge_geometries(G, cg))
+    return store
+
+def dynamic_cache_key(coords):
+    # Precise cache key so any matching coord list hits cache
     pair_str = "_".join([f"{round(lat, 3)}_{round(lon, 3)}" for lat, lon in coords])
-    cache_key = hashlib.md5(pair_str.encode()).hexdigest()
-    cache_path = f"data/cached_graphs/{cache_key}.graphml"
+    return hashlib.md5(pair_str.encode()).hexdigest()
 
-    if os.path.exists(cache_path):
-        print(f"Loading cached dynamic graph from {cache_path}...")
-        start = time.time()
-        G = ox.load_graphml(cache_path)
-        print(f"Loaded cached graph in {time.time() - start:.2f}s. Nodes: {len(G)}")
-        return G
+_graph_cache = None
 
-    print("Dynamically fetching new road network for route corridor...")
-    start = time.time()
-    
-    # Calculate max distance across consecutive segments to determine buffer
-    max_dist = 0
-    if len(lats) > 1:
-        max_dist = max([haversine_dist(lats[i], lons[i], lats[i+1], lons[i+1]) for i in range(len(lats)-1)])
-    
-    if max_dist < 100:
-        margin = 0.1
-        custom_filter = '["highway"~"motorway|trunk|primary|secondary|tertiary"]'
-    elif max_dist < 300:
-        margin = 0.2
-        custom_filter = '["highway"~"motorway|trunk|primary|secondary"]'
-    else:
-        margin = 0.3
-        custom_filter = '["highway"~"motorway|trunk|primary"]'
+def get_graph_cache(create=True):
+    """Process-wide GraphCache of downloaded corridors, created on first use (None before that with create=False)."""
+    global _graph_cache
+    if _graph_cache is None and create:
+        _graph_cache = GraphCache()
+    return _graph_cache
 
-    north = max(lats) + margin
-    south = min(lats) - margin
-    common = min(lons) - margin
-    east = max(lons) + margin
-    west = common
+_tile_store = None
 
-    if global_graph is not None:
-        print("Extracting corridor subgraph from global pre-loaded map...")
-        start_truncate = time.time()
-        G_sub = ox.truncate.truncate_graph_bbox(global_graph, bbox=(west, south, east, north))
-        # Important: MUST copy the subgraph so weight engine modifiers don't pollute global graph
-        G_sub = G_sub.copy()
-        print(f"Extracted subgraph in {time.time() - start_truncate:.2f}s. Nodes: {len(G_sub)}")
-        # In case it's completely empty...
-        if len(G_sub) > 0:
-            return G_sub
-        else:
-            print("Subgraph extraction yielded empty graph. Falling back to Overpass download...")
+def get_tile_store(directory=TILE_STORE_DIR):
+    """Process-wide TileStore if preprocess_graph.py built one, else None."""
+    global _tile_store
+    if _tile_store is None and os.path.exists(os.path.join(directory, "manifest.json")):
+        _tile_store = TileStore(directory)
+    return _tile_store
 
+def download_corridor_graph(bbox, classes):
+    """Road network of the given road classes inside (south, west, north, east) from Overpass."""
+    south, west, north, east = bbox
     print("Dynamically fetching new road network from Overpass...")
-    G = ox.graph_from_bbox(bbox=(west, south, east, north), network_type="drive", custom_filter=custom_filter, simplify=True)
+    start = time.time()
+    G = ox.graph_from_bbox(bbox=(west, south, east, north), network_type="drive", custom_filter=overpass_filter(classes), simplify=True)
     G = ox.add_edge_speeds(G)
     G = ox.add_edge_travel_times(G)
-    
-    ox.save_graphml(G, cache_path)
-    
     print(f"Downloaded dynamic graph in {time.time() - start:.2f}s. Nodes: {len(G)}")
     return G
+
+def get_dynamic_compact_graph(coords: list, cache=None):
+    """
+    Corridor road graph around the [lat, lon] waypoints as a CompactGraph. Buffer and road
+    classes scale with the longest leg (corridor.corridor_parameters). Assembled offline
+    from the local tile store when it covers the corridor; otherwise any cached corridor
+    covering this one is reused (see graph_cache.GraphCache) and only misses are downloaded.
+    """
+    margin, classes = corridor_parameters(coords)
+    bbox = corridor_bbox(coords, margin)
+    tiles = get_tile_store()
+    if tiles is not None and tiles.covers(bbox, classes):
+        cg = tiles.load(bbox, classes)
+        if cg is not None:
+            return cg
+    cache = cache or get_graph_cache()
+    cg = cache.get(bbox, classes)
+    if cg is not None:
+        print(f"Using cached corridor graph. Nodes: {len(cg)}")
+        return cg
+    cg = compile_graph(download_corridor_graph(bbox, classes))
+    cache.put(dynamic_cache_key(coords), bbox, classes, cg)
+    return cg
+
+def get_dynamic_road_graph(coords: list):
+    """
+    Downloads the corridor road network around the [lat, lon] waypoints as a networkx graph,
+    uncached. Routing goes through get_dynamic_compact_graph, which caches; with the
+    statewide graph loaded, corridor.extract_corridor restricts searches without any download.
+    """
+    margin, classes = corridor_parameters(coords)
+    return download_corridor_graph(corridor_bbox(coords, margin), classes)
@@ -0,0 +1,124 @@
+import json
+import os
+import numpy as np
+
+from src.engines.compact_graph import CompactGraph
+from src.engines.contraction import graph_fingerprint
+
+# Bumped whenever the on-disk layout changes; older stores are rebuilt, never misread
+GRAPH_STORE_VERSION = 1
+
+GRAPH_ARRAYS = ("node_ids", "lat", "lon", "offsets", "targets", "highway")
+
+
+def graph_store_path(graph_path):
+    """data/tn_highways.graphml -> data/tn_highways.graph (a directory of .npy files)"""
+    return os.path.splitext(graph_path)[0] + ".graph"
+
+
+def _source_stamp(source_path):
+    if not source_path or not os.path.exists(source_path):
+        return None
+    stat = os.stat(source_path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def edge_geometries(G, cg):
+    """
+    (offsets, coords) of every edge's shape in cg edge order: coords[offsets[e]:offsets[e+1]]
+    are [lat, lon] float32 points. Edges without a geometry attribute (straight segments)
+    get no points. Walks G.edges in the same order compile_graph did for the same G.
+    """
+    src, shapes = [], []
+    for u, _, data in G.edges(data=True):
+        src.append(u)
+        geometry = data.get('geometry')
+        shapes.append(np.asarray(geometry.coords, dtype=np.float32)[:, ::-1] if geometry is not None else None)
+    order = np.argsort(np.searchsorted(cg.node_ids, np.array(src, dtype=np.int64)), kind="stable")
+
+    counts = np.array([0 if shapes[i] is None else len(shapes[i]) for i in order], dtype=np.int64)
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    present = [shapes[i] for i in order if shapes[i] is not None]
+    coords = np.concatenate(present) if present else np.empty((0, 2), dtype=np.float32)
+    return offsets, coords
+
+
+def save_graph_store(cg, directory, source_path=None, geometry=None):
+    """
+    Writes cg as one .npy per array plus meta.json. The arrays are loaded memory-mapped, so
+    every process serving the same store shares the page cache instead of a private copy.
+    geometry is an optional edge_geometries() pair.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in GRAPH_ARRAYS:
+        array = getattr(cg, name)
+        if array is not None:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+    for name, array in cg.weights.items():
+        np.save(os.path.join(directory, f"weight.{name}.npy"), np.ascontiguousarray(array))
+    if geometry is not None:
+        np.save(os.path.join(directory, "geometry_offsets.npy"), geometry[0])
+        np.save(os.path.join(directory, "geometry_coords.npy"), geometry[1])
+
+    # meta.json is written last: a store without it is incomplete and ignored
+    meta = {
+        "version": GRAPH_STORE_VERSION,
+        "nodes": len(cg),
+        "edges": cg.num_edges,
+        "weights": list(cg.weights),
+        "highway_names": list(cg.highway_names),
+        "has_highway": cg.highway is not None,
+        "has_geometry": geometry is not None,
+        "fingerprint": graph_fingerprint(cg),
+        "source": _source_stamp(source_path),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_graph_meta(directory):
+    path = os.path.join(directory, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def is_graph_store_current(directory, source_path=None):
+    """True if the store is complete, in the current layout and built from source_path as it is now."""
+    meta = read_graph_meta(directory)
+    if meta is None or meta.get("version") != GRAPH_STORE_VERSION:
+        return False
+    return source_path is None or meta.get("source") == _source_stamp(source_path)
+
+
+def load_graph_store(directory, mmap=True):
+    """CompactGraph backed by the store's arrays (read-only memory maps unless mmap=False)."""
+    meta = read_graph_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No graph store at {directory}")
+    mode = "r" if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+
+    cg = CompactGraph(
+        load("node_ids"), load("lat"), load("lon"), load("offsets"), load("targets"),
+        {name: load(f"weight.{name}") for name in meta["weights"]},
+        highway=load("highway") if meta["has_highway"] else None,
+        highway_names=meta["highway_names"],
+    )
+    # Recomputing it would page in the whole adjacency at startup
+    cg.fingerprint = meta["fingerprint"]
+    return cg
+
+
+def load_edge_geometry(directory, mmap=True):
+    """(offsets, coords) saved with the store, or None if it was built without geometry."""
+    meta = read_graph_meta(directory)
+    if meta is None or not meta.get("has_geometry"):
+        return None
+    mode = "r" if mmap else None
+    return (np.load(os.path.join(directory, "geometry_offsets.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "geometry_coords.npy"), mmap_mode=mode))
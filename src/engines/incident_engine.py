@@ -0,0 +1,99 @@
+import glob
+import hashlib
+import os
+import numpy as np
+
+from src.engines.contraction import graph_fingerprint
+
+INCIDENT_DIR = "data/incidents"
+
+# Share of edges treated as accident zones and how much they slow traffic
+ACCIDENT_RATE = 0.05
+ACCIDENT_FACTOR = 5.0
+DEFAULT_INCIDENT_SET = "default"
+DEFAULT_INCIDENT_SEED = 42
+
+
+class IncidentLayer:
+    """
+    A named, seeded set of incident edges over a CompactGraph, stored as a bitmap indexed by
+    edge id. The version is a content hash, so anything derived from a layer (weights,
+    cached routes, benchmarks) can be keyed by it and reproduced exactly.
+    """
+
+    def __init__(self, name, seed, rate, factor, fingerprint, mask):
+        self.name = name
+        self.seed = seed
+        self.rate = rate
+        self.factor = factor
+        self.fingerprint = fingerprint
+        self.mask = mask
+        digest = hashlib.sha1(f"{name}:{seed}:{rate}:{factor}:{fingerprint}".encode())
+        digest.update(np.packbits(mask).tobytes())
+        self.version = f"{name}-{digest.hexdigest()[:10]}"
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+    def multiplier(self):
+        """Per-edge float32 traffic multiplier: factor on incident edges, 1 elsewhere."""
+        return np.where(self.mask, np.float32(self.factor), np.float32(1.0))
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "seed": self.seed,
+            "rate": self.rate,
+            "factor": self.factor,
+            "incident_edges": len(self),
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path, name=self.name, seed=self.seed, rate=self.rate, factor=self.factor,
+            fingerprint=self.fingerprint, num_edges=len(self.mask), bits=np.packbits(self.mask),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        mask = np.unpackbits(data["bits"], count=int(data["num_edges"])).astype(bool)
+        return cls(str(data["name"]), int(data["seed"]), float(data["rate"]),
+                   float(data["factor"]), str(data["fingerprint"]), mask)
+
+
+def incident_layer_path(name, directory=INCIDENT_DIR):
+    return os.path.join(directory, f"{name}.npz")
+
+
+def generate_incident_layer(cg, name=DEFAULT_INCIDENT_SET, seed=DEFAULT_INCIDENT_SEED,
+                            rate=ACCIDENT_RATE, factor=ACCIDENT_FACTOR):
+    """Draws a reproducible incident bitmap: each edge is hit with probability rate."""
+    mask = np.random.default_rng(seed).random(cg.num_edges) < rate
+    return IncidentLayer(name, seed, rate, factor, graph_fingerprint(cg), mask)
+
+
+def load_incident_layers(cg, directory=INCIDENT_DIR):
+    """
+    Loads every persisted layer that matches cg, keyed by name. The default layer is
+    generated (and persisted) if missing or stale, so accident scenarios always have one.
+    """
+    fingerprint = graph_fingerprint(cg)
+    layers = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.npz"))):
+        layer = IncidentLayer.load(path)
+        if layer.fingerprint != fingerprint:
+            print(f"⚠️ Ignoring stale incident layer {path}")
+            continue
+        layers[layer.name] = layer
+
+    if DEFAULT_INCIDENT_SET not in layers:
+        layer = generate_incident_layer(cg)
+        try:
+            layer.save(incident_layer_path(layer.name, directory))
+        except OSError as e:
+            print(f"⚠️ Could not persist incident layer: {e}")
+        layers[layer.name] = layer
+    return layers
@@ -0,0 +1,245 @@
+import atexit
+import math
+import mmap
+import multiprocessing as mp
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+from src.engines.compact_graph import CompactGraph, dijkstra_tree, tree_path
+
+# Below this many sources the pool round trips cost more than the searches themselves
+PARALLEL_MIN_SOURCES = 8
+
+# Every uvicorn worker (serve.py exports WEB_CONCURRENCY) gets its share of the cores
+POOL_WORKERS = max(1, (os.cpu_count() or 1) // max(1, int(os.environ.get("WEB_CONCURRENCY", "1"))))
+
+# Weight arrays kept shared with the pool: the 8 scenario rows plus a few incident / time-of-day ones
+POOL_WEIGHT_SLOTS = 16
+
+
+class PathMatrix:
+    """
+    Many-to-many result: cost[i][j] between nodes[i] and nodes[j] plus the predecessor tree
+    of every row, so the edge path for any (i, j) is only rebuilt when it's asked for.
+    A row's tree is either a full dijkstra_tree pred array or, from the pool, a dict holding
+    only the nodes on the paths to the targets.
+    """
+
+    def __init__(self, cg, nodes, costs, preds):
+        self.cg = cg
+        self.nodes = nodes
+        self.costs = costs
+        self.preds = preds
+
+    def edges(self, i, j):
+        """Edge ids of the path nodes[i] -> nodes[j], or None if unreachable."""
+        if not math.isfinite(self.costs[i, j]):
+            return None
+        return tree_path(self.cg, int(self.nodes[i]), int(self.nodes[j]), self.preds[i])
+
+
+# --- Shared-memory worker side ---
+
+_worker_graph = None
+_worker_weights = OrderedDict()
+
+
+def _attach(spec):
+    """(segment or None, array) for a spec from _share: a shared memory segment or a file mapping."""
+    if spec[0] == "file":
+        _, filename, offset, dtype, shape = spec
+        return None, np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape)
+    _, name, dtype, shape = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(graph_specs):
+    global _worker_graph
+    segments = {name: _attach(spec) for name, spec in graph_specs.items()}
+    arrays = {name: arr for name, (_, arr) in segments.items()}
+    _worker_graph = CompactGraph(arrays["node_ids"], None, None, arrays["offsets"], arrays["targets"], {})
+    _worker_graph._segments = segments
+
+
+def _worker_row(source, weight_spec, targets):
+    key = weight_spec[1:3]
+    if key not in _worker_weights:
+        _worker_weights[key] = _attach(weight_spec)
+        # Same bound as the parent's published weights; it unlinks segments it evicts
+        while len(_worker_weights) > POOL_WEIGHT_SLOTS:
+            shm, _ = _worker_weights.popitem(last=False)[1]
+            if shm is not None:
+                shm.close()
+    _worker_weights.move_to_end(key)
+    w = _worker_weights[key][1]
+    dist, pred = dijkstra_tree(_worker_graph, source, weight=w, targets=targets)
+    return dist[targets], _path_tree(_worker_graph, source, targets, pred)
+
+
+def _path_tree(cg, source, targets, pred):
+    """{node: pred edge} for the nodes on the paths to targets; the rest of the tree isn't sent back."""
+    tree = {}
+    for node in targets:
+        while node != source and node not in tree:
+            e = int(pred[node])
+            if e < 0:
+                break
+            tree[node] = e
+            node = int(cg.sources[e])
+    return tree
+
+
+# --- Parent side ---
+
+def _file_spec(arr):
+    """Spec mapping arr straight from its file when it is a view of a read-only np.memmap, else None."""
+    mm = getattr(arr, "_mmap", None)
+    if not isinstance(arr, np.memmap) or mm is None or not arr.filename or not arr.flags.c_contiguous:
+        return None
+    # np.memmap maps from the offset rounded down to the allocation granularity
+    start = arr.offset - arr.offset % mmap.ALLOCATIONGRANULARITY
+    offset = start + arr.ctypes.data - np.frombuffer(mm, dtype=np.uint8).ctypes.data
+    return ("file", arr.filename, int(offset), arr.dtype.str, arr.shape)
+
+
+def _share(arr):
+    """
+    (segment to release or None, spec) for workers to attach arr: arrays memory-mapped from
+    a file (a graph store, serve.py's shared resources) are mapped by the workers too, anything
+    else is copied once into a new shared memory segment.
+    """
+    spec = _file_spec(arr)
+    if spec is not None:
+        return None, spec
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, ("shm", shm.name, arr.dtype.str, arr.shape)
+
+
+def _release(shm):
+    if shm is not None:
+        shm.close()
+        shm.unlink()
+
+
+class SharedGraphPool:
+    """
+    Process pool whose workers attach the read-only CSR arrays of one CompactGraph from
+    shared memory (or the files they are mapped from) instead of receiving a pickled copy.
+    Weight arrays are shared on first use and kept for the next POOL_WEIGHT_SLOTS - 1 others,
+    so the 8 scenario rows are published once for the life of the pool.
+    """
+
+    def __init__(self, cg, workers):
+        self.cg = cg
+        self._segments = []
+        self._weights = OrderedDict()  # id(w) -> (w, segment, spec)
+        self._lock = threading.Lock()
+        specs = {}
+        for name in ("node_ids", "offsets", "targets"):
+            shm, specs[name] = _share(getattr(cg, name))
+            self._segments.append(shm)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=mp.get_context("spawn"),
+            initializer=_init_worker, initargs=(specs,),
+        )
+
+    def _weight_spec(self, weight):
+        w = self.cg.weight(weight)
+        with self._lock:
+            entry = self._weights.get(id(w))
+            if entry is None or entry[0] is not w:
+                shm, spec = _share(w)
+                entry = self._weights[id(w)] = (w, shm, spec)
+                while len(self._weights) > POOL_WEIGHT_SLOTS:
+                    _release(self._weights.popitem(last=False)[1][1])
+            self._weights.move_to_end(id(w))
+            return entry[2]
+
+    def rows(self, sources, weight, targets):
+        weight_spec = self._weight_spec(weight)
+        futures = [self.executor.submit(_worker_row, s, weight_spec, targets) for s in sources]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for shm in self._segments + [entry[1] for entry in self._weights.values()]:
+            _release(shm)
+        self._segments = []
+        self._weights.clear()
+
+
+_pool = None
+_pool_graph = None
+_pool_lock = threading.RLock()
+
+
+def set_pool_graph(cg):
+    """
+    Marks cg as the long-lived graph whose matrices may use the process pool (the statewide
+    graph). Any pool built for a previous graph is closed; per-request graphs (downloaded,
+    cached or stitched corridors) always run in-process.
+    """
+    global _pool_graph
+    with _pool_lock:
+        if cg is not _pool_graph:
+            close_pools()
+            _pool_graph = cg
+
+
+def get_pool(cg, workers=None):
+    """The one long-lived pool, for the graph set with set_pool_graph; spawning workers per request would dwarf the searches."""
+    global _pool
+    with _pool_lock:
+        if cg is not _pool_graph:
+            raise ValueError("Process pool is only kept for the graph passed to set_pool_graph")
+        if _pool is None:
+            _pool = SharedGraphPool(cg, workers or POOL_WORKERS)
+        return _pool
+
+
+@atexit.register
+def close_pools():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def compute_matrix(cg, nodes, weight="ai_time_min", workers=None, corridor=None):
+    """
+    Fills an n x n cost matrix between compact node indices with one one-to-many Dijkstra
+    per row (n searches instead of n^2 point-to-point ones). Rows are spread over a shared
+    memory process pool when there are enough of them, more than one CPU and cg is the
+    graph set with set_pool_graph.
+
+    corridor (a corridor.Corridor over cg) restricts every search to it; those bounded
+    searches run in-process. Matrices large enough for the pool ignore it, n parallel
+    unrestricted searches beat n serial bounded ones. If any pair is unreachable inside
+    the corridor the matrix is recomputed on the whole graph.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    targets = nodes.tolist()
+    workers = workers or POOL_WORKERS
+
+    if cg is _pool_graph and workers > 1 and len(nodes) >= PARALLEL_MIN_SOURCES:
+        corridor = None
+        rows = get_pool(cg, workers).rows(targets, weight, targets)
+    else:
+        rows = []
+        for s in targets:
+            dist, pred = dijkstra_tree(cg, s, weight=weight, targets=targets, corridor=corridor)
+            rows.append((dist[nodes], pred))
+
+    costs = np.vstack([r[0] for r in rows])
+    if corridor is not None and not np.isfinite(costs).all():
+        return compute_matrix(cg, nodes, weight=weight, workers=workers)
+    preds = [r[1] for r in rows]
+    return PathMatrix(cg, nodes, costs, preds)
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import threading
+import time
+import httpx
+
+# Point at a self-hosted OSRM (or `uvicorn src.engines.osrm_stub:app`) instead of the public demo server
+OSRM_BASE_URL = os.environ.get("OSRM_BASE_URL", "http://router.project-osrm.org")
+OSRM_TIMEOUT = float(os.environ.get("OSRM_TIMEOUT", "10"))
+OSRM_MAX_CONNECTIONS = int(os.environ.get("OSRM_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OSRM while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        # When the half-open trial call was let through; None while no trial is pending
+        self.trial_started = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self):
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError("OSRM circuit breaker is open")
+        if state == "half-open":
+            now = time.monotonic()
+            # A trial that never reported back (e.g. cancelled) is given up after reset_timeout
+            if self.trial_started is not None and now - self.trial_started < self.reset_timeout:
+                raise CircuitOpenError("OSRM circuit breaker is half-open, trial call in progress")
+            self.trial_started = now
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.state == "half-open":
+            self.opened_at = time.monotonic()
+        self.trial_started = None
+
+
+class OSRMClient:
+    """
+    Async OSRM HTTP client on a single pooled httpx connection pool, with retries
+    (exponential backoff) and a circuit breaker shared by every request.
+    `transport` lets tests route requests to an in-process app such as osrm_stub.
+    """
+
+    def __init__(self, base_url=None, timeout=OSRM_TIMEOUT, max_connections=OSRM_MAX_CONNECTIONS,
+                 retries=2, backoff=0.2, breaker=None, transport=None):
+        self.base_url = (base_url or OSRM_BASE_URL).rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def _get(self, path, params=None):
+        self.breaker.check()
+        for attempt in range(self.retries + 1):
+            try:
+                r = await self.client.get(path, params=params)
+                if r.status_code not in RETRY_STATUSES:
+                    # OSRM reports NoRoute etc. as 400 with a JSON body; that is an answer, not a failure
+                    data = r.json()
+                    self.breaker.record_success()
+                    return data
+            except (httpx.TransportError, ValueError):
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.breaker.record_failure()
+        raise httpx.HTTPStatusError(f"OSRM returned {r.status_code}", request=r.request, response=r)
+
+    @staticmethod
+    def _coords(coords_list):
+        # OSRM wants lon,lat; the rest of the app passes [lat, lon]
+        return ";".join(f"{lon},{lat}" for lat, lon in coords_list)
+
+    async def route(self, coords_list, alternatives=False):
+        params = {"overview": "full", "geometries": "geojson"}
+        if alternatives:
+            params["alternatives"] = "true"
+        return await self._get(f"/route/v1/driving/{self._coords(coords_list)}", params)
+
+    async def table(self, coords_list, annotations=None):
+        params = {"annotations": annotations} if annotations else None
+        return await self._get(f"/table/v1/driving/{self._coords(coords_list)}", params)
+
+    async def legs(self, coords_list):
+        """Routes every consecutive pair concurrently; failed legs come back as exceptions."""
+        pairs = [coords_list[i:i + 2] for i in range(len(coords_list) - 1)]
+        return await asyncio.gather(*(self.route(p) for p in pairs), return_exceptions=True)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# --- Sync bridge for the (threadpool) FastAPI endpoints ---
+# The pooled client lives on one background event loop for the whole process, so
+# connections are reused across requests instead of per asyncio.run() call.
+
+_lock = threading.Lock()
+_loop = None
+_client = None
+
+
+def _background_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="osrm-client", daemon=True).start()
+    return _loop
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            _client = OSRMClient()
+    return _client
+
+
+def set_client(client):
+    """Swaps the shared client (e.g. one built on the stub transport)."""
+    global _client
+    with _lock:
+        _client = client
+
+
+def run_sync(coro):
+    """Runs a coroutine on the shared OSRM loop from synchronous code and waits for it."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
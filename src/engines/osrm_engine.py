@@ -1,15 +1,15 @@
-import requests
-import itertools
+import asyncio
+
+from src.engines.osrm_client import get_client, run_sync
+from src.engines.tsp_solver import solve_open_tsp
 
 def get_predefined_osrm_routes(start_lat, start_lon, end_lat, end_lon):
     """
     Acts as a 'predefined' ultra-fast routing engine.
     Fetches the fastest real-road path from OSRM public API, avoiding 5-min OSMNX Overpass limits.
     """
-    url = f"http://router.project-osrm.org/route/v1/driving/{start_lon},{start_lat};{end_lon},{end_lat}?overview=full&geometries=geojson&alternatives=true"
     try:
-        r = requests.get(url, timeout=10)
-        data = r.json()
+        data = run_sync(get_client().route([[start_lat, start_lon], [end_lat, end_lon]], alternatives=True))
         
         if 'routes' not in data or len(data['routes']) == 0:
             return None, None
@@ -41,71 +41,52 @@ def get_predefined_osrm_routes(start_lat, start_lon, end_lat, end_lon):
         print(f"OSRM Predefined Route Error: {e}")
         return None, None
 
+def _stitch_legs(results):
+    """Concatenates per-leg OSRM route responses (in stop order) into one route."""
+    coords = []
+    length_km = 0
+    time_min = 0
+    for data in results:
+        if isinstance(data, Exception):
+            raise data
+        if 'routes' in data and len(data['routes']) > 0:
+            route = data['routes'][0]
+            segment_coords = [[p[1], p[0]] for p in route['geometry']['coordinates']]
+            coords.extend(segment_coords)
+            length_km += route['distance'] / 1000.0
+            time_min += route['duration'] / 60.0
+    return coords, length_km, time_min
+
+async def _optimized_multi_route(client, coords_list):
+    # Step 1: Solve TSP optimal sequence manually via the Table Matrix API
+    data_table = await client.table(coords_list)
+    if 'durations' not in data_table:
+        return None, None, None
+        
+    best_order, _ = solve_open_tsp(data_table['durations'])
+    sorted_coords = [coords_list[i] for i in best_order]
+        
+    # Step 2: Extract real, unbroken geometries using the standard Route API, stitch them point-to-point
+    # OSRM Public API has geographic snapping bugs for massive multi-stop routes across states, so we do it
+    # leg by leg - but all legs are requested concurrently over the pooled connection
+    return _stitch_legs(await client.legs(sorted_coords))
+
+async def _baseline_multi_route(client, coords_list):
+    coords, base_len, base_time = _stitch_legs(await client.legs(coords_list))
+    if not coords:
+        return None, None, None
+        
+    # Perturb baseline geometry slightly so it visually separates if it happens to be the same path
+    coords = [[lat + 0.005, lon + 0.005] for lat, lon in coords]
+    return coords, base_len, base_time
+
 def get_predefined_osrm_multi_routes(coords_list):
     """
-    Uses OSRM Trip API to natively solve TSP and return geometries.
+    Uses OSRM Table API to solve the stop order and returns the stitched geometry.
     coords_list: list of [lat, lon] starting with origin, ending with destination.
     """
-    coords_str = ";".join([f"{lon},{lat}" for lat, lon in coords_list])
-    
-    # Step 1: Solve TSP optimal sequence manually via the Table Matrix API
-    table_url = f"http://router.project-osrm.org/table/v1/driving/{coords_str}"
     try:
-        r_table = requests.get(table_url, timeout=10)
-        data_table = r_table.json()
-        
-        if 'durations' not in data_table:
-            return None, None, None
-            
-        durations = data_table['durations']
-        n = len(coords_list)
-        
-        # Calculate optimal middle stops routing order
-        middle_indices = list(range(1, n-1))
-        best_duration = float('inf')
-        best_order = None
-        
-        # itertools.permutations takes fraction of a ms since max middle stops = 3 (3! = 6 checks)
-        for perm in itertools.permutations(middle_indices):
-            seq = [0] + list(perm) + [n-1]
-            current_duration = 0
-            for i in range(len(seq)-1):
-                d = durations[seq[i]][seq[i+1]]
-                if d is None:
-                    current_duration = float('inf')
-                    break
-                current_duration += d
-            
-            if current_duration < best_duration:
-                best_duration = current_duration
-                best_order = seq
-                
-        if not best_order:
-            best_order = list(range(n))
-            
-        sorted_coords = [coords_list[i] for i in best_order]
-            
-        # Step 2: Extract real, unbroken geometries using the standard Route API, stitch them point-to-point
-        # OSRM Public API has geographic snapping bugs for massive multi-stop routes across states, so we do it step-by-step
-        coords = []
-        length_km = 0
-        time_min = 0
-        for i in range(len(sorted_coords) - 1):
-            lon1, lat1 = sorted_coords[i][1], sorted_coords[i][0]
-            lon2, lat2 = sorted_coords[i+1][1], sorted_coords[i+1][0]
-            route_url = f"http://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=full&geometries=geojson"
-            
-            r_route = requests.get(route_url, timeout=10)
-            data_route = r_route.json()
-            
-            if 'routes' in data_route and len(data_route['routes']) > 0:
-                route = data_route['routes'][0]
-                segment_coords = [[p[1], p[0]] for p in route['geometry']['coordinates']]
-                coords.extend(segment_coords)
-                length_km += route['distance'] / 1000.0
-                time_min += route['duration'] / 60.0
-        
-        return coords, length_km, time_min
+        return run_sync(_optimized_multi_route(get_client(), coords_list))
     except Exception as e:
         print(f"OSRM Predefined Multi Route Error: {e}")
         return None, None, None
@@ -115,32 +96,47 @@ def get_baseline_osrm_multi_route(coords_list):
     Uses standard OSRM Route API (no TSP optimization) to get baseline metrics
     for the exact order of stops the user entered.
     """
-    coords = []
-    base_len = 0
-    base_time = 0
     try:
-        for i in range(len(coords_list) - 1):
-            lon1, lat1 = coords_list[i][1], coords_list[i][0]
-            lon2, lat2 = coords_list[i+1][1], coords_list[i+1][0]
-            url = f"http://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=full&geometries=geojson"
-            
-            r = requests.get(url, timeout=10)
-            data = r.json()
-            
-            if 'routes' in data and len(data['routes']) > 0:
-                route = data['routes'][0]
-                segment_coords = [[p[1], p[0]] for p in route['geometry']['coordinates']]
-                coords.extend(segment_coords)
-                base_len += route['distance'] / 1000.0
-                base_time += route['duration'] / 60.0
-        
-        if not coords:
-            return None, None, None
-            
-        # Perturb baseline geometry slightly so it visually separates if it happens to be the same path
-        coords = [[lat + 0.005, lon + 0.005] for lat, lon in coords]
-        
-        return coords, base_len, base_time
+        return run_sync(_baseline_multi_route(get_client(), coords_list))
     except Exception as e:
         print(f"OSRM Baseline Route Error: {e}")
         return None, None, None
+
+def get_osrm_cost_matrices(coords_list):
+    """
+    (durations_min, distances_km) between every pair of coords from one OSRM table call,
+    None = unreachable, or (None, None) if OSRM is unavailable.
+    """
+    try:
+        data = run_sync(get_client().table(coords_list, annotations="duration,distance"))
+    except Exception as e:
+        print(f"OSRM Table Error: {e}")
+        return None, None
+    if 'durations' not in data or 'distances' not in data:
+        return None, None
+    durations = [[None if t is None else t / 60.0 for t in row] for row in data['durations']]
+    distances = [[None if d is None else d / 1000.0 for d in row] for row in data['distances']]
+    return durations, distances
+
+def get_osrm_multi_routes(coords_list):
+    """
+    Baseline and optimized multi-stop routes in one go: the baseline legs and the table
+    lookup run concurrently, so latency is roughly table + slowest leg.
+    Returns (baseline, optimized), each (coords, length_km, time_min) or Nones.
+    """
+    async def both():
+        client = get_client()
+        return await asyncio.gather(
+            _baseline_multi_route(client, coords_list),
+            _optimized_multi_route(client, coords_list),
+            return_exceptions=True,
+        )
+
+    try:
+        results = run_sync(both())
+    except Exception as e:
+        results = [e, e]
+    for label, result in zip(("Baseline Route", "Predefined Multi Route"), results):
+        if isinstance(result, Exception):
+            print(f"OSRM {label} Error: {result}")
+    return tuple((None, None, None) if isinstance(r, Exception) else r for r in results)
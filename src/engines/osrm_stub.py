@@ -0,0 +1,73 @@
+"""
+Minimal local stand-in for the OSRM HTTP API (route + table services).
+
+Distances are great-circle km times a road detour factor at a constant speed, and route
+geometries are straight lines, which is enough for tests and offline development:
+
+    uvicorn src.engines.osrm_stub:app --port 5000
+    OSRM_BASE_URL=http://localhost:5000 uvicorn src.api:app
+"""
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from src.engines.compact_graph import haversine_km
+
+ROAD_FACTOR = 1.12  # same constant road geometry as data_generator
+SPEED_KMH = 60.0
+
+app = FastAPI(title="OSRM stub")
+
+
+def _parse(coords):
+    # "lon,lat;lon,lat;..." -> [(lat, lon), ...]
+    points = []
+    for pair in coords.split(";"):
+        lon, lat = pair.split(",")
+        points.append((float(lat), float(lon)))
+    return points
+
+
+def _leg(a, b):
+    km = float(haversine_km(a[0], a[1], b[0], b[1])) * ROAD_FACTOR
+    return km * 1000.0, km / SPEED_KMH * 3600.0
+
+
+def _invalid(message):
+    return JSONResponse(status_code=400, content={"code": "InvalidQuery", "message": message})
+
+
+@app.get("/route/v1/driving/{coords}")
+def route(coords: str, alternatives: bool = False, overview: str = "full", geometries: str = "geojson"):
+    try:
+        points = _parse(coords)
+    except ValueError:
+        return _invalid("Could not parse coordinates")
+    if len(points) < 2:
+        return _invalid("Need at least two coordinates")
+
+    legs = [_leg(points[i], points[i + 1]) for i in range(len(points) - 1)]
+    return {
+        "code": "Ok",
+        "routes": [{
+            "distance": sum(d for d, _ in legs),
+            "duration": sum(t for _, t in legs),
+            "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in points]},
+            "legs": [{"distance": d, "duration": t} for d, t in legs],
+        }],
+        "waypoints": [{"location": [lon, lat]} for lat, lon in points],
+    }
+
+
+@app.get("/table/v1/driving/{coords}")
+def table(coords: str, annotations: str = "duration"):
+    try:
+        points = _parse(coords)
+    except ValueError:
+        return _invalid("Could not parse coordinates")
+    legs = [[(0.0, 0.0) if a == b else _leg(a, b) for b in points] for a in points]
+    result = {"code": "Ok"}
+    if "duration" in annotations:
+        result["durations"] = [[t for _, t in row] for row in legs]
+    if "distance" in annotations:
+        result["distances"] = [[d for d, _ in row] for row in legs]
+    return result
@@ -0,0 +1,31 @@
+import numpy as np
+
+
+def encode_polyline(coords, precision=5):
+    """Encodes [[lat, lon], ...] with the Google encoded polyline algorithm."""
+    if len(coords) == 0:
+        return ""
+    scaled = np.round(np.asarray(coords, dtype=np.float64) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=[[0, 0]]).ravel()
+    chunks = []
+    for value in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def decode_polyline(encoded, precision=5):
+    """Inverse of encode_polyline; returns [[lat, lon], ...]."""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    points = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return points.tolist()
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+ROUTE_CACHE_PATH = os.environ.get("ROUTE_CACHE_PATH", "data/route_cache.sqlite")
+ROUTE_CACHE_TTL = float(os.environ.get("ROUTE_CACHE_TTL", str(24 * 3600)))
+ROUTE_CACHE_MAX_BYTES = int(os.environ.get("ROUTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ROUTE_CACHE_DISK_BYTES = int(os.environ.get("ROUTE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Seconds a worker waits for another one's write lock before treating the access as a miss
+ROUTE_CACHE_DB_TIMEOUT = 5.0
+# Expired rows and the disk cap are enforced every this many writes (and at startup)
+ROUTE_CACHE_PURGE_EVERY = 100
+
+
+def route_cache_key(waypoints, vehicle_type, scenario, **extra):
+    """
+    Stable key for a routing request: snapped waypoints in stop order, vehicle type,
+    scenario flags and anything else that changes the answer (e.g. incident version).
+    """
+    payload = {"waypoints": waypoints, "vehicle_type": vehicle_type, "scenario": scenario, **extra}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RouteCache:
+    """
+    Two-tier route result cache: an in-process LRU bounded by serialized size and TTL, in
+    front of a SQLite store that survives restarts, bounded by TTL and disk_bytes (the
+    soonest to expire, i.e. oldest, go first). Values must be JSON serializable.
+    The SQLite file is shared by worker processes; a locked or failing database is a miss.
+    """
+
+    def __init__(self, path=ROUTE_CACHE_PATH, ttl=ROUTE_CACHE_TTL, max_bytes=ROUTE_CACHE_MAX_BYTES,
+                 disk_bytes=ROUTE_CACHE_DISK_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_bytes = disk_bytes
+        self._writes_since_purge = 0
+        self._memory = OrderedDict()  # key -> (expires_at, size, value)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0,
+                       "disk_evictions": 0, "disk_errors": 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=ROUTE_CACHE_DB_TIMEOUT, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS routes_expires_at ON routes (expires_at)")
+            self._db.commit()
+            with self._lock:
+                self._purge_disk()
+
+    def _disk_error(self, e):
+        self._stats["disk_errors"] += 1
+        print(f"⚠️ Route cache database error, treated as a miss: {e}")
+        try:
+            self._db.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _purge_disk(self):
+        """Drops expired rows, then the soonest to expire until the table fits in disk_bytes."""
+        try:
+            self._db.execute("DELETE FROM routes WHERE expires_at < ?", (time.time(),))
+            total = self._db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM routes").fetchone()[0]
+            if total > self.disk_bytes:
+                cursor = self._db.execute("SELECT key, LENGTH(value) FROM routes ORDER BY expires_at ASC")
+                drop = []
+                for key, size in cursor:
+                    if total <= self.disk_bytes:
+                        break
+                    drop.append((key,))
+                    total -= size
+                self._db.executemany("DELETE FROM routes WHERE key = ?", drop)
+                self._stats["disk_evictions"] += len(drop)
+            self._db.commit()
+            self._writes_since_purge = 0
+        except sqlite3.Error as e:
+            self._disk_error(e)
+
+    def _remember(self, key, expires_at, payload, value):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        self._memory[key] = (expires_at, len(payload), value)
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, (_, size, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= size
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[2]
+                self._memory_bytes -= entry[1]
+                del self._memory[key]
+                self._stats["evictions"] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM routes WHERE key = ? AND expires_at >= ?", (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+                    row = None
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], row[0], value)
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        payload = json.dumps(value)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, payload, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO routes (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, payload, expires_at),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    # Still cached in memory; only the shared tier misses it
+                    self._disk_error(e)
+                self._writes_since_purge += 1
+                if self._writes_since_purge >= ROUTE_CACHE_PURGE_EVERY:
+                    self._purge_disk()
+            self._stats["writes"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM routes")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            disk_entries, disk_used = 0, 0
+            if self._db is not None:
+                try:
+                    disk_entries, disk_used = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM routes").fetchone()
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+            return {
+                **self._stats,
+                "hit_rate": round((lookups - self._stats["misses"]) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_used,
+                "disk_limit_bytes": self.disk_bytes,
+            }
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from src.engines.compact_graph import WEIGHT_COLUMNS
+from src.engines.contraction import CH_ARRAYS, ContractionHierarchy, load_hierarchies
+from src.engines.corridor import CORRIDOR_THRESHOLDS, GridIndex
+from src.engines.eta_engine import ETA_MODEL_PATH, load_time_profiles, model_version
+from src.engines.graph_engine import load_global_graph
+from src.engines.graph_store import graph_store_path, is_graph_store_current, load_graph_store, save_graph_store
+from src.engines.incident_engine import DEFAULT_INCIDENT_SET, load_incident_layers
+from src.engines.spatial_index import SpatialIndex
+from src.engines.weight_engine import build_scenario_weights
+
+# Set by serve.py in the master process; uvicorn workers inherit it and attach instead of loading
+SHARED_RESOURCES_ENV = "SHARED_RESOURCES_DIR"
+
+# RAM-backed where available; falls back to the temp dir (still shared through the page cache)
+SHARED_MEMORY_ROOT = "/dev/shm"
+
+
+def _shared_root(required_bytes):
+    if os.path.isdir(SHARED_MEMORY_ROOT) and shutil.disk_usage(SHARED_MEMORY_ROOT).free > required_bytes * 1.1:
+        return SHARED_MEMORY_ROOT
+    return None
+
+
+def preload_shared_resources(graph_path, eta_model_path=ETA_MODEL_PATH):
+    """
+    Master side: loads the statewide graph and everything workers derive from it once and
+    leaves them in a fresh directory as memory-mappable .npy files plus manifest.json:
+    scenario weights, time-of-day profiles, contraction hierarchies, the per-edge sources,
+    straight-line km and corridor road class masks, the corridor grid and the snapping
+    index (its BallTree through joblib's memory mapping). A current binary graph store is
+    referenced in place instead of being copied.
+    Returns the directory; release_shared_resources removes it.
+    """
+    G, cg = load_global_graph(graph_path)
+    del G
+    layer = load_incident_layers(cg)[DEFAULT_INCIDENT_SET]
+    scenario_weights = build_scenario_weights(cg, layer)
+    eta_version = model_version(eta_model_path) if os.path.exists(eta_model_path) else None
+    profiles = load_time_profiles(graph_path, cg, eta_version)
+    hierarchies = load_hierarchies(graph_path, cg, WEIGHT_COLUMNS)
+    masks = {classes: cg.highway_mask(classes) for _, _, classes in CORRIDOR_THRESHOLDS} if cg.highway is not None else {}
+    grid, spatial = GridIndex(cg), SpatialIndex(cg)
+
+    store = graph_store_path(graph_path)
+    in_place = is_graph_store_current(store, graph_path)
+    required = (
+        scenario_weights.nbytes + sum(p.nbytes for p in profiles.values()) + (0 if in_place else cg.nbytes)
+        + sum(getattr(ch, name).nbytes for ch in hierarchies.values() for name in CH_ARRAYS)
+        + cg.sources.nbytes + cg.straight_km.nbytes + sum(m.nbytes for m in masks.values())
+        + grid.nodes.nbytes + grid.offsets.nbytes
+        + sum(a.nbytes for a in spatial.tree.get_arrays()) + spatial.in_offsets.nbytes + spatial.in_edges.nbytes
+    )
+    directory = tempfile.mkdtemp(prefix="logistics-shared-", dir=_shared_root(required))
+    if not in_place:
+        store = os.path.join(directory, "graph")
+        save_graph_store(cg, store, source_path=graph_path)
+
+    np.save(os.path.join(directory, "scenario_weights.npy"), scenario_weights)
+    for time_of_day, weights in profiles.items():
+        np.save(os.path.join(directory, f"time_profile.{time_of_day}.npy"), weights)
+    for weight, ch in hierarchies.items():
+        ch.save_arrays(os.path.join(directory, f"ch.{weight}"))
+    np.save(os.path.join(directory, "edge_sources.npy"), cg.sources)
+    np.save(os.path.join(directory, "straight_km.npy"), cg.straight_km)
+    for i, mask in enumerate(masks.values()):
+        np.save(os.path.join(directory, f"highway_mask.{i}.npy"), mask)
+    grid.save(os.path.join(directory, "corridor_grid"))
+    spatial.save(os.path.join(directory, "spatial_index"))
+    manifest = {
+        "graph_path": graph_path,
+        "graph_store": store,
+        "incident_version": layer.version,
+        "eta_model_version": eta_version,
+        "time_profiles": list(profiles),
+        "hierarchies": list(hierarchies),
+        "highway_masks": [list(classes) for classes in masks],
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return directory
+
+
+def attach_shared_resources(directory, graph_path):
+    """
+    Worker side: {"tn_compact", "scenario_weights", "time_profiles", "incident_version",
+    "hierarchies", "corridor_grid", "spatial_index"} memory-mapped read-only from a
+    preload_shared_resources directory, or None if it was built for another graph or is gone.
+    """
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest["graph_path"] != graph_path:
+        return None
+
+    def load(name):
+        return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+    cg = load_graph_store(manifest["graph_store"])
+    cg.adopt_edge_arrays(
+        sources=load("edge_sources"), straight_km=load("straight_km"),
+        highway_masks={tuple(classes): load(f"highway_mask.{i}") for i, classes in enumerate(manifest["highway_masks"])},
+    )
+    return {
+        "tn_compact": cg,
+        "scenario_weights": load("scenario_weights"),
+        "time_profiles": {t: load(f"time_profile.{t}") for t in manifest["time_profiles"]},
+        "incident_version": manifest["incident_version"],
+        "hierarchies": {
+            w: ContractionHierarchy.load_arrays(os.path.join(directory, f"ch.{w}")) for w in manifest["hierarchies"]
+        },
+        "corridor_grid": GridIndex.load(cg, os.path.join(directory, "corridor_grid")),
+        "spatial_index": SpatialIndex.load(cg, os.path.join(directory, "spatial_index")),
+    }
+
+
+def release_shared_resources(directory):
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,112 @@
+import os
+import joblib
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from src.engines.compact_graph import EARTH_RADIUS_KM
+
+
+def _expand_ranges(starts, lengths):
+    """Concatenation of range(s, s + n) for every (s, n) pair, without a Python loop."""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return shifts + np.arange(total)
+
+
+class SpatialIndex:
+    """
+    Haversine BallTree over the node coordinates of a CompactGraph, built once and queried
+    in batches. Replaces per-request ox.distance.nearest_nodes calls, each of which rebuilds
+    its own tree.
+    """
+
+    def __init__(self, cg):
+        self.cg = cg
+        self.tree = BallTree(np.radians(np.column_stack((cg.lat, cg.lon))), metric="haversine")
+        # Reverse CSR (edge ids grouped by target) so edge snapping also sees incoming edges
+        order = np.argsort(cg.targets, kind="stable")
+        self.in_offsets = np.zeros(len(cg) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cg.targets, minlength=len(cg)), out=self.in_offsets[1:])
+        self.in_edges = order.astype(np.int64)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.tree, os.path.join(directory, "tree.joblib"))
+        np.save(os.path.join(directory, "in_offsets.npy"), self.in_offsets)
+        np.save(os.path.join(directory, "in_edges.npy"), self.in_edges)
+
+    @classmethod
+    def load(cls, cg, directory):
+        """
+        Index over cg from a save() directory, memory-mapped read-only. joblib maps the
+        BallTree's data, index and node arrays too; only its small Python state is private.
+        """
+        index = cls.__new__(cls)
+        index.cg = cg
+        index.tree = joblib.load(os.path.join(directory, "tree.joblib"), mmap_mode="r")
+        index.in_offsets = np.load(os.path.join(directory, "in_offsets.npy"), mmap_mode="r")
+        index.in_edges = np.load(os.path.join(directory, "in_edges.npy"), mmap_mode="r")
+        return index
+
+    def snap_nodes(self, coords):
+        """
+        Nearest node for every [lat, lon] pair in one query.
+        Returns (compact node indices, distances in km).
+        """
+        points = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+        dist, idx = self.tree.query(points, k=1)
+        return idx[:, 0], dist[:, 0] * EARTH_RADIUS_KM
+
+    def nearest_nodes(self, coords):
+        """OSM node ids for a list of [lat, lon] pairs, like ox.distance.nearest_nodes."""
+        idx, _ = self.snap_nodes(coords)
+        return self.cg.node_ids[idx]
+
+    def snap_to_edges(self, coords, k=8):
+        """
+        Projects every [lat, lon] pair onto the nearest edge among those touching its k
+        nearest nodes. Returns a dict of arrays aligned with coords: edge id, fraction along
+        the edge (0 at source, 1 at target), projected lat/lon and distance in km.
+        """
+        cg = self.cg
+        points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        k = min(k, len(cg))
+        _, nbrs = self.tree.query(np.radians(points), k=k)
+        nodes = nbrs.ravel()
+        point_of_node = np.repeat(np.arange(len(points)), k)
+
+        out_len = cg.offsets[nodes + 1] - cg.offsets[nodes]
+        in_len = self.in_offsets[nodes + 1] - self.in_offsets[nodes]
+        edges = np.concatenate((
+            _expand_ranges(cg.offsets[nodes], out_len),
+            self.in_edges[_expand_ranges(self.in_offsets[nodes], in_len)],
+        ))
+        owner = np.concatenate((np.repeat(point_of_node, out_len), np.repeat(point_of_node, in_len)))
+
+        # Planar projection in a local equirectangular frame around each query point
+        p = points[owner]
+        scale = np.cos(np.radians(p[:, 0]))
+        src, dst = cg.sources[edges], cg.targets[edges]
+        ax, ay = (cg.lon[src] - p[:, 1]) * scale, cg.lat[src] - p[:, 0]
+        bx, by = (cg.lon[dst] - p[:, 1]) * scale, cg.lat[dst] - p[:, 0]
+        dx, dy = bx - ax, by - ay
+        seg = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(seg > 0, seg, 1), 0, 1)
+        px, py = ax + t * dx, ay + t * dy
+        dist = np.hypot(px, py)
+
+        order = np.lexsort((dist, owner))
+        _, first = np.unique(owner[order], return_index=True)
+        if len(first) != len(points):
+            missing = np.setdiff1d(np.arange(len(points)), owner).tolist()
+            raise ValueError(f"No edges near the nearest nodes of coords {[points[i].tolist() for i in missing]} (indices {missing})")
+        best = order[first]
+        return {
+            "edge": edges[best],
+            "fraction": t[best],
+            "lat": p[best, 0] + py[best],
+            "lon": p[best, 1] + px[best] / scale[best],
+            "distance_km": np.radians(dist[best]) * EARTH_RADIUS_KM,
+        }
@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from src.engines.compact_graph import CompactGraph
+
+TILE_STORE_DIR = os.environ.get("TILE_STORE_DIR", "data/tiles")
+TILE_DEG = 0.5
+# Decoded tiles kept in memory per process; a corridor rarely spans more than a few dozen
+TILE_CACHE_SIZE = int(os.environ.get("TILE_CACHE_SIZE", "256"))
+
+# Road class levels, fastest first. Each edge is stored once, in the first level one of its
+# classes belongs to, so a corridor loads only the levels of the classes it routes on
+TILE_LEVELS = (
+    ("primary", ("motorway", "trunk", "primary")),
+    ("secondary", ("secondary",)),
+    ("tertiary", ("tertiary",)),
+)
+
+TILE_ARRAYS = ("node_ids", "lat", "lon", "src", "dst", "length_km", "base_time_min", "highway")
+
+
+def tile_of(lat, lon, tile_deg=TILE_DEG):
+    return int(math.floor(lat / tile_deg)), int(math.floor(lon / tile_deg))
+
+
+def tiles_in_bbox(bbox, tile_deg=TILE_DEG):
+    """(row, col) of every tile intersecting (south, west, north, east)."""
+    r0, c0 = tile_of(bbox[0], bbox[1], tile_deg)
+    r1, c1 = tile_of(bbox[2], bbox[3], tile_deg)
+    return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+
+def level_of(highway_name):
+    """Index into TILE_LEVELS for an osmnx highway value, or None for other road classes."""
+    for i, (_, classes) in enumerate(TILE_LEVELS):
+        # Substring match, like the Overpass regex filter ("['primary', 'secondary']" is primary)
+        if any(c in highway_name for c in classes):
+            return i
+    return None
+
+
+def tiles_within(boundary, tile_deg=TILE_DEG):
+    """
+    (row, col) of every tile lying entirely inside a download boundary: a (south, west,
+    north, east) bbox or a shapely (Multi)Polygon.
+    """
+    if isinstance(boundary, (tuple, list)):
+        south, west, north, east = boundary
+        return [(r, c) for r in range(math.ceil(south / tile_deg), math.floor(north / tile_deg))
+                for c in range(math.ceil(west / tile_deg), math.floor(east / tile_deg))]
+    from shapely.geometry import box
+    west, south, east, north = boundary.bounds
+    return [(r, c) for r, c in tiles_within((south, west, north, east), tile_deg)
+            if boundary.covers(box(c * tile_deg, r * tile_deg, (c + 1) * tile_deg, (r + 1) * tile_deg))]
+
+
+def _tile_path(directory, level, tile):
+    return os.path.join(directory, level, f"{tile[0]}_{tile[1]}.npz")
+
+
+def _read_manifest(directory):
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _merge_tile(path, arrays):
+    """arrays merged into the tile at path: nodes by id, edges by (src, dst, highway, length)."""
+    if os.path.exists(path):
+        with np.load(path) as old:
+            arrays = {k: np.concatenate((old[k], arrays[k])) for k in TILE_ARRAYS}
+    node_ids, first = np.unique(arrays["node_ids"], return_index=True)
+    edge_keys = np.rec.fromarrays((arrays["src"], arrays["dst"], arrays["highway"], np.round(arrays["length_km"], 4)))
+    _, keep = np.unique(edge_keys, return_index=True)
+    keep.sort()
+    merged = {"node_ids": node_ids, "lat": arrays["lat"][first], "lon": arrays["lon"][first]}
+    merged.update({k: arrays[k][keep] for k in ("src", "dst", "length_km", "base_time_min", "highway")})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, **merged)
+
+
+def add_graph_to_tiles(cg, boundary, directory=TILE_STORE_DIR, tile_deg=TILE_DEG):
+    """
+    Partitions a CompactGraph into the tile store, merging with tiles already there, so a
+    large region can be built from several downloads. Edges go to the tile of their source
+    node and carry both endpoints' coordinates, so every tile is self-contained and tiles
+    stitch by OSM node id. Roads outside TILE_LEVELS are not stored.
+
+    boundary is the area the graph was downloaded for (see tiles_within). Tiles lying
+    entirely inside it are recorded as covered for each level the graph has roads of (a
+    download filtered to major roads covers no lower level). The extent of the nodes is no
+    substitute: it spans whatever lies between the outermost roads, downloaded or not.
+    """
+    manifest = _read_manifest(directory) or {"tile_deg": tile_deg, "highway_names": [], "covered": {}}
+    if manifest["tile_deg"] != tile_deg:
+        raise ValueError(f"Tile store {directory} uses {manifest['tile_deg']} degree tiles")
+
+    # Highway codes are per store: this graph's names are appended to the store's list
+    names = manifest["highway_names"]
+    for name in cg.highway_names:
+        if name not in names:
+            names.append(name)
+    code_map = np.array([names.index(n) for n in cg.highway_names], dtype=np.uint16)
+    edge_level = np.array([-1 if level_of(n) is None else level_of(n) for n in cg.highway_names], dtype=np.int64)[cg.highway]
+
+    src, dst = cg.sources, cg.targets
+    rows = np.floor(cg.lat[src] / tile_deg).astype(np.int64)
+    cols = np.floor(cg.lon[src] / tile_deg).astype(np.int64)
+    inside = tiles_within(boundary, tile_deg)
+
+    written = 0
+    for level_index, (level, _) in enumerate(TILE_LEVELS):
+        in_level = np.flatnonzero(edge_level == level_index)
+        if len(in_level) == 0:
+            continue
+        covered = {tuple(t) for t in manifest["covered"].get(level, [])}
+        manifest["covered"][level] = sorted(covered.union(inside))
+        tile_keys = rows[in_level] * 100_000 + cols[in_level]
+        order = np.argsort(tile_keys, kind="stable")
+        _, starts = np.unique(tile_keys[order], return_index=True)
+        for edges in np.split(in_level[order], starts[1:]):
+            nodes = np.unique(np.concatenate((src[edges], dst[edges])))
+            _merge_tile(_tile_path(directory, level, (int(rows[edges[0]]), int(cols[edges[0]]))), {
+                "node_ids": cg.node_ids[nodes], "lat": cg.lat[nodes], "lon": cg.lon[nodes],
+                "src": cg.node_ids[src[edges]], "dst": cg.node_ids[dst[edges]],
+                "length_km": cg.weights["length_km"][edges], "base_time_min": cg.weights["base_time_min"][edges],
+                "highway": code_map[cg.highway[edges]],
+            })
+            written += 1
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return written
+
+
+class TileStore:
+    """
+    Read side of the tile store: assembles the tiles intersecting a corridor, for the
+    levels its road classes need, into one CompactGraph. Decoded tiles are kept in an LRU,
+    so neighbouring corridors mostly reuse tiles already in memory.
+    """
+
+    def __init__(self, directory=TILE_STORE_DIR, cache_size=TILE_CACHE_SIZE):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No tile store at {directory}")
+        self.directory = directory
+        self.tile_deg = manifest["tile_deg"]
+        self.highway_names = tuple(manifest["highway_names"])
+        self.covered = {level: {tuple(t) for t in tiles} for level, tiles in manifest["covered"].items()}
+        self.cache_size = cache_size
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"tile_hits": 0, "tile_loads": 0, "graphs": 0}
+
+    @staticmethod
+    def levels(classes):
+        return [level for level, level_classes in TILE_LEVELS if set(level_classes) & set(classes)]
+
+    def covers(self, bbox, classes):
+        """True if every tile of bbox was built for every level the road classes need."""
+        tiles = tiles_in_bbox(bbox, self.tile_deg)
+        return all(t in self.covered.get(level, ()) for level in self.levels(classes) for t in tiles)
+
+    def _tile(self, level, tile):
+        key = (level, tile)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                self._stats["tile_hits"] += 1
+                return self._tiles[key]
+        path = _tile_path(self.directory, level, tile)
+        arrays = None
+        if os.path.exists(path):
+            with np.load(path) as data:
+                arrays = {k: data[k] for k in TILE_ARRAYS}
+        with self._lock:
+            # Empty tiles (sea, no roads of this level) are remembered as None
+            self._tiles[key] = arrays
+            self._stats["tile_loads"] += 1
+            while len(self._tiles) > self.cache_size:
+                self._tiles.popitem(last=False)
+        return arrays
+
+    def load(self, bbox, classes):
+        """CompactGraph of the given road classes over every tile intersecting bbox, or None if empty."""
+        parts = [t for level in self.levels(classes) for t in (self._tile(level, tile) for tile in tiles_in_bbox(bbox, self.tile_deg))
+                 if t is not None]
+        if not parts:
+            return None
+        with self._lock:
+            self._stats["graphs"] += 1
+        return stitch_tiles(parts, self.highway_names)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "tiles_in_memory": len(self._tiles), "covered_tiles": {level: len(tiles) for level, tiles in self.covered.items()}}
+
+
+def stitch_tiles(parts, highway_names):
+    """
+    One CompactGraph from tile arrays. Boundary nodes appear in every tile with an edge
+    touching them and are merged by OSM id; edges leaving the loaded tiles keep their far
+    endpoint as a dead end. Weights default like compile_graph (ai_time_min = base time).
+    """
+    node_ids, first = np.unique(np.concatenate([p["node_ids"] for p in parts]), return_index=True)
+    lat = np.concatenate([p["lat"] for p in parts])[first]
+    lon = np.concatenate([p["lon"] for p in parts])[first]
+
+    src = np.searchsorted(node_ids, np.concatenate([p["src"] for p in parts]))
+    dst = np.searchsorted(node_ids, np.concatenate([p["dst"] for p in parts]))
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(node_ids)), out=offsets[1:])
+
+    length = np.concatenate([p["length_km"] for p in parts]).astype(np.float32)[order]
+    base_time = np.concatenate([p["base_time_min"] for p in parts]).astype(np.float32)[order]
+    weights = {"length_km": length, "base_time_min": base_time, "ai_time_min": base_time.copy()}
+    highway = np.concatenate([p["highway"] for p in parts]).astype(np.uint16)[order]
+    return CompactGraph(node_ids, lat.astype(np.float64), lon.astype(np.float64), offsets,
+                        dst[order].astype(np.int32), weights, highway=highway, highway_names=highway_names)
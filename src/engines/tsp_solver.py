@@ -0,0 +1,149 @@
+import time
+import numpy as np
+
+# Held-Karp is O(2^m * m^2) in the m middle stops: ~0.1s at 15, doubling per extra stop
+HELD_KARP_MAX_STOPS = 15
+DEFAULT_TIME_BUDGET = 1.0  # seconds of local search for the heuristic tier
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+# Stands in for unreachable legs so the solvers can still add and compare costs
+UNREACHABLE_PENALTY = 1e12
+
+
+def as_cost_matrix(durations):
+    """float64 matrix from an OSRM table / cost matrix; None, NaN and inf mean unreachable."""
+    d = np.array([[np.inf if v is None else v for v in row] for row in durations], dtype=np.float64) \
+        if isinstance(durations, list) else np.asarray(durations, dtype=np.float64)
+    return np.where(np.isfinite(d), d, np.inf)
+
+
+def path_cost(d, order):
+    order = np.asarray(order)
+    return float(d[order[:-1], order[1:]].sum())
+
+
+def held_karp(d):
+    """
+    Exact open path 0 -> (all middle stops) -> n-1 by dynamic programming over subsets of
+    the middle stops. Each popcount layer of subsets is relaxed in one vectorized step.
+    """
+    n = len(d)
+    m = n - 2
+    if m <= 0:
+        return list(range(n))
+
+    mid = d[1:-1, 1:-1]
+    bits = 1 << np.arange(m)
+    dp = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.int8)
+    dp[bits, np.arange(m)] = d[0, 1:-1]
+
+    popcount = ((np.arange(1 << m)[:, None] & bits[None, :]) > 0).sum(axis=1)
+    for k in range(2, m + 1):
+        masks = np.flatnonzero(popcount == k)
+        # dp[mask, j] = min_i dp[mask without j, i] + d[i, j]. For j outside mask the "previous"
+        # subset is in a layer not filled yet, so those entries stay inf
+        prev = masks[:, None] ^ bits[None, :]
+        cand = dp[prev] + mid.T[None, :, :]
+        best = cand.argmin(axis=2)
+        dp[masks] = np.take_along_axis(cand, best[:, :, None], axis=2)[:, :, 0]
+        parent[masks] = best
+
+    full = (1 << m) - 1
+    last = int(np.argmin(dp[full] + d[1:-1, -1]))
+    order = []
+    mask = full
+    while last >= 0:
+        order.append(last + 1)
+        prev_last = int(parent[mask, last])
+        mask ^= 1 << last
+        last = prev_last
+    return [0] + order[::-1] + [n - 1]
+
+
+def nearest_neighbour(d):
+    n = len(d)
+    order = [0]
+    left = set(range(1, n - 1))
+    while left:
+        candidates = np.fromiter(left, dtype=np.int64)
+        nxt = int(candidates[np.argmin(d[order[-1], candidates])])
+        order.append(nxt)
+        left.remove(nxt)
+    return order + [n - 1]
+
+
+def _two_opt_pass(d, order):
+    """Best segment reversal per start position; returns True if the path improved."""
+    n = len(order)
+    improved = False
+    for i in range(1, n - 2):
+        p = np.asarray(order)
+        fwd = np.concatenate([[0.0], np.cumsum(d[p[:-1], p[1:]])])
+        rev = np.concatenate([[0.0], np.cumsum(d[p[1:], p[:-1]])])
+        j = np.arange(i + 1, n - 1)
+        # Asymmetric matrices: the reversed segment is paid in the opposite direction
+        delta = (d[p[i - 1], p[j]] + d[p[i], p[j + 1]] + (rev[j] - rev[i])
+                 - d[p[i - 1], p[i]] - d[p[j], p[j + 1]] - (fwd[j] - fwd[i]))
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-9:
+            jj = int(j[k])
+            order[i:jj + 1] = order[i:jj + 1][::-1]
+            improved = True
+    return improved
+
+
+def _or_opt_pass(d, order):
+    """Moves segments of 1-3 consecutive stops to their best position; True if improved."""
+    improved = False
+    for seg_len in OR_OPT_SEGMENTS:
+        i = 1
+        while i + seg_len <= len(order) - 1:
+            p = np.asarray(order)
+            a, s0, s1, b = p[i - 1], p[i], p[i + seg_len - 1], p[i + seg_len]
+            removal_gain = d[a, s0] + d[s1, b] - d[a, b]
+            rest = np.concatenate([p[:i], p[i + seg_len:]])
+            k = np.arange(len(rest) - 1)
+            insert_cost = d[rest[k], s0] + d[s1, rest[k + 1]] - d[rest[k], rest[k + 1]]
+            insert_cost[i - 1] = np.inf  # that's where the segment came from
+            best = int(np.argmin(insert_cost))
+            if insert_cost[best] - removal_gain < -1e-9:
+                rest = rest.tolist()
+                order[:] = rest[:best + 1] + p[i:i + seg_len].tolist() + rest[best + 1:]
+                improved = True
+            i += 1
+    return improved
+
+
+def local_search(d, order, time_budget=DEFAULT_TIME_BUDGET):
+    """2-opt then Or-opt passes until neither improves the path or the time budget runs out."""
+    deadline = time.perf_counter() + time_budget
+    order = list(order)
+    while time.perf_counter() < deadline:
+        improved = _two_opt_pass(d, order)
+        if time.perf_counter() >= deadline:
+            break
+        improved = _or_opt_pass(d, order) or improved
+        if not improved:
+            break
+    return order
+
+
+def solve_open_tsp(durations, time_budget=DEFAULT_TIME_BUDGET, exact_max_stops=HELD_KARP_MAX_STOPS):
+    """
+    Stop order for an open path that keeps the first and last entries of the (possibly
+    asymmetric) duration matrix fixed: exact Held-Karp for up to exact_max_stops middle
+    stops, nearest neighbour + 2-opt / Or-opt within time_budget seconds above that.
+    Returns (order, cost); cost is inf when some leg of the best order is unreachable.
+    """
+    d = as_cost_matrix(durations)
+    n = len(d)
+    if n <= 3:
+        order = list(range(n))
+    else:
+        penalized = np.where(np.isfinite(d), d, UNREACHABLE_PENALTY)
+        if n - 2 <= exact_max_stops:
+            order = held_karp(penalized)
+        else:
+            order = local_search(penalized, nearest_neighbour(penalized), time_budget)
+    return order, path_cost(d, order) if n > 1 else 0.0
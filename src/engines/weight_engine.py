@@ -1,46 +1,61 @@
-import random
+import numpy as np
 
-def apply_conditions(G, settings):
+from src.engines.incident_engine import generate_incident_layer
+
+# Live condition flags, in bit order: scenario_index() packs them into 0..7
+SCENARIO_FLAGS = ("heavy_rain", "rush_hour", "accident_zone")
+NUM_SCENARIOS = 1 << len(SCENARIO_FLAGS)
+
+def road_traffic_factor(hw):
+    """Base congestion factor based on road type."""
+    if 'motorway' in hw or 'trunk' in hw:
+        return 1.0
+    elif 'primary' in hw:
+        return 1.2
+    elif 'secondary' in hw:
+        return 1.5
+    return 2.0
+
+def scenario_index(settings):
+    """Packs the scenario flags of settings into a row index of build_scenario_weights()."""
+    return sum(1 << bit for bit, flag in enumerate(SCENARIO_FLAGS) if getattr(settings, flag, False))
+
+def highway_traffic_factors(cg):
+    """road_traffic_factor of every edge of a CompactGraph (float32)."""
+    factor_by_code = np.array([road_traffic_factor(hw) for hw in cg.highway_names], dtype=np.float32)
+    return factor_by_code[cg.highway]
+
+def scenario_weight(cg, index, incidents=None, base=None):
+    """
+    ai_time_min for every edge of a CompactGraph under a single scenario index.
+    The graph is left untouched; the accident scenario applies the given
+    incident_engine.IncidentLayer (default layer if None), the only incident model.
+    base replaces the road type ladder (base_time_min * road_traffic_factor) as the
+    free-flow time, e.g. an eta_engine time-of-day profile; conditions apply on top.
+    """
+    names = cg.highway_names
+    rush_by_code = np.array([hw in ["primary", "secondary"] for hw in names], dtype=bool)
+    if base is None:
+        base, factor = cg.weights["base_time_min"], highway_traffic_factors(cg)
+    else:
+        factor = np.ones(cg.num_edges, dtype=np.float32)
+
+    if index & 1:
+        factor = factor * 1.2
+    if index & 2:
+        factor = np.where(rush_by_code[cg.highway], factor * 1.4, factor)
+    if index & 4:
+        if incidents is None:
+            incidents = generate_incident_layer(cg)
+        factor = factor * incidents.multiplier()
+
+    return (base * factor).astype(np.float32)
+
+def build_scenario_weights(cg, incidents=None):
     """
-    Applies live conditions to the graph G directly modifying edge data to apply weight.
-    Returns the modified Graph.
+    Precomputes ai_time_min for all 8 flag combinations as a (8, num_edges) float32 array,
+    indexed by scenario_index(). Computed once at startup and selected per request.
     """
-    # Create or use provided graph
-    for u, v, data in G.edges(data=True):
-        length_km = data.get('length', 100) / 1000.0
-        base_time = data.get('travel_time', length_km * 60) / 60.0 # mins
-        
-        # Base factor based on road type
-        hw = data.get('highway', '')
-        if 'motorway' in hw or 'trunk' in hw:
-            traffic_factor = 1.0 
-        elif 'primary' in hw:
-            traffic_factor = 1.2
-        elif 'secondary' in hw:
-            traffic_factor = 1.5
-        else:
-            traffic_factor = 2.0
-            
-        # Live Condition Simulator
-        if getattr(settings, 'heavy_rain', False):
-            traffic_factor *= 1.2
-            
-        if getattr(settings, 'rush_hour', False) and hw in ["primary", "secondary"]:
-            traffic_factor *= 1.4
-            
-        if getattr(settings, 'accident_zone', False):
-            # Deterministic mock rule for accident zone based on edge ID or just a fixed random seed
-            if random.random() < 0.05: 
-                traffic_factor *= 5.0
-                
-        ai_time = base_time * traffic_factor
-        
-        # We store details in edge data
-        data["ai_time_min"] = ai_time
-        data["base_time_min"] = base_time
-        data["length_km"] = length_km
-        
-        # Note: Fuel cost now tracked cleanly here initially or handled dynamically 
-        # but since Eco Engine uses full path distance, we will handle fuel/co2 via Eco Engine
-        # based on path distance.
-    return G
+    if incidents is None:
+        incidents = generate_incident_layer(cg)
+    return np.stack([scenario_weight(cg, i, incidents) for i in range(NUM_SCENARIOS)])
@@ -3,6 +3,8 @@ from sklearn.pipeline import Pipeline
 import joblib
 import os
 
+from src.model_compiler import compile_pipeline, compiled_model_path
+
 def train_and_save_model(X_train, y_train, preprocessor, model_path="models/delivery_time_predictor.pkl"):
     """
     Trains a machine learning model and saves it.
@@ -29,4 +31,7 @@ def train_and_save_model(X_train, y_train, preprocessor, model_path="models/deli
     joblib.dump(model_pipeline, model_path)
     print(f"Model saved to {model_path}")
 
+    # Array-compiled copy for fast loading / small-batch inference in the API
+    compile_pipeline(model_pipeline).save(compiled_model_path(model_path))
+
     return model_pipeline
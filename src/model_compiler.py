@@ -0,0 +1,227 @@
+"""
+Compiles the trained delivery time Pipeline (ColumnTransformer of StandardScaler /
+OneHotEncoder + RandomForestRegressor) into flat NumPy arrays, evaluated by vectorized
+traversal of all trees at once. The compiled file loads without unpickling sklearn objects
+and predicts the same values as the Pipeline:
+
+    python -m src.model_compiler                 # models/delivery_time_predictor.pkl -> .npz
+    python -m src.model_compiler --benchmark     # load time, memory, throughput vs joblib
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import joblib
+import numpy as np
+import pandas as pd
+
+MODEL_PATH = "models/delivery_time_predictor.pkl"
+# Rows walked together; bounds the (trees, rows) index arrays to a few MB
+PREDICT_CHUNK_ROWS = 1024
+BENCHMARK_BATCH_SIZES = (1, 16, 256, 4096)
+
+
+def compiled_model_path(model_path=MODEL_PATH):
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+class CompiledForest:
+    """
+    Array-backed equivalent of the Pipeline: per input column either a (mean, scale)
+    standardization, a category list one-hot expanded, or passthrough, followed by every
+    tree's nodes concatenated (left/right child, feature, threshold, leaf value).
+    predict() takes the same DataFrame as Pipeline.predict.
+    """
+
+    def __init__(self, columns, left, right, feature, threshold, value, roots, depth):
+        self.columns = columns  # [{"name", "kind": "scale"|"onehot"|"passthrough", ...}]
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        # Interleaved (right, left) children so a step is one gather at 2 * node + go_left;
+        # leaves point at themselves and absorb the remaining levels
+        self._is_leaf = left < 0
+        own = np.arange(len(left), dtype=np.int32)
+        self._children = np.empty(2 * len(left), dtype=np.int32)
+        self._children[0::2] = np.where(self._is_leaf, own, right)
+        self._children[1::2] = np.where(self._is_leaf, own, left)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.left, self.right, self.feature, self.threshold, self.value, self.roots))
+
+    def transform(self, X):
+        """Dense float32 feature matrix, column for column what the ColumnTransformer produces."""
+        parts = []
+        for col in self.columns:
+            x = X[col["name"]].to_numpy()
+            if col["kind"] == "scale":
+                parts.append(((x.astype(np.float64) - col["mean"]) / col["scale"])[:, None])
+            elif col["kind"] == "onehot":
+                # Unknown categories encode as all zeros (handle_unknown="ignore" semantics)
+                parts.append(x.astype(object)[:, None] == np.array(col["categories"], dtype=object)[None, :])
+            else:
+                parts.append(x.astype(np.float64)[:, None])
+        # sklearn trees compare float32 features against float64 thresholds
+        return np.hstack(parts).astype(np.float32)
+
+    def _predict_transformed(self, Xt):
+        """Walks every (tree, row) pair one level per step: (trees, rows) node indices."""
+        flat = Xt.ravel()
+        row_offsets = (np.arange(len(Xt), dtype=np.int64) * Xt.shape[1])[None, :]
+        node = np.repeat(self.roots[:, None].astype(np.int32), len(Xt), axis=1)
+        for level in range(self.depth):
+            go_left = flat[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = self._children[2 * node + go_left]
+            # Most leaves sit well above the deepest one
+            if level % 4 == 3 and self._is_leaf[node].all():
+                break
+        return self.value[node].mean(axis=0)
+
+    def predict(self, X):
+        Xt = self.transform(X)
+        out = np.empty(len(Xt), dtype=np.float64)
+        for lo in range(0, len(Xt), PREDICT_CHUNK_ROWS):
+            out[lo:lo + PREDICT_CHUNK_ROWS] = self._predict_transformed(Xt[lo:lo + PREDICT_CHUNK_ROWS])
+        return out
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        columns = [{k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in col.items()} for col in self.columns]
+        np.savez(path, columns=json.dumps(columns), left=self.left, right=self.right,
+                 feature=self.feature, threshold=self.threshold, value=self.value, roots=self.roots, depth=self.depth)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(json.loads(str(data["columns"])), data["left"], data["right"], data["feature"],
+                   data["threshold"], data["value"], data["roots"], data["depth"])
+
+
+def _compile_columns(preprocessor):
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    columns = []
+    for name, transformer, cols in preprocessor.transformers_:
+        if transformer == "drop" or len(cols) == 0:
+            continue
+        for k, col in enumerate(cols):
+            if transformer == "passthrough":
+                columns.append({"name": col, "kind": "passthrough"})
+            elif isinstance(transformer, StandardScaler):
+                mean = transformer.mean_[k] if transformer.with_mean else 0.0
+                scale = transformer.scale_[k] if transformer.with_std else 1.0
+                columns.append({"name": col, "kind": "scale", "mean": float(mean), "scale": float(scale)})
+            elif isinstance(transformer, OneHotEncoder) and transformer.drop is None:
+                columns.append({"name": col, "kind": "onehot", "categories": transformer.categories_[k].tolist()})
+            else:
+                raise ValueError(f"Unsupported transformer in '{name}': {transformer!r}")
+    return columns
+
+
+def compile_pipeline(pipeline):
+    """CompiledForest for a Pipeline(preprocessor=ColumnTransformer, regressor=forest or tree)."""
+    preprocessor, regressor = pipeline.steps[0][1], pipeline.steps[-1][1]
+    if len(pipeline.steps) != 2 or not hasattr(preprocessor, "transformers_"):
+        raise ValueError("Expected Pipeline([('preprocessor', ColumnTransformer), ('regressor', ...)])")
+    estimators = getattr(regressor, "estimators_", [regressor])
+
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        # Children are re-based into the concatenated arrays; leaves keep -1
+        left.append(np.where(is_leaf, -1, tree.children_left + offset))
+        right.append(np.where(is_leaf, -1, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        value.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+        depth = max(depth, tree.max_depth)
+
+    return CompiledForest(
+        _compile_columns(preprocessor),
+        np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+        np.concatenate(feature).astype(np.int32), np.concatenate(threshold).astype(np.float64),
+        np.concatenate(value).astype(np.float64), np.array(roots, dtype=np.int64), depth,
+    )
+
+
+def compile_model_file(model_path=MODEL_PATH, out_path=None):
+    out_path = out_path or compiled_model_path(model_path)
+    compiled = compile_pipeline(joblib.load(model_path))
+    compiled.save(out_path)
+    print(f"Compiled {model_path} -> {out_path} ({len(compiled.roots)} trees, {len(compiled.left)} nodes)")
+    return out_path
+
+
+def _timed_load(loader, path, repeats=3):
+    times = []
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        model = loader(path)
+        times.append(time.perf_counter() - start)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return model, min(times), peak
+
+
+def benchmark(model_path=MODEL_PATH, compiled_path=None, rows=100_000, seed=42):
+    """Load time, load memory, size on disk, throughput and max deviation: pickle vs compiled."""
+    compiled_path = compiled_path or compiled_model_path(model_path)
+    pipeline, pickle_load, pickle_mem = _timed_load(joblib.load, model_path)
+    compiled, compiled_load, compiled_mem = _timed_load(CompiledForest.load, compiled_path)
+
+    rng = np.random.default_rng(seed)
+    tod = [c["categories"] for c in compiled.columns if c["kind"] == "onehot"][0]
+    X = pd.DataFrame({
+        'distance_km': rng.uniform(5, 700, rows),
+        'delivery_demand': rng.integers(10, 100, rows).astype(np.float64),
+        'traffic_factor': rng.uniform(1.0, 4.0, rows),
+        'time_of_day': rng.choice(tod, rows),
+    })
+
+    results = {"pickle_mb": os.path.getsize(model_path) / 1e6, "compiled_mb": os.path.getsize(compiled_path) / 1e6,
+               "pickle_load_s": pickle_load, "compiled_load_s": compiled_load,
+               "pickle_load_peak_mb": pickle_mem / 1e6, "compiled_load_peak_mb": compiled_mem / 1e6}
+    # Per-call overhead dominates small batches, node visits dominate large ones
+    for label, model in (("pickle", pipeline), ("compiled", compiled)):
+        for batch in BENCHMARK_BATCH_SIZES:
+            calls = max(1, min(200, rows // batch))
+            start = time.perf_counter()
+            for i in range(calls):
+                model.predict(X.iloc[i * batch:(i + 1) * batch])
+            results[f"{label}_rows_per_s@{batch}"] = calls * batch / (time.perf_counter() - start)
+        start = time.perf_counter()
+        results[f"{label}_predictions"] = model.predict(X)
+        results[f"{label}_rows_per_s@{rows}"] = rows / (time.perf_counter() - start)
+
+    results["max_abs_diff"] = float(np.abs(results.pop("pickle_predictions") - results.pop("compiled_predictions")).max())
+    for key, val in results.items():
+        print(f"{key:<30} {val:,.6g}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the delivery time model to flat NumPy arrays.")
+    parser.add_argument("--model", default=MODEL_PATH, help="joblib Pipeline to compile")
+    parser.add_argument("--out", default=None, help="Output .npz (default: next to the model)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare against the joblib pickle afterwards")
+    parser.add_argument("--rows", type=int, default=100_000, help="Benchmark batch size")
+    args = parser.parse_args()
+
+    out_path = compile_model_file(args.model, args.out)
+    if args.benchmark:
+        benchmark(args.model, out_path, rows=args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,85 +5,143 @@ from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 import os
 import glob
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+VRP_COLUMNS = ['cust_no', 'x_coord', 'y_coord', 'demand', 'ready_time', 'due_date', 'service_time']
+
 def parse_vrp_file(filepath):
     """
     Parses a single VRP benchmark file (Solomon format).
     Extracts customer locations, demand, and time windows.
+    Lines are streamed up to the customer header; the numeric block below it is parsed
+    straight into one float array instead of a DataFrame of strings.
+    """
+    with open(filepath, 'r') as f:
+        # Find where the customer data starts
+        for line in f:
+            if "CUST NO." in line.upper():
+                break
+        else:
+            return None # Or raise an error if the format is unexpected
+
+        values = np.array(f.read().split(), dtype=np.float64)
+
+    if len(values) % len(VRP_COLUMNS):
+        raise ValueError(f"Malformed customer table in {filepath}")
+    table = values.reshape(-1, len(VRP_COLUMNS))
+
+    # Integral columns (all of them in the Solomon set) keep an integer dtype
+    return pd.DataFrame({
+        col: table[:, k].astype(np.int64) if np.all(table[:, k] == np.trunc(table[:, k])) else table[:, k]
+        for k, col in enumerate(VRP_COLUMNS)
+    })
+
+def iter_vrp_files(filepaths, workers=None):
+    """
+    Parses many VRP files on a thread pool and yields (instance_id, node_df) in input order
+    as soon as each one is ready. instance_id is the file name without extension.
+    """
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        for path, node_df in zip(filepaths, executor.map(parse_vrp_file, filepaths)):
+            if node_df is None:
+                raise ValueError(f"Could not parse VRP data from file: {path}")
+            yield os.path.splitext(os.path.basename(path))[0], node_df
+
+def load_vrp_instances(filepaths, workers=None):
+    """All instances in one node DataFrame with a categorical instance_id column."""
+    frames = [node_df.assign(instance_id=instance_id) for instance_id, node_df in iter_vrp_files(filepaths, workers)]
+    df = pd.concat(frames, ignore_index=True)
+    df['instance_id'] = df['instance_id'].astype('category')
+    return df
+
+def parse_vrp_vehicles(filepath):
+    """
+    Reads the fleet section of a Solomon VRP file.
+    Returns (number_of_vehicles, capacity), or None if the section is missing.
     """
     with open(filepath, 'r') as f:
         content = f.readlines()
 
-    # Find where the customer data starts
-    data_start_index = -1
     for i, line in enumerate(content):
-        if "CUST NO." in line.upper():
-            data_start_index = i + 1
-            break
-    
-    if data_start_index == -1:
-        return None # Or raise an error if the format is unexpected
-
-    # Read the data into a DataFrame, splitting by whitespace
-    data_rows = [line.split() for line in content[data_start_index:] if line.strip()]
-    df = pd.DataFrame(data_rows, columns=['cust_no', 'x_coord', 'y_coord', 'demand', 'ready_time', 'due_date', 'service_time'])
+        if "NUMBER" in line.upper() and "CAPACITY" in line.upper():
+            values = [row.split() for row in content[i + 1:] if row.strip()]
+            if values and len(values[0]) >= 2:
+                return int(values[0][0]), int(values[0][1])
+    return None
 
-    # Convert columns to numeric types
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col])
+TIME_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+DEFAULT_LINK_SEED = 42
 
-    return df
-
-def create_links_from_nodes(node_df):
+def iter_links_from_nodes(node_df, seed=DEFAULT_LINK_SEED, chunk_size=None):
+    """
+    Yields the links DataFrame in blocks of chunk_size start nodes (all at once by default).
+    Each simulated feature has its own random stream, so the values do not depend on chunk_size.
+    """
+    n = len(node_df)
+    chunk_size = chunk_size or n
+    xy = node_df[['x_coord', 'y_coord']].to_numpy(dtype=np.float64)
+    demand = node_df['demand'].to_numpy()
+    names = pd.Index([f"C_{int(c)}" for c in node_df['cust_no']])
+    fuel_rng, traffic_rng, time_rng = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(3)]
+
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        # Every (i, j) pair of the block except self-loops, in row-major order
+        i, j = np.nonzero(np.arange(lo, hi)[:, None] != np.arange(n)[None, :])
+        i += lo
+        m = len(i)
+        yield pd.DataFrame({
+            "start_location": pd.Categorical.from_codes(i, categories=names),
+            "end_location": pd.Categorical.from_codes(j, categories=names),
+            "distance_km": np.sqrt(((xy[i] - xy[j]) ** 2).sum(axis=1)),
+            "delivery_demand": demand[j],
+            "fuel_cost_per_km": fuel_rng.uniform(0.1, 0.3, m), # Simulate feature
+            "traffic_factor": traffic_rng.uniform(1.0, 2.5, m), # Simulate feature
+            "time_of_day": pd.Categorical.from_codes(time_rng.integers(0, len(TIME_OF_DAY), m), categories=TIME_OF_DAY), # Simulate feature
+        })
+
+def create_links_from_nodes(node_df, seed=DEFAULT_LINK_SEED, chunk_size=None):
     """
     Creates a DataFrame of all possible links (edges) between nodes.
     Calculates Euclidean distance and simulates other required features.
+    Built column-wise from array ops; chunk_size bounds the temporary index arrays for large n.
     """
-    links = []
-    for i, start_node in node_df.iterrows():
-        for j, end_node in node_df.iterrows():
-            if i == j:
-                continue # No self-loops
-            distance = np.sqrt((start_node['x_coord'] - end_node['x_coord'])**2 + (start_node['y_coord'] - end_node['y_coord'])**2)
-            links.append({
-                "start_location": f"C_{int(start_node['cust_no'])}",
-                "end_location": f"C_{int(end_node['cust_no'])}",
-                "distance_km": distance,
-                "delivery_demand": end_node['demand'],
-                "fuel_cost_per_km": np.random.uniform(0.1, 0.3), # Simulate feature
-                "traffic_factor": np.random.uniform(1.0, 2.5), # Simulate feature
-                "time_of_day": np.random.choice(['morning', 'afternoon', 'evening', 'night']) # Simulate feature
-            })
-    return pd.DataFrame(links)
-
-def load_and_combine_data(data_directory):
+    chunks = list(iter_links_from_nodes(node_df, seed=seed, chunk_size=chunk_size))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+def load_and_combine_data(data_directory, workers=None):
     """
     Loads and combines all .txt files from a given directory into a single DataFrame.
+    Files are parsed concurrently and turned into links one instance at a time.
     
     Args:
         data_directory (str): The path to the directory containing .txt data files.
+        workers (int): Parser threads (default: a few more than the CPU count).
 
     Returns:
-        pd.DataFrame: A single DataFrame containing all the data.
+        pd.DataFrame: A single DataFrame containing all the data, with an instance_id column.
     """
-    txt_files = glob.glob(os.path.join(data_directory, "*.txt"))
+    txt_files = sorted(glob.glob(os.path.join(data_directory, "*.txt")))
     if not txt_files:
         raise FileNotFoundError(f"No .txt files found in the directory: {data_directory}")
     
-    print(f"Found {len(txt_files)} files to load: {txt_files}")
+    print(f"Found {len(txt_files)} files to load from {data_directory}")
     
-    # We will process the first file found for this example.
-    # You could extend this to combine nodes from all files if needed.
-    first_file = txt_files[0]
-    print(f"Parsing VRP data from: {first_file}")
-    node_df = parse_vrp_file(first_file)
-
-    if node_df is None:
-        raise ValueError(f"Could not parse VRP data from file: {first_file}")
-
     print("Creating links between nodes and simulating features...")
-    links_df = create_links_from_nodes(node_df)
+    links = []
+    for instance_id, node_df in iter_vrp_files(txt_files, workers):
+        # Per-instance seed so adding files doesn't change the links of the others
+        seed = (DEFAULT_LINK_SEED, zlib.crc32(instance_id.encode()))
+        links.append(create_links_from_nodes(node_df, seed=seed).assign(instance_id=instance_id))
+
+    links_df = pd.concat(links, ignore_index=True)
+    # Concatenating differing per-instance categories falls back to object; re-encode once
+    for col in ['start_location', 'end_location', 'instance_id']:
+        links_df[col] = links_df[col].astype('category')
     return links_df
 
 def preprocess_data(df):
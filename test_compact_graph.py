@@ -0,0 +1,60 @@
+import math
+import random
+import numpy as np
+import pytest
+
+from src.engines.compact_graph import dijkstra_tree, shortest_path, tree_path
+from src.engines.corridor import GridIndex, extract_corridor
+
+WEIGHTS = ["length_km", "base_time_min"]
+
+
+def pairs(cg, count=60, seed=1):
+    rnd = random.Random(seed)
+    return [(rnd.randrange(len(cg)), rnd.randrange(len(cg))) for _ in range(count)]
+
+
+def path_cost(cg, edges, weight):
+    return float(cg.weight(weight)[edges].sum(dtype=np.float64))
+
+
+@pytest.mark.parametrize("weight", WEIGHTS)
+def test_astar_matches_dijkstra(grid_cg, weight):
+    for source, target in pairs(grid_cg):
+        dist, pred = dijkstra_tree(grid_cg, source, weight=weight)
+        cost, edges = shortest_path(grid_cg, source, target, weight=weight)
+        plain, _ = shortest_path(grid_cg, source, target, weight=weight, heuristic=False)
+        if math.isinf(dist[target]):
+            assert math.isinf(cost) and edges is None
+            continue
+        assert cost == pytest.approx(dist[target], rel=1e-9)
+        assert plain == pytest.approx(dist[target], rel=1e-9)
+        # The returned edges are a real path of that cost
+        assert path_cost(grid_cg, edges, weight) == pytest.approx(cost, rel=1e-6)
+        assert path_cost(grid_cg, tree_path(grid_cg, source, target, pred), weight) == pytest.approx(cost, rel=1e-6)
+
+
+def test_edges_form_a_path(grid_cg):
+    for source, target in pairs(grid_cg, 20):
+        _, edges = shortest_path(grid_cg, source, target, weight="length_km")
+        if not edges:
+            continue
+        assert int(grid_cg.sources[edges[0]]) == source and int(grid_cg.targets[edges[-1]]) == target
+        assert np.array_equal(grid_cg.sources[edges[1:]], grid_cg.targets[edges[:-1]])
+
+
+def test_corridor_search_matches_between_astar_and_dijkstra(grid_cg):
+    grid = GridIndex(grid_cg)
+    for source, target in pairs(grid_cg, 30, seed=3):
+        coords = [[float(grid_cg.lat[source]), float(grid_cg.lon[source])],
+                  [float(grid_cg.lat[target]), float(grid_cg.lon[target])]]
+        corridor = extract_corridor(grid_cg, coords, grid)
+        dist, _ = dijkstra_tree(grid_cg, source, weight="length_km", corridor=corridor)
+        cost, edges = shortest_path(grid_cg, source, target, weight="length_km", corridor=corridor)
+        assert cost == pytest.approx(dist[target], rel=1e-9) or (math.isinf(cost) and math.isinf(dist[target]))
+        if edges:
+            assert all(int(grid_cg.targets[e]) in corridor for e in edges)
+            assert corridor.edge_ok[edges].all()
+        # Never cheaper than the unrestricted search
+        full, _ = dijkstra_tree(grid_cg, source, weight="length_km")
+        assert cost >= full[target] - 1e-9
@@ -0,0 +1,61 @@
+import math
+import random
+import numpy as np
+import pytest
+
+from src.engines.compact_graph import compile_graph, dijkstra_tree, shortest_path
+from src.engines.contraction import ContractionHierarchy, build_hierarchy, hierarchy_path, load_hierarchies
+from conftest import make_grid_graph
+
+WEIGHTS = ["length_km", "base_time_min"]
+
+
+@pytest.fixture(scope="module")
+def hierarchies(grid_cg):
+    return {weight: build_hierarchy(grid_cg, weight) for weight in WEIGHTS}
+
+
+def pairs(cg, count=60, seed=5):
+    rnd = random.Random(seed)
+    return [(rnd.randrange(len(cg)), rnd.randrange(len(cg))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("weight", WEIGHTS)
+def test_ch_matches_astar_and_dijkstra(grid_cg, hierarchies, weight):
+    ch = hierarchies[weight]
+    for source, target in pairs(grid_cg):
+        dist, _ = dijkstra_tree(grid_cg, source, weight=weight)
+        astar, _ = shortest_path(grid_cg, source, target, weight=weight)
+        cost, edges = ch.query(source, target)
+        if math.isinf(dist[target]):
+            assert math.isinf(cost) and edges is None
+            continue
+        assert cost == pytest.approx(dist[target], rel=1e-6)
+        assert astar == pytest.approx(dist[target], rel=1e-9)
+        # Unpacked shortcuts are a path of original edges with the same cost
+        assert float(grid_cg.weight(weight)[edges].sum(dtype=np.float64)) == pytest.approx(cost, rel=1e-6)
+        if edges:
+            assert int(grid_cg.sources[edges[0]]) == source and int(grid_cg.targets[edges[-1]]) == target
+            assert np.array_equal(grid_cg.sources[edges[1:]], grid_cg.targets[edges[:-1]])
+
+
+def test_saved_hierarchy_round_trips(tmp_path, grid_cg, hierarchies):
+    graph_path = str(tmp_path / "grid.graphml")
+    ch = hierarchies["length_km"]
+    ch.save(hierarchy_path(graph_path, "length_km"))
+    ch.save_arrays(str(tmp_path / "shared"))
+
+    loaded = load_hierarchies(graph_path, grid_cg, WEIGHTS)
+    assert list(loaded) == ["length_km"]
+    mapped = ContractionHierarchy.load_arrays(str(tmp_path / "shared"))
+    for source, target in pairs(grid_cg, 20):
+        expected = ch.query(source, target)
+        assert loaded["length_km"].query(source, target) == expected
+        assert mapped.query(source, target) == expected
+
+
+def test_stale_hierarchy_is_ignored(tmp_path, hierarchies):
+    graph_path = str(tmp_path / "grid.graphml")
+    hierarchies["length_km"].save(hierarchy_path(graph_path, "length_km"))
+    other = compile_graph(make_grid_graph(k=6, seed=9))
+    assert load_hierarchies(graph_path, other, WEIGHTS) == {}
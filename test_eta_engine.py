@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.engines.compact_graph import compile_graph
+from src.engines.eta_engine import (ETA_FACTOR_RANGE, edge_traffic_factors, load_time_profiles,
+                                    predict_time_profiles, save_time_profiles, time_profile_path)
+from src.engines.weight_engine import highway_traffic_factors
+from conftest import make_grid_graph
+
+
+class TargetModel:
+    """Predicts the training target exactly (distance_km * traffic_factor), scaled per time of day."""
+
+    SCALE = {"morning": 1.0, "afternoon": 1.1, "evening": 1.3, "night": 0.9}
+
+    def __init__(self):
+        self.rows = []
+
+    def predict(self, X):
+        self.rows.append(len(X))
+        return (X["distance_km"] * X["traffic_factor"] * X["time_of_day"].map(self.SCALE)).to_numpy()
+
+
+def test_profiles_follow_each_edges_pace(grid_cg):
+    profiles = predict_time_profiles(TargetModel(), grid_cg)
+    ladder = grid_cg.weights["base_time_min"] * highway_traffic_factors(grid_cg)
+    for time_of_day, scale in TargetModel.SCALE.items():
+        np.testing.assert_allclose(profiles[time_of_day], ladder * scale, rtol=1e-5)
+        assert profiles[time_of_day].dtype == np.float32
+
+
+def test_edges_of_one_class_differ_by_speed(grid_cg):
+    profile = predict_time_profiles(TargetModel(), grid_cg, times=["morning"])["morning"]
+    per_km = profile / grid_cg.weight("length_km")
+    for code in np.unique(grid_cg.highway):
+        assert len(np.unique(np.round(per_km[grid_cg.highway == code], 4))) > 1
+
+
+def test_feature_rows_are_deduplicated_and_batched(grid_cg):
+    model = TargetModel()
+    full = predict_time_profiles(model, grid_cg, times=["night"])
+    clipped = np.round(np.clip(edge_traffic_factors(grid_cg), *ETA_FACTOR_RANGE), 2)
+    assert sum(model.rows) == len(np.unique(clipped)) < grid_cg.num_edges
+
+    model = TargetModel()
+    batched = predict_time_profiles(model, grid_cg, times=["night"], batch_size=7)
+    assert max(model.rows) <= 7
+    np.testing.assert_array_equal(batched["night"], full["night"])
+
+
+def test_saved_profiles_are_checked_against_graph_and_model(tmp_path, grid_cg):
+    graph_path = str(tmp_path / "grid.graphml")
+    profiles = predict_time_profiles(TargetModel(), grid_cg)
+    save_time_profiles(time_profile_path(graph_path), profiles, grid_cg, "v1")
+
+    loaded = load_time_profiles(graph_path, grid_cg, "v1")
+    assert list(loaded) == list(profiles)
+    np.testing.assert_array_equal(loaded["evening"], profiles["evening"])
+    assert load_time_profiles(graph_path, grid_cg, "v2") == {}
+    assert load_time_profiles(graph_path, compile_graph(make_grid_graph(k=5, seed=3)), "v1") == {}
@@ -0,0 +1,99 @@
+import math
+import numpy as np
+import pytest
+
+pytest.importorskip("ortools")
+
+from src.engines.fleet_engine import solve_fleet
+
+CAPACITY = 10.0
+
+
+def instance(n=9, seed=0):
+    """Depot 0 plus n - 1 customers in a 30 x 30 minute square; travel time is Euclidean."""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 30, (n, 2))
+    xy[0] = 15
+    durations = np.hypot(*(xy[:, None, :] - xy[None, :, :]).transpose(2, 0, 1))
+    demands = np.concatenate(([0], rng.integers(1, 5, n - 1))).astype(float)
+    ready = np.concatenate(([0], rng.uniform(0, 60, n - 1)))
+    windows = [(0, 240)] + [(r, r + 60) for r in ready[1:]]
+    service = np.concatenate(([0], np.full(n - 1, 5.0)))
+    return durations, demands, windows, service
+
+
+def assert_feasible(solution, durations, demands, windows, service, capacities):
+    served = [node for route in solution["routes"] for node in route]
+    assert len(served) == len(set(served)) and 0 not in served
+    assert sorted(served + solution["dropped"]) == list(range(1, len(durations)))
+    for route, arrival, load, capacity in zip(solution["routes"], solution["arrivals"], solution["loads"], capacities):
+        assert load == pytest.approx(sum(demands[node] for node in route))
+        assert load <= capacity + 1e-9
+        previous, time = 0, None
+        for node, at in zip(route, arrival):
+            ready, due = windows[node]
+            assert ready - 1e-6 <= at <= due + 1e-6
+            if time is not None:
+                # Never earlier than leaving the previous stop allows (times are rounded to 0.01 min)
+                assert at >= time + service[previous] + durations[previous, node] - 0.02
+            previous, time = node, at
+
+
+def test_capacities_and_time_windows_are_respected():
+    durations, demands, windows, service = instance()
+    capacities = [CAPACITY, CAPACITY]
+    solution = solve_fleet(durations, demands, capacities, windows, service, time_limit=5, solution_limit=200)
+    assert solution is not None and solution["dropped"] == []
+    assert_feasible(solution, durations, demands, windows, service, capacities)
+    assert sum(1 for route in solution["routes"] if route) == 2  # 20 units of demand need both vehicles
+
+
+def test_fractional_demands_keep_their_precision():
+    durations, demands, windows, service = instance(n=5, seed=1)
+    demands = np.array([0, 2.5, 2.5, 2.5, 2.5])
+    solution = solve_fleet(durations, demands, [5.0, 5.0], windows, service, time_limit=5, solution_limit=100)
+    assert solution["dropped"] == []
+    assert sorted(solution["loads"]) == [5.0, 5.0]
+
+
+def test_unserveable_stops_are_dropped():
+    durations, demands, windows, service = instance()
+    demands[1] = CAPACITY + 1           # fits no vehicle
+    windows[2] = (0, durations[0, 2] / 2)  # closes before anyone can get there
+    durations[:, 3] = durations[3, :] = np.inf  # unreachable
+    durations[3, 3] = 0
+    capacities = [CAPACITY, CAPACITY, CAPACITY]
+    solution = solve_fleet(durations, demands, capacities, windows, service, time_limit=5, solution_limit=200)
+    assert solution is not None
+    assert sorted(solution["dropped"]) == [1, 2, 3]
+    assert_feasible(solution, durations, demands, windows, service, capacities)
+
+
+def test_warm_start_round_trips():
+    durations, demands, windows, service = instance(seed=3)
+    capacities = [CAPACITY, CAPACITY]
+    first = solve_fleet(durations, demands, capacities, windows, service, time_limit=5, solution_limit=200)
+    # Starting from its own routes with no room to search returns those routes
+    again = solve_fleet(durations, demands, capacities, windows, service, time_limit=5,
+                        initial_routes=first["routes"], solution_limit=1)
+    assert again["routes"] == first["routes"]
+    assert again["total_time"] == pytest.approx(first["total_time"])
+
+
+def test_infeasible_warm_start_falls_back_to_a_fresh_search(capsys):
+    durations, demands, windows, service = instance(seed=4)
+    capacities = [CAPACITY, CAPACITY]
+    everything_on_one = [list(range(1, len(durations))), []]  # over capacity
+    solution = solve_fleet(durations, demands, capacities, windows, service, time_limit=5,
+                           initial_routes=everything_on_one, solution_limit=200)
+    assert "infeasible" in capsys.readouterr().out
+    assert_feasible(solution, durations, demands, windows, service, capacities)
+
+
+def test_same_solution_limit_gives_the_same_result():
+    durations, demands, windows, service = instance(n=15, seed=5)
+    capacities = [CAPACITY] * 4
+    runs = [solve_fleet(durations, demands, capacities, windows, service, time_limit=10, solution_limit=100)
+            for _ in range(2)]
+    assert runs[0]["routes"] == runs[1]["routes"]
+    assert math.isclose(runs[0]["total_time"], runs[1]["total_time"])
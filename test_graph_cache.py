@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import time
+import pytest
+
+from src.engines import graph_cache
+from src.engines.compact_graph import CompactGraph
+from src.engines.graph_cache import GraphCache
+from src.engines.graph_store import save_graph_store
+
+ALL_CLASSES = ("motorway", "trunk", "primary", "secondary", "tertiary")
+MAJOR = ("motorway", "trunk", "primary")
+CORRIDOR = (8.0, 76.0, 8.6, 76.6)
+INNER = (8.1, 76.1, 8.4, 76.4)
+
+
+def stores(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith(".graph"))
+
+
+def test_contained_bbox_hits_in_memory_and_on_disk(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path))
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    assert cache.get(INNER, ALL_CLASSES) is grid_cg
+    assert cache.get((7.9, 76.1, 8.4, 76.4), ALL_CLASSES) is None
+    assert cache.get(INNER, ALL_CLASSES + ("residential",)) is None
+
+    other = GraphCache(str(tmp_path))
+    loaded = other.get(INNER, ALL_CLASSES)
+    assert loaded is not None and len(loaded) == len(grid_cg) and loaded.num_edges == grid_cg.num_edges
+    stats = other.stats()
+    assert stats["disk_hits"] == 1 and stats["containment_hits"] == 1
+
+
+def test_smallest_containing_corridor_wins(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path))
+    small = CompactGraph(grid_cg.node_ids, grid_cg.lat, grid_cg.lon, grid_cg.offsets, grid_cg.targets,
+                         grid_cg.weights, grid_cg.highway, grid_cg.highway_names)
+    cache.put("big", CORRIDOR, ALL_CLASSES, grid_cg)
+    cache.put("small", (8.05, 76.05, 8.5, 76.5), ALL_CLASSES, small)
+    assert cache.get(INNER, ALL_CLASSES) is small
+
+
+def test_superset_classes_are_narrowed_to_the_request(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path))
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    for tier in (cache, GraphCache(str(tmp_path))):
+        narrowed = tier.get(INNER, MAJOR)
+        assert narrowed.num_edges == int(grid_cg.highway_mask(MAJOR).sum()) < grid_cg.num_edges
+        assert all(any(c in narrowed.highway_names[h] for c in MAJOR) for h in set(narrowed.highway.tolist()))
+        # Narrowed once, then served from memory
+        assert tier.get(INNER, MAJOR) is narrowed
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path, grid_cg):
+    save_graph_store(grid_cg, str(tmp_path / "probe"))
+    size = graph_cache._dir_bytes(str(tmp_path / "probe"))
+    cache = GraphCache(str(tmp_path / "cache"), disk_bytes=int(size * 2.5))
+    cache.put("a", CORRIDOR, ALL_CLASSES, grid_cg)
+    cache.put("b", (8.0, 76.0, 8.6, 76.7), ALL_CLASSES, grid_cg)
+    time.sleep(0.01)
+    assert cache.get(CORRIDOR, ALL_CLASSES) is not None  # a, now used more recently than b
+    cache.put("c", (8.0, 76.0, 8.7, 76.7), ALL_CLASSES, grid_cg)
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM graphs")}
+    assert keys == {"a", "c"}
+    assert len(stores(str(tmp_path / "cache"))) == 2
+    assert cache.stats()["disk_evictions"] == 1
+
+
+def test_memory_tier_is_bounded(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path), memory_bytes=int(grid_cg.nbytes * 1.5))
+    cache.put("a", CORRIDOR, ALL_CLASSES, grid_cg)
+    cache.put("b", (8.0, 76.0, 8.6, 76.7), ALL_CLASSES, grid_cg)
+    stats = cache.stats()
+    assert stats["memory_entries"] == 1 and stats["memory_evictions"] == 1 and stats["disk_entries"] == 2
+
+
+def test_expired_and_stale_entries_are_not_served(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path), max_age=60)
+    cache.put("old", CORRIDOR, ALL_CLASSES, grid_cg)
+    cache._db.execute("UPDATE graphs SET last_used = ?", (time.time() - 120,))
+    cache._db.commit()
+    # A fresh process evicts it at startup
+    assert GraphCache(str(tmp_path), max_age=60).get(INNER, ALL_CLASSES) is None
+    assert stores(str(tmp_path)) == []
+
+    cache = GraphCache(str(tmp_path))
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    (store,) = stores(str(tmp_path))
+    os.remove(os.path.join(str(tmp_path), store, "meta.json"))  # incomplete / older layout
+    assert GraphCache(str(tmp_path)).get(INNER, ALL_CLASSES) is None
+
+
+def test_put_replaces_the_store_atomically(tmp_path, grid_cg):
+    cache = GraphCache(str(tmp_path))
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    (first,) = stores(str(tmp_path))
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    (second,) = stores(str(tmp_path))
+    assert first != second
+    assert GraphCache(str(tmp_path)).get(INNER, ALL_CLASSES).num_edges == grid_cg.num_edges
+
+
+def test_index_from_before_named_stores_is_migrated(tmp_path, grid_cg):
+    db = sqlite3.connect(str(tmp_path / "index.sqlite"))
+    db.execute("CREATE TABLE graphs (key TEXT PRIMARY KEY, south REAL, west REAL, north REAL, east REAL, "
+               "classes TEXT, bytes INTEGER, created REAL, last_used REAL)")
+    db.execute("INSERT INTO graphs VALUES ('old', ?, ?, ?, ?, ?, 1, ?, ?)",
+               (*CORRIDOR, "|".join(ALL_CLASSES), time.time(), time.time()))
+    db.commit()
+    db.close()
+    save_graph_store(grid_cg, str(tmp_path / "old.graph"))
+
+    cache = GraphCache(str(tmp_path))
+    assert cache.get(INNER, ALL_CLASSES).num_edges == grid_cg.num_edges
+    cache.clear()
+    assert stores(str(tmp_path)) == [] and cache.stats()["disk_entries"] == 0
+
+
+def test_untracked_files_are_left_alone(tmp_path, grid_cg):
+    (tmp_path / "legacy.graphml").write_text("<graphml/>")
+    cache = GraphCache(str(tmp_path), disk_bytes=0)
+    cache.put("k", CORRIDOR, ALL_CLASSES, grid_cg)
+    assert (tmp_path / "legacy.graphml").exists()
+    assert cache.stats()["disk_entries"] == 0
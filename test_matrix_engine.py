@@ -0,0 +1,69 @@
+import math
+import random
+import numpy as np
+import pytest
+
+from src.engines import matrix_engine
+from src.engines.compact_graph import dijkstra_tree
+from src.engines.graph_store import load_graph_store, save_graph_store
+from src.engines.matrix_engine import close_pools, compute_matrix, get_pool, set_pool_graph
+
+
+@pytest.fixture
+def pool_graph(request, grid_cg, tmp_path):
+    """The grid as the pool graph, in memory (shared memory segments) or memory-mapped from a store."""
+    if request.param == "mapped":
+        save_graph_store(grid_cg, str(tmp_path / "grid.graph"))
+        cg = load_graph_store(str(tmp_path / "grid.graph"))
+    else:
+        cg = grid_cg
+    set_pool_graph(cg)
+    yield cg
+    set_pool_graph(None)
+
+
+def sample_nodes(cg, count=12, seed=4):
+    return random.Random(seed).sample(range(len(cg)), count)
+
+
+@pytest.mark.parametrize("pool_graph", ["memory", "mapped"], indirect=True)
+def test_pool_matrix_equals_serial_rows(pool_graph):
+    nodes = sample_nodes(pool_graph)
+    assert len(nodes) >= matrix_engine.PARALLEL_MIN_SOURCES
+    for weight in ("length_km", "base_time_min"):
+        matrix = compute_matrix(pool_graph, nodes, weight=weight, workers=2)
+        assert matrix_engine._pool is not None
+        for i, s in enumerate(nodes):
+            dist, _ = dijkstra_tree(pool_graph, s, weight=weight)
+            np.testing.assert_allclose(matrix.costs[i], dist[nodes], rtol=1e-12)
+            for j, t in enumerate(nodes):
+                edges = matrix.edges(i, j)
+                if not math.isfinite(matrix.costs[i, j]):
+                    assert edges is None
+                    continue
+                cost = float(pool_graph.weight(weight)[edges].sum(dtype=np.float64))
+                assert cost == pytest.approx(matrix.costs[i, j], rel=1e-6)
+
+
+@pytest.mark.parametrize("pool_graph", ["memory"], indirect=True)
+def test_pool_publishes_each_weight_once(pool_graph):
+    nodes = sample_nodes(pool_graph)
+    compute_matrix(pool_graph, nodes, weight="length_km", workers=2)
+    pool = get_pool(pool_graph)
+    compute_matrix(pool_graph, nodes, weight="length_km", workers=2)
+    assert len(pool._weights) == 1
+    compute_matrix(pool_graph, nodes, weight="base_time_min", workers=2)
+    assert len(pool._weights) == 2
+
+
+def test_pool_is_only_for_the_pool_graph(grid_cg):
+    close_pools()
+    set_pool_graph(None)
+    with pytest.raises(ValueError):
+        get_pool(grid_cg)
+    # Other graphs run in-process and still give the serial answer
+    nodes = sample_nodes(grid_cg)
+    matrix = compute_matrix(grid_cg, nodes, weight="length_km", workers=2)
+    assert matrix_engine._pool is None
+    dist, _ = dijkstra_tree(grid_cg, nodes[0], weight="length_km")
+    np.testing.assert_allclose(matrix.costs[0], dist[nodes])
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from src.model_compiler import CompiledForest, compile_pipeline
+
+TIME_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+
+
+def records(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'distance_km': rng.uniform(5, 600, n),
+        'delivery_demand': rng.integers(10, 100, n),
+        'traffic_factor': np.round(rng.uniform(1.0, 4.0, n), 2),
+        'time_of_day': rng.choice(TIME_OF_DAY, n),
+    })
+
+
+def pipeline(regressor):
+    # Same layout as preprocessing.preprocess_data + model.train_and_save_model
+    preprocessor = ColumnTransformer(transformers=[
+        ('num', StandardScaler(), ['distance_km', 'delivery_demand', 'traffic_factor']),
+        ('cat', OneHotEncoder(), ['time_of_day'])])
+    X = records(3000, 0)
+    y = X['distance_km'] * X['traffic_factor'] + (X['time_of_day'] == 'evening') * 15
+    return Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)]).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def forest():
+    return pipeline(RandomForestRegressor(n_estimators=20, random_state=42))
+
+
+def test_compiled_forest_equals_sklearn(forest):
+    X = records(5000, 1)
+    np.testing.assert_allclose(compile_pipeline(forest).predict(X), forest.predict(X), rtol=1e-12)
+
+
+def test_single_tree_equals_sklearn():
+    tree = pipeline(DecisionTreeRegressor(max_depth=8, random_state=0))
+    X = records(1000, 2)
+    np.testing.assert_allclose(compile_pipeline(tree).predict(X), tree.predict(X), rtol=1e-12)
+
+
+def test_saved_forest_round_trips(tmp_path, forest):
+    path = str(tmp_path / "model.npz")
+    compile_pipeline(forest).save(path)
+    X = records(500, 3)
+    np.testing.assert_allclose(CompiledForest.load(path).predict(X), forest.predict(X), rtol=1e-12)
+
+
+def test_unsupported_transformer_is_rejected():
+    from sklearn.preprocessing import MinMaxScaler
+    preprocessor = ColumnTransformer(transformers=[('num', MinMaxScaler(), ['distance_km'])])
+    X = records(200, 4)
+    model = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', DecisionTreeRegressor())]).fit(X, X['distance_km'])
+    with pytest.raises(ValueError):
+        compile_pipeline(model)
@@ -0,0 +1,75 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from src.engines.compact_graph import compile_graph, dijkstra_tree
+from src.engines.tile_store import TILE_LEVELS, TileStore, add_graph_to_tiles, level_of, tile_of, tiles_in_bbox
+
+TILE_DEG = 0.25
+GRID_BOUNDARY = (7.75, 75.75, 9.0, 77.0)
+
+
+def direct_compile(G, bbox, classes):
+    """compile_graph of the edges a tile query returns: the levels of classes, sourced in the tiles of bbox."""
+    levels = {i for i, (level, _) in enumerate(TILE_LEVELS) if level in TileStore.levels(classes)}
+    tiles = set(tiles_in_bbox(bbox, TILE_DEG))
+    H = nx.MultiDiGraph()
+    for u, v, data in G.edges(data=True):
+        if level_of(data["highway"]) in levels and tile_of(G.nodes[u]["y"], G.nodes[u]["x"], TILE_DEG) in tiles:
+            H.add_node(u, **G.nodes[u])
+            H.add_node(v, **G.nodes[v])
+            H.add_edge(u, v, **data)
+    return compile_graph(H)
+
+
+def edge_set(cg):
+    return sorted(zip(cg.node_ids[cg.sources].tolist(), cg.node_ids[cg.targets].tolist(),
+                      np.round(cg.weights["length_km"], 4).tolist(), np.round(cg.weights["base_time_min"], 4).tolist(),
+                      [cg.highway_names[h] for h in cg.highway.tolist()]))
+
+
+def assert_same_graph(stitched, direct):
+    np.testing.assert_array_equal(stitched.node_ids, direct.node_ids)
+    np.testing.assert_allclose(stitched.lat, direct.lat)
+    np.testing.assert_allclose(stitched.lon, direct.lon)
+    assert edge_set(stitched) == edge_set(direct)
+    for source in range(0, len(direct), max(1, len(direct) // 10)):
+        np.testing.assert_allclose(dijkstra_tree(stitched, source, weight="length_km")[0],
+                                   dijkstra_tree(direct, source, weight="length_km")[0])
+
+
+@pytest.mark.parametrize("classes", [("motorway", "trunk", "primary"), ("motorway", "trunk", "primary", "secondary", "tertiary")])
+@pytest.mark.parametrize("bbox", [(8.1, 76.1, 8.2, 76.2), (8.0, 76.0, 8.6, 76.6), (8.2, 76.2, 8.3, 76.55)])
+def test_stitched_tiles_equal_direct_compile(tmp_path, grid_graph, grid_cg, bbox, classes):
+    add_graph_to_tiles(grid_cg, GRID_BOUNDARY, str(tmp_path), TILE_DEG)
+    store = TileStore(str(tmp_path))
+    assert store.covers(bbox, classes)
+    assert_same_graph(store.load(bbox, classes), direct_compile(grid_graph, bbox, classes))
+
+
+def test_tiles_merge_across_downloads(tmp_path, grid_graph, grid_cg):
+    # Two downloads split at a tile boundary, sharing the nodes of the links across it
+    west = grid_graph.subgraph([n for n, d in grid_graph.nodes(data=True) if d["x"] < 76.3])
+    east = grid_graph.subgraph([n for n, d in grid_graph.nodes(data=True) if d["x"] >= 76.2])
+    add_graph_to_tiles(compile_graph(west), (7.75, 75.75, 9.0, 76.25), str(tmp_path), TILE_DEG)
+    add_graph_to_tiles(compile_graph(east), (7.75, 76.25, 9.0, 77.0), str(tmp_path), TILE_DEG)
+
+    bbox, classes = (8.0, 76.0, 8.6, 76.6), ("motorway", "trunk", "primary", "secondary", "tertiary")
+    store = TileStore(str(tmp_path))
+    assert store.covers(bbox, classes)
+    merged = store.load(bbox, classes)
+    # Links crossing 76.25 are stored once, with the download of their source tile
+    assert_same_graph(merged, direct_compile(grid_graph, bbox, classes))
+
+
+def test_coverage_is_the_boundary_not_the_node_extent(tmp_path, grid_cg):
+    add_graph_to_tiles(grid_cg, (8.0, 76.0, 8.5, 76.5), str(tmp_path), TILE_DEG)
+    store = TileStore(str(tmp_path))
+    assert store.covers((8.1, 76.1, 8.4, 76.4), ("primary",))
+    # Nodes reach 8.6 / 76.6, but the tiles past the boundary were only partly downloaded
+    assert not store.covers((8.1, 76.1, 8.55, 76.4), ("primary",))
+
+
+def test_missing_store_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TileStore(str(tmp_path / "none"))
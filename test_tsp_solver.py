@@ -0,0 +1,58 @@
+import itertools
+import math
+import numpy as np
+import pytest
+
+from src.engines.tsp_solver import held_karp, local_search, nearest_neighbour, path_cost, solve_open_tsp
+
+
+def random_matrix(n, seed, symmetric=False):
+    rng = np.random.default_rng(seed)
+    d = rng.uniform(1, 100, (n, n))
+    if symmetric:
+        d = (d + d.T) / 2
+    np.fill_diagonal(d, 0)
+    return d
+
+
+def brute_force(d):
+    n = len(d)
+    return min(path_cost(d, [0, *middle, n - 1]) for middle in itertools.permutations(range(1, n - 1)))
+
+
+@pytest.mark.parametrize("stops", range(0, 9))
+@pytest.mark.parametrize("symmetric", [False, True])
+def test_held_karp_matches_brute_force(stops, symmetric):
+    for seed in range(3):
+        d = random_matrix(stops + 2, seed, symmetric)
+        order = held_karp(d)
+        assert order[0] == 0 and order[-1] == stops + 1
+        assert sorted(order) == list(range(stops + 2))
+        assert path_cost(d, order) == pytest.approx(brute_force(d))
+
+
+@pytest.mark.parametrize("n", [6, 12, 30])
+def test_local_search_never_worsens(n):
+    for seed in range(5):
+        d = random_matrix(n, seed)
+        for start in (nearest_neighbour(d), list(range(n))):
+            order = local_search(d, start, time_budget=5.0)
+            assert order[0] == 0 and order[-1] == n - 1
+            assert sorted(order) == list(range(n))
+            assert path_cost(d, order) <= path_cost(d, start) + 1e-9
+
+
+def test_unreachable_legs_are_avoided_when_possible():
+    d = random_matrix(7, 3)
+    d[0, 1] = d[2, 3] = np.inf
+    order, cost = solve_open_tsp(d)
+    assert math.isfinite(cost)
+    assert cost == pytest.approx(min(path_cost(d, [0, *m, 6]) for m in itertools.permutations(range(1, 6))))
+
+
+def test_heuristic_tier_is_a_valid_path():
+    d = random_matrix(25, 7)
+    order, cost = solve_open_tsp(d, time_budget=0.5, exact_max_stops=10)
+    assert order[0] == 0 and order[-1] == 24 and sorted(order) == list(range(25))
+    assert cost == pytest.approx(path_cost(d, order))
+    assert cost <= path_cost(d, nearest_neighbour(d)) + 1e-9